@@ -1,9 +1,16 @@
 import sqlite3
 
-conn = sqlite3.connect("curionest_logs.db")
-cursor = conn.cursor()
+from services import log_store
 
-for row in cursor.execute("SELECT * FROM logs ORDER BY id DESC LIMIT 10"):
-    print(row)
+# newest partition holds the latest rows
+paths = log_store.partitions()
 
-conn.close()
+if paths:
+
+    conn = sqlite3.connect(paths[-1])
+    cursor = conn.cursor()
+
+    for row in cursor.execute("SELECT * FROM logs ORDER BY id DESC LIMIT 10"):
+        print(row)
+
+    conn.close()
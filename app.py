@@ -13,7 +13,10 @@ from flask_limiter.util import get_remote_address
 from engine.rag import ChromaRAGStore
 from engine.agent_v4 import StudentSupportAgentV5
 from engine.session_memory import SessionMemoryService
+from engine.event_logger import get_event_sink
+from engine import shared_counter
 
+from services import db_pool
 from services.logging_service import LoggingService
 
 from capture_lead import capture_lead
@@ -46,6 +49,16 @@ print("\nStarting CurioNest Backend\n")
 # LOAD CORE SERVICES
 # ====================================
 
+try:
+
+    # open DB_POOL_MIN_SIZE connections before the first request
+    db_pool.get_pool().warm()
+
+except Exception as e:
+
+    print("DB POOL WARMUP FAILED:", e)
+
+
 try:
 
     rag_store = ChromaRAGStore()
@@ -93,6 +106,26 @@ def health():
     })
 
 
+# ====================================
+# METRICS
+# ====================================
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+
+    return jsonify({
+        "db_pool": db_pool.get_pool().stats(),
+        "lead_writer": agent.lead_writer.stats(),
+        "event_sink": get_event_sink().stats(),
+        "log_sink": logger.sink.stats(),
+        "session_state": agent.session_state.stats(),
+        "session_memory": session_memory.stats(),
+        "conversation_summary": agent.conversation.stats(),
+        "token_budget": agent.budget.stats(),
+        "shared_counters": shared_counter.stats()
+    })
+
+
 # ====================================
 # DOMAIN CONFIG
 # ====================================
@@ -220,7 +253,8 @@ def ask_question():
         response = agent.receive_question(
             question=question,
             context=context,
-            session_id=session_id
+            session_id=session_id,
+            client_ip=get_remote_address()
         )
 
         return jsonify(response)
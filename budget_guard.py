@@ -1,60 +1,213 @@
-import sqlite3
 import os
-from datetime import datetime
+import threading
 
-DB_PATH = "curionest_logs.db"
+from engine import shared_counter
+
+# kept apart from the log partitions so log writes never block budget checks
+DB_PATH = os.getenv("USAGE_DB_PATH", "curionest_usage.db")
 
 DAILY_BUDGET = int(os.getenv("DAILY_TOKEN_BUDGET", "150000"))
 HOURLY_BUDGET = int(os.getenv("HOURLY_TOKEN_BUDGET", "15000"))
 
+# per session / client IP, per UTC hour; 0 turns the sub-budget off
+SESSION_HOURLY_BUDGET = int(os.getenv("SESSION_HOURLY_TOKEN_BUDGET", "0"))
+IP_HOURLY_BUDGET = int(os.getenv("IP_HOURLY_TOKEN_BUDGET", "0"))
+
+# sqlite (DB_PATH, shared by workers on one host) | postgres | memory
+BACKEND = os.getenv("TOKEN_BUDGET_BACKEND", "sqlite").lower()
+
+# reserved for the completion until the real usage is known
+RESERVE_COMPLETION_TOKENS = int(os.getenv("RESERVE_COMPLETION_TOKENS", "500"))
+
+COUNTER_PREFIX = "tokens"
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def estimate_tokens(text):
+    """~4 characters per token — close enough for a reservation."""
+    return len(text) // 4 + 1
+
+
+class Reservation:
+
+    __slots__ = ("tokens", "session_id", "client_ip", "settled")
+
+    def __init__(self, tokens, session_id, client_ip):
+        self.tokens = tokens
+        self.session_id = session_id
+        self.client_ip = client_ip
+        self.settled = False
+
+
+class TokenBudget:
+    """
+    Daily / hourly token budgets (UTC calendar day and hour, as before),
+    plus optional per-session and per-IP hourly sub-budgets.
+
+    Counts live in shared counters: checks read process memory (the
+    first check of a session or IP in this worker reads its global
+    count once), and increments are pushed to the backend atomically
+    in periodic batches (see engine/shared_counter.py). A call reserves
+    its estimated tokens before it is made, then reconcile() swaps the
+    estimate for the real usage, or release() returns it if the call
+    failed.
+    """
+
+    def __init__(self, backend=None):
+
+        if backend is None:
+            backend = shared_counter.SqliteBackend(DB_PATH) if BACKEND == "sqlite" else BACKEND
+
+        self.daily = shared_counter.get_sliding_window(
+            f"{COUNTER_PREFIX}:daily", window_seconds=86400, bucket_seconds=86400, backend=backend
+        )
+        self.hourly = shared_counter.get_sliding_window(
+            f"{COUNTER_PREFIX}:hourly", window_seconds=3600, bucket_seconds=3600, backend=backend
+        )
+
+        self.per_session = None
+        self.per_ip = None
+
+        if SESSION_HOURLY_BUDGET:
+            self.per_session = shared_counter.get_keyed_window(
+                f"{COUNTER_PREFIX}:session", window_seconds=3600, backend=backend
+            )
+
+        if IP_HOURLY_BUDGET:
+            self.per_ip = shared_counter.get_keyed_window(
+                f"{COUNTER_PREFIX}:ip", window_seconds=3600, backend=backend
+            )
+
+        # check + reserve is atomic within the worker
+        self._lock = threading.Lock()
+
+        self._rejected = 0
+
+    def _counters(self, session_id, client_ip):
+        """(counter, key or None, limit, label) for every budget that applies."""
+
+        counters = [
+            (self.daily, None, DAILY_BUDGET, "Daily token budget exceeded"),
+            (self.hourly, None, HOURLY_BUDGET, "Hourly token budget exceeded"),
+        ]
+
+        if self.per_session is not None and session_id:
+            counters.append((self.per_session, session_id, SESSION_HOURLY_BUDGET,
+                             "Session token budget exceeded"))
+
+        if self.per_ip is not None and client_ip:
+            counters.append((self.per_ip, client_ip, IP_HOURLY_BUDGET,
+                             "IP token budget exceeded"))
+
+        return counters
+
+    @staticmethod
+    def _count(counter, key):
+        return counter.count() if key is None else counter.count(key)
+
+    @staticmethod
+    def _add(counter, key, n):
+        if key is None:
+            counter.add(n)
+        else:
+            counter.add(key, n)
+
+    def check(self, session_id=None, client_ip=None, tokens=0):
+        """(exceeded, reason) — memory reads, bar a key's first touch."""
+
+        for counter, key, limit, reason in self._counters(session_id, client_ip):
 
-def _get_connection():
-    return sqlite3.connect(DB_PATH)
+            used = self._count(counter, key)
+
+            if used >= limit or used + tokens > limit:
+                return True, reason
+
+        return False, None
+
+    def reserve(self, tokens, session_id=None, client_ip=None):
+        """Hold `tokens` against every applicable budget, or raise BudgetExceeded."""
+
+        with self._lock:
+
+            exceeded, reason = self.check(session_id, client_ip, tokens)
+
+            if exceeded:
+                self._rejected += 1
+                raise BudgetExceeded(reason)
+
+            for counter, key, _, _ in self._counters(session_id, client_ip):
+                self._add(counter, key, tokens)
+
+        return Reservation(tokens, session_id, client_ip)
+
+    def reconcile(self, reservation, actual_tokens):
+        """Replace the reservation's estimate with what the call really used."""
+
+        self._settle(reservation, actual_tokens - reservation.tokens)
+
+    def release(self, reservation):
+        """The call never happened (or failed) — give the tokens back."""
+
+        self._settle(reservation, -reservation.tokens)
+
+    def _settle(self, reservation, delta):
+
+        if reservation.settled:
+            return
+
+        reservation.settled = True
+
+        if not delta:
+            return
+
+        for counter, key, _, _ in self._counters(reservation.session_id, reservation.client_ip):
+            self._add(counter, key, delta)
+
+    def stats(self):
+
+        return {
+            "daily_tokens": self.daily.count(),
+            "daily_budget": DAILY_BUDGET,
+            "hourly_tokens": self.hourly.count(),
+            "hourly_budget": HOURLY_BUDGET,
+            "session_hourly_budget": SESSION_HOURLY_BUDGET,
+            "ip_hourly_budget": IP_HOURLY_BUDGET,
+            "rejected": self._rejected,
+        }
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_token_budget():
+
+    global _budget
+
+    if _budget is None:
+
+        with _budget_lock:
+
+            if _budget is None:
+                _budget = TokenBudget()
+
+    return _budget
 
 
 def check_and_update(tokens_to_add=0):
-    now = datetime.utcnow()
-    today = now.date().isoformat()
-    hour = now.strftime("%Y-%m-%dT%H")
-
-    conn = _get_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        "SELECT daily_tokens, hourly_tokens, day, hour FROM usage_counters WHERE id = 1"
-    )
-    daily_tokens, hourly_tokens, stored_day, stored_hour = cur.fetchone()
-
-    # ✅ Correct reset logic with persistent state repair
-    if stored_day != today:
-        daily_tokens = 0
-        stored_day = today
-
-    if stored_hour != hour:
-        hourly_tokens = 0
-        stored_hour = hour
-
-    if daily_tokens >= DAILY_BUDGET:
-        conn.close()
-        return True, "Daily token budget exceeded"
-
-    if hourly_tokens >= HOURLY_BUDGET:
-        conn.close()
-        return True, "Hourly token budget exceeded"
-
-    daily_tokens += tokens_to_add
-    hourly_tokens += tokens_to_add
-
-    cur.execute(
-        """
-        UPDATE usage_counters
-        SET daily_tokens = ?, hourly_tokens = ?, day = ?, hour = ?
-        WHERE id = 1
-        """,
-        (daily_tokens, hourly_tokens, stored_day, stored_hour),
-    )
-
-    conn.commit()
-    conn.close()
+    """Previous API: check the global budgets, then count `tokens_to_add`."""
+
+    budget = get_token_budget()
+
+    exceeded, reason = budget.check()
+
+    if exceeded:
+        return True, reason
+
+    budget.daily.add(tokens_to_add)
+    budget.hourly.add(tokens_to_add)
 
     return False, None
@@ -1,101 +1,335 @@
 import os
-from knowledge_ingest import ingest_document
-from engine.rag import ChromaRAGStore
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from knowledge_ingest import ingest_document, get_client, get_collection, normalize
+from engine import collection_registry
 
 DOCS_DIR = "docs II"
 VERSION = "v1"
 
+CHECKPOINT_PATH = "ingest_checkpoint.json"
 
-def scan_and_ingest():
 
-    total_files = 0
+# =====================================================
+# CHECKPOINT
+# =====================================================
+
+class IngestCheckpoint:
+    """
+    Durable progress state for a bulk ingestion run.
+
+    Tracks, per file, how many embedding batches are stored and
+    whether the file is complete. Every update is written to a temp
+    file and atomically swapped in, so a crash never leaves a torn
+    checkpoint behind.
+    """
+
+    def __init__(self, path, resume=False):
+
+        self.path = path
+        self.state = {"started_at": datetime.utcnow().isoformat(), "files": {}}
+
+        if resume and os.path.exists(path):
+
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+            print(f"Resuming from checkpoint: {path}")
+
+    @staticmethod
+    def _fingerprint(file_path):
+
+        stat = os.stat(file_path)
+
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    def _entry(self, file_path):
+
+        entry = self.state["files"].get(file_path)
+
+        # file changed since it was checkpointed → start it over
+        if entry and entry.get("fingerprint") != self._fingerprint(file_path):
+            return None
+
+        return entry
+
+    def is_done(self, file_path):
+
+        entry = self._entry(file_path)
+
+        return bool(entry and entry.get("done"))
+
+    def batches_done(self, file_path):
+
+        entry = self._entry(file_path)
+
+        return entry.get("batches_done", 0) if entry else 0
+
+    def mark_batch(self, file_path, batches_done, total_batches):
+
+        self.state["files"][file_path] = {
+            "fingerprint": self._fingerprint(file_path),
+            "batches_done": batches_done,
+            "total_batches": total_batches,
+            "done": False
+        }
+
+        self._save()
+
+    def mark_done(self, file_path, chunks):
+
+        entry = self.state["files"].get(file_path) or {}
+
+        entry.update({
+            "fingerprint": self._fingerprint(file_path),
+            "chunks": chunks,
+            "done": True
+        })
+
+        self.state["files"][file_path] = entry
+
+        self._save()
+
+    def _save(self):
+
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """The run is finished — nothing left to resume."""
+
+        self.state = {"started_at": datetime.utcnow().isoformat(), "files": {}}
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
 
-    for board in os.listdir(DOCS_DIR):
+# =====================================================
+# DOCUMENT DISCOVERY
+# =====================================================
 
-        board_path = os.path.join(DOCS_DIR, board)
+def iter_documents(docs_dir):
+
+    for board in sorted(os.listdir(docs_dir)):
+
+        board_path = os.path.join(docs_dir, board)
 
         if not os.path.isdir(board_path):
             continue
 
-        for subject in os.listdir(board_path):
+        for subject in sorted(os.listdir(board_path)):
 
             subject_path = os.path.join(board_path, subject)
 
             if not os.path.isdir(subject_path):
                 continue
 
-            for chapter in os.listdir(subject_path):
+            for chapter in sorted(os.listdir(subject_path)):
 
                 chapter_path = os.path.join(subject_path, chapter)
 
                 if not os.path.isdir(chapter_path):
                     continue
 
-                for file in os.listdir(chapter_path):
+                for file in sorted(os.listdir(chapter_path)):
 
                     if not file.lower().endswith((".pdf", ".txt")):
                         continue
 
                     file_path = os.path.join(chapter_path, file)
 
-                    print(f"Ingesting → {board} | {subject} | {chapter} | {file}")
+                    yield board, subject, chapter, file, file_path
+
+
+# =====================================================
+# INGESTION
+# =====================================================
+
+def scan_and_ingest(docs_dir=DOCS_DIR, version=VERSION, resume=False,
+                    checkpoint_path=CHECKPOINT_PATH, checkpoint=None,
+                    collection_name=None):
 
-                    ingest_document(
-                        file_path=file_path,
-                        subject=subject,
-                        chapter=chapter,
-                        source="bulk_ingestion",
-                        version=VERSION
-                    )
+    if checkpoint is None:
+        checkpoint = IngestCheckpoint(checkpoint_path, resume=resume)
+
+    total_files = 0
+    skipped_files = 0
+
+    for board, subject, chapter, file, file_path in iter_documents(docs_dir):
+
+        if checkpoint.is_done(file_path):
+            skipped_files += 1
+            continue
 
-                    total_files += 1
+        start_batch = checkpoint.batches_done(file_path)
+
+        if start_batch:
+            print(f"Resuming → {board} | {subject} | {chapter} | {file} "
+                  f"(from batch {start_batch + 1})")
+        else:
+            print(f"Ingesting → {board} | {subject} | {chapter} | {file}")
+
+        chunks = ingest_document(
+            file_path=file_path,
+            subject=subject,
+            chapter=chapter,
+            source="bulk_ingestion",
+            version=version,
+            start_batch=start_batch,
+            on_batch=lambda done, total, p=file_path:
+                checkpoint.mark_batch(p, done, total),
+            collection_name=collection_name
+        )
+
+        checkpoint.mark_done(file_path, chunks)
+
+        total_files += 1
+
+    if skipped_files:
+        print(f"\nSkipped (already ingested): {skipped_files}")
 
     print(f"\nTotal documents processed: {total_files}")
 
 
-def validate_all_chapters():
+def validate_all_chapters(docs_dir=DOCS_DIR, collection_name=None):
 
     print("\n=== PHASE 1 VALIDATION REPORT ===\n")
 
-    rag = ChromaRAGStore()
+    collection = get_collection(collection_name)
 
-    for board in os.listdir(DOCS_DIR):
+    all_valid = True
+    seen = set()
 
-        board_path = os.path.join(DOCS_DIR, board)
+    for board, subject, chapter, file, file_path in iter_documents(docs_dir):
 
-        if not os.path.isdir(board_path):
+        key = (normalize(subject), normalize(chapter))
+
+        if key in seen:
             continue
 
-        for subject in os.listdir(board_path):
+        seen.add(key)
 
-            subject_path = os.path.join(board_path, subject)
+        result = collection_registry.validate_chapter(collection, *key)
 
-            if not os.path.isdir(subject_path):
-                continue
+        if result["valid"]:
+            print(
+                f"✅ {subject} - {chapter} : OK "
+                f"(chunks={result['count']}, similarity={result.get('similarity')})"
+            )
+        else:
+            all_valid = False
+            print(
+                f"❌ {subject} - {chapter} : FAILED "
+                f"({result['reason']})"
+            )
 
-            for chapter in os.listdir(subject_path):
+    return all_valid
 
-                chapter_path = os.path.join(subject_path, chapter)
 
-                if not os.path.isdir(chapter_path):
-                    continue
+# =====================================================
+# BLUE / GREEN BUILD
+# =====================================================
 
-                result = rag.validate_chapter(subject, chapter)
+def build_and_switch(docs_dir=DOCS_DIR, version=VERSION, resume=False,
+                     checkpoint_path=CHECKPOINT_PATH):
+    """
+    Ingest into a fresh versioned collection, validate it, then
+    atomically repoint serving to it and drop old versions.
 
-                if result["valid"]:
-                    print(
-                        f"✅ {subject} - {chapter} : OK "
-                        f"(chunks={result['count']}, similarity={result.get('similarity')})"
-                    )
-                else:
-                    print(
-                        f"❌ {subject} - {chapter} : FAILED "
-                        f"({result['reason']})"
-                    )
+    The live collection is never written to, so queries keep hitting
+    a complete, read-only index for the whole build.
+    """
 
+    checkpoint = IngestCheckpoint(checkpoint_path, resume=resume)
 
-if __name__ == "__main__":
+    target = checkpoint.state.get("collection")
+
+    # never resume into the collection that is serving
+    if target == collection_registry.read_active():
+        target = None
+
+    if not target:
+        # progress recorded against the live collection doesn't count here
+        target = collection_registry.new_version_name()
+        checkpoint.state["files"] = {}
+
+    checkpoint.state["collection"] = target
+
+    print(f"Building collection: {target}")
+
+    scan_and_ingest(
+        docs_dir=docs_dir,
+        version=version,
+        checkpoint=checkpoint,
+        collection_name=target
+    )
 
-    scan_and_ingest()
+    if not validate_all_chapters(docs_dir, collection_name=target):
+        print(f"\nValidation failed — still serving {collection_registry.read_active()}")
+        return False
+
+    previous = collection_registry.set_active(target)
+
+    print(f"\nSwitched serving: {previous} → {target}")
+
+    # a later --resume must build a new version, not write into this one
+    checkpoint.clear()
+
+    dropped = collection_registry.collect_garbage(get_client())
+
+    for name in dropped:
+        print(f"Dropped old collection: {name}")
+
+    return True
+
+
+if __name__ == "__main__":
 
-    validate_all_chapters()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bulk ingest curriculum documents")
+
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument("--version", default=VERSION)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from its checkpoint"
+    )
+    parser.add_argument(
+        "--blue-green",
+        action="store_true",
+        help="build a new versioned collection and switch serving to it"
+    )
+
+    args = parser.parse_args()
+
+    if args.blue_green:
+
+        ok = build_and_switch(
+            docs_dir=args.docs_dir,
+            version=args.version,
+            resume=args.resume,
+            checkpoint_path=args.checkpoint
+        )
+
+        sys.exit(0 if ok else 1)
+
+    scan_and_ingest(
+        docs_dir=args.docs_dir,
+        version=args.version,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint
+    )
+
+    validate_all_chapters(args.docs_dir)
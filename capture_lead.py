@@ -1,20 +1,59 @@
 import re
-import os
-import psycopg2
 
 from flask import request, jsonify
 from dotenv import load_dotenv
 
+from services import db_pool
+from engine.event_logger import EventLogger, EVENT_CONTACT_CAPTURED
+from engine.lead_persistence import LeadPersistenceService
+
 load_dotenv()
 
+events = EventLogger()
+
 EMAIL_REGEX = r"^[^\s@]+@[^\s@]+\.[^\s@]+$"
 PHONE_REGEX = r"^[0-9]{10}$"
 
+# Resolve the session's latest lead and attach the contact in one round
+# trip. lead_contacts.lead_id is UNIQUE, so duplicate submissions (or
+# two racing requests) insert at most one row.
+CAPTURE_CONTACT_SQL = """
+    WITH lead AS (
+        SELECT id
+        FROM leads
+        WHERE session_id = %(session_id)s
+        ORDER BY created_at DESC
+        LIMIT 1
+    ),
+    inserted AS (
+        INSERT INTO lead_contacts (lead_id, name, email, phone)
+        SELECT id, %(name)s, %(email)s, %(phone)s
+        FROM lead
+        ON CONFLICT (lead_id) DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        (SELECT id FROM lead),
+        EXISTS (SELECT 1 FROM inserted)
+"""
+
+# No lead yet — it may still be queued in a worker's LeadWriter (or its
+# spill file). Park the contact; the writer attaches it when the lead
+# lands. The first submission wins, like lead_contacts.
+STASH_CONTACT_SQL = """
+    INSERT INTO pending_lead_contacts (session_id, name, email, phone)
+    VALUES (%(session_id)s, %(name)s, %(email)s, %(phone)s)
+    ON CONFLICT (session_id) DO NOTHING
+"""
+
+# sessions that never produced a lead
+PURGE_PENDING_SQL = """
+    DELETE FROM pending_lead_contacts
+    WHERE created_at < now() - interval '1 day'
+"""
 
-def capture_lead():
 
-    conn = None
-    cur = None
+def capture_lead():
 
     try:
 
@@ -41,6 +80,13 @@ def capture_lead():
                 "message": "session_id required"
             }), 400
 
+        # leads.session_id is VARCHAR(100)
+        if not isinstance(session_id, str) or len(session_id) > 100:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid session_id"
+            }), 400
+
         if not name:
             return jsonify({
                 "status": "error",
@@ -60,64 +106,52 @@ def capture_lead():
             }), 400
 
         # -----------------------------
-        # DB Connection
+        # Resolve Lead + Insert Contact
         # -----------------------------
 
-        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
-        cur = conn.cursor()
+        params = {
+            "session_id": session_id,
+            "name": name,
+            "email": email,
+            "phone": phone
+        }
 
-        # -----------------------------
-        # Find Lead Session
-        # -----------------------------
+        with db_pool.connection() as conn:
 
-        cur.execute("""
-            SELECT id
-            FROM leads
-            WHERE session_id = %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (session_id,))
+            cur = conn.cursor()
 
-        row = cur.fetchone()
+            cur.execute(CAPTURE_CONTACT_SQL, params)
 
-        if not row:
-            return jsonify({
-                "status": "error",
-                "message": "Lead not found for session"
-            }), 404
+            lead_id, created = cur.fetchone()
 
-        lead_id = row[0]
+            if not lead_id:
 
-        # -----------------------------
-        # Prevent Duplicate Contact
-        # -----------------------------
+                cur.execute(PURGE_PENDING_SQL)
+                cur.execute(STASH_CONTACT_SQL, params)
 
-        cur.execute("""
-            SELECT id
-            FROM lead_contacts
-            WHERE lead_id = %s
-        """, (lead_id,))
+                # commit before looking again: either this sees the lead,
+                # or the writer's attach (after its commit) sees the stash
+                conn.commit()
 
-        existing = cur.fetchone()
+                cur.execute(LeadPersistenceService.ATTACH_PENDING_CONTACT_SQL, params)
 
-        if existing:
+                lead_id, created = cur.fetchone()
 
+            cur.close()
+
+        if not lead_id:
+            return jsonify({
+                "status": "success",
+                "message": "Contact saved; it will be attached to your lead shortly"
+            }), 202
+
+        if not created:
             return jsonify({
                 "status": "success",
                 "message": "Lead already captured"
             })
 
-        # -----------------------------
-        # Insert Contact
-        # -----------------------------
-
-        cur.execute("""
-            INSERT INTO lead_contacts
-            (lead_id, name, email, phone)
-            VALUES (%s, %s, %s, %s)
-        """, (lead_id, name, email, phone))
-
-        conn.commit()
+        events.log_event(lead_id, session_id, EVENT_CONTACT_CAPTURED, None, None, None)
 
         return jsonify({
             "status": "success",
@@ -128,18 +162,7 @@ def capture_lead():
 
         print("CAPTURE LEAD ERROR:", e)
 
-        if conn:
-            conn.rollback()
-
         return jsonify({
             "status": "error",
             "message": "Internal error capturing lead"
         }), 500
-
-    finally:
-
-        if cur:
-            cur.close()
-
-        if conn:
-            conn.close()
\ No newline at end of file
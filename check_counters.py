@@ -1,9 +1,12 @@
 import sqlite3
 
-conn = sqlite3.connect("curionest_logs.db")
+from budget_guard import DB_PATH
+
+conn = sqlite3.connect(DB_PATH)
 cur = conn.cursor()
 
-for row in cur.execute("SELECT * FROM usage_counters"):
+# name, bucket (window start = bucket * window seconds), tokens
+for row in cur.execute("SELECT name, bucket, value FROM shared_counters ORDER BY name, bucket"):
     print(row)
 
 conn.close()
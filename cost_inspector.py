@@ -1,37 +1,230 @@
+import ast
+import json
 import sqlite3
+import argparse
 from collections import Counter
+from datetime import datetime, timedelta
 
-conn = sqlite3.connect("curionest_logs.db")
-cursor = conn.cursor()
+from services import log_store
+from services.log_store import LOG_DIR, EXTRACTED_FIELDS, ensure_schema
+from services.logging_service import extract_fields
 
-cursor.execute("SELECT event_type, details FROM logs")
-rows = cursor.fetchall()
 
-counter = Counter()
+BACKFILL_BATCH_SIZE = 5000
 
-token_usage = {
-    "prompt_tokens": 0,
-    "completion_tokens": 0,
-    "total_tokens": 0
-}
 
-for event_type, details in rows:
+def parse_details(details):
+    """JSON for current rows, Python literal for rows written with str()."""
 
-    counter[event_type] += 1
+    try:
+        return json.loads(details)
+    except (TypeError, ValueError):
+        pass
 
-    if event_type == "OPENAI_USAGE":
-        try:
-            data = eval(details)
-            token_usage["prompt_tokens"] += data.get("prompt_tokens", 0)
-            token_usage["completion_tokens"] += data.get("completion_tokens", 0)
-            token_usage["total_tokens"] += data.get("total_tokens", 0)
-        except Exception:
-            pass
+    try:
+        return ast.literal_eval(details)
+    except (ValueError, SyntaxError):
+        return None
 
-print("\n=== EVENT COUNTS ===")
-for k, v in counter.items():
-    print(f"{k}: {v}")
 
-print("\n=== TOKEN USAGE ===")
-for k, v in token_usage.items():
-    print(f"{k}: {v}")
+def backfill(conn):
+    """Fill the extracted columns for OPENAI_USAGE rows logged before they existed."""
+
+    updated = 0
+    last_id = 0
+
+    while True:
+
+        rows = conn.execute("""
+        SELECT id, details FROM logs
+        WHERE event_type = 'OPENAI_USAGE'
+          AND total_tokens IS NULL
+          AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """, (last_id, BACKFILL_BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+
+        params = []
+
+        for row_id, details in rows:
+
+            values = extract_fields(parse_details(details))
+
+            if any(v is not None for v in values):
+                params.append((*values, row_id))
+
+        with conn:
+            conn.executemany(
+                f"UPDATE logs SET {', '.join(f'{f} = ?' for f in EXTRACTED_FIELDS)} WHERE id = ?",
+                params
+            )
+
+        updated += len(params)
+
+    return updated
+
+
+# exact counts — detail rows of hot events are sampled
+COUNTS_SQL = """
+SELECT event_type, SUM(count)
+FROM log_counts
+WHERE bucket >= substr(?, 1, 16) AND bucket < ?
+GROUP BY event_type
+"""
+
+# files written before log_counts existed
+LEGACY_COUNTS_SQL = """
+SELECT event_type, COUNT(*)
+FROM logs
+WHERE timestamp >= ? AND timestamp < ?
+GROUP BY event_type
+"""
+
+# each kept row stands for 1 / sample_rate calls when OPENAI_USAGE is
+# sampled (LOG_SAMPLE_RATES), so sums are weighted back up
+USAGE_SQL = """
+SELECT
+    COALESCE(SUM(w), 0),
+    COALESCE(SUM(prompt_tokens * w), 0),
+    COALESCE(SUM(completion_tokens * w), 0),
+    COALESCE(SUM(total_tokens * w), 0),
+    COALESCE(SUM(latency_ms * w), 0),
+    COALESCE(SUM(CASE WHEN latency_ms IS NOT NULL THEN w END), 0),
+    MAX(latency_ms)
+FROM (
+    SELECT *, 1.0 / COALESCE(NULLIF(sample_rate, 0), 1) AS w
+    FROM logs
+    WHERE event_type = 'OPENAI_USAGE' AND timestamp >= ? AND timestamp < ?
+)
+"""
+
+
+def _run(sql, since, until, db=None, log_dir=LOG_DIR):
+    """Per-partition results, or a single file's when `db` is given."""
+
+    # ISO strings compare chronologically; "9999" sorts after any timestamp
+    params = (since or "", until or "9999")
+
+    if db is None:
+        return [rows for _, rows in log_store.query(sql, params, since, until, log_dir)]
+
+    conn = sqlite3.connect(db)
+
+    try:
+        return [conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def report(since=None, until=None, db=None, log_dir=LOG_DIR):
+    """Aggregate each partition in SQL, then merge the per-partition totals."""
+
+    counts = Counter()
+
+    counts_sql = COUNTS_SQL
+
+    if db is not None:
+        conn = sqlite3.connect(db)
+        has_counts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_counts'"
+        ).fetchone()
+        conn.close()
+
+        if not has_counts:
+            counts_sql = LEGACY_COUNTS_SQL
+
+    for rows in _run(counts_sql, since, until, db, log_dir):
+        for event_type, n in rows:
+            counts[event_type] += n
+
+    calls = prompt = completion = total = latency_sum = latency_n = 0
+    latency_max = None
+
+    for rows in _run(USAGE_SQL, since, until, db, log_dir):
+
+        c, p, cp, t, ls, ln, lm = rows[0]
+
+        calls += c
+        prompt += p
+        completion += cp
+        total += t
+        latency_sum += ls
+        latency_n += ln
+
+        if lm is not None:
+            latency_max = lm if latency_max is None else max(latency_max, lm)
+
+    return {
+        "since": since,
+        "until": until,
+        "event_counts": dict(counts.most_common()),
+        "token_usage": {
+            "calls": int(round(calls)),
+            "prompt_tokens": int(round(prompt)),
+            "completion_tokens": int(round(completion)),
+            "total_tokens": int(round(total)),
+        },
+        "latency_ms": {
+            "avg": round(latency_sum / latency_n, 1) if latency_n else None,
+            "max": latency_max,
+        },
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Event counts and OpenAI token usage")
+
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--db", help="report on a single sqlite file instead (e.g. the pre-partitioning curionest_logs.db)")
+    parser.add_argument("--hours", type=float, default=24, help="report window (default 24h)")
+    parser.add_argument("--since", help="ISO timestamp (UTC); overrides --hours")
+    parser.add_argument("--until", help="ISO timestamp (UTC); default now")
+    parser.add_argument("--all", action="store_true", help="no window")
+    parser.add_argument("--backfill", action="store_true",
+                        help="first extract token columns from rows logged before they existed")
+    parser.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.backfill:
+
+        for path in [args.db] if args.db else log_store.partitions(log_dir=args.log_dir):
+
+            conn = sqlite3.connect(path, timeout=30)
+            ensure_schema(conn)
+
+            print(f"Backfilled {backfill(conn)} rows in {path}")
+
+            conn.close()
+
+    if args.all:
+        since = None
+    elif args.since:
+        since = args.since
+    else:
+        since = (datetime.utcnow() - timedelta(hours=args.hours)).isoformat()
+
+    result = report(since, args.until, args.db, args.log_dir)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+
+    else:
+
+        print(f"\n=== EVENT COUNTS ({since or 'beginning'} → {args.until or 'now'}) ===")
+        for k, v in result["event_counts"].items():
+            print(f"{k}: {v}")
+
+        print("\n=== TOKEN USAGE ===")
+        for k, v in result["token_usage"].items():
+            print(f"{k}: {v}")
+
+        print("\n=== LLM LATENCY (ms) ===")
+        for k, v in result["latency_ms"].items():
+            print(f"{k}: {v}")
@@ -13,7 +13,7 @@ CREATE TYPE lead_status AS ENUM (
 
 CREATE TABLE leads (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    session_id VARCHAR(100) NOT NULL,
+    session_id VARCHAR(100) NOT NULL UNIQUE,
     subject VARCHAR(100),
     chapter VARCHAR(100),
     question TEXT,
@@ -31,8 +31,12 @@ CREATE TABLE leads (
     updated_at TIMESTAMP DEFAULT now()
 );
 
-CREATE INDEX idx_leads_session_id
-ON leads(session_id);
+-- session_id UNIQUE doubles as the lookup index and the
+-- ON CONFLICT target for LeadPersistenceService.upsert_lead
+
+-- latest lead per session (capture_lead)
+CREATE INDEX idx_leads_session_created
+ON leads(session_id, created_at DESC);
 
 -- ==============================
 -- Lead Contacts
@@ -40,7 +44,7 @@ ON leads(session_id);
 
 CREATE TABLE lead_contacts (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    lead_id UUID REFERENCES leads(id) ON DELETE CASCADE,
+    lead_id UUID UNIQUE REFERENCES leads(id) ON DELETE CASCADE,
 
     name TEXT,
     email TEXT,
@@ -49,6 +53,21 @@ CREATE TABLE lead_contacts (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- contacts captured before the background writer has written their
+-- lead; moved into lead_contacts once it exists
+CREATE TABLE pending_lead_contacts (
+    session_id VARCHAR(100) PRIMARY KEY,
+
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX idx_pending_lead_contacts_created
+ON pending_lead_contacts(created_at);
+
 -- ==============================
 -- Lead Events
 -- ==============================
@@ -65,4 +84,100 @@ CREATE TABLE lead_events (
     engagement_score DOUBLE PRECISION,
 
     created_at TIMESTAMP DEFAULT now()
-);
\ No newline at end of file
+);
+
+-- ==============================
+-- Identities / Sessions
+-- ==============================
+
+CREATE TABLE identities (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    identity_token TEXT NOT NULL UNIQUE,
+
+    total_sessions INT NOT NULL DEFAULT 1,
+
+    created_at TIMESTAMP DEFAULT now(),
+    last_seen TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE sessions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    identity_id UUID REFERENCES identities(id) ON DELETE CASCADE,
+    session_id VARCHAR(100) NOT NULL UNIQUE,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+-- ==============================
+-- Agent Session State
+-- ==============================
+-- Shared by workers when SESSION_STATE_BACKEND=postgres
+
+CREATE TABLE agent_session_state (
+    state_key TEXT PRIMARY KEY,
+
+    confusion INT NOT NULL DEFAULT 0,
+    repetition INT NOT NULL DEFAULT 0,
+    last_question TEXT,
+    escalated BOOLEAN NOT NULL DEFAULT FALSE,
+    rejection_count INT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_agent_session_state_updated
+ON agent_session_state(updated_at);
+
+-- ==============================
+-- Shared Counters
+-- ==============================
+-- Bucketed counters (e.g. the escalation budget) shared by workers when
+-- their backend is postgres
+
+CREATE TABLE shared_counters (
+    name TEXT NOT NULL,
+    bucket BIGINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (name, bucket)
+);
+
+-- ==============================
+-- Conversation Messages
+-- ==============================
+
+-- Monthly range partitions (conversation_messages_pYYYY_MM) are created
+-- ahead of time, and detached then dropped past retention, by
+-- engine/message_partitions.py (run as a scheduled job).
+
+CREATE TABLE conversation_messages (
+    id BIGSERIAL,
+    session_id VARCHAR(100) NOT NULL,
+
+    role TEXT NOT NULL,
+    message TEXT,
+
+    -- assigned by the app so batched inserts keep conversation order
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- created on each partition, so every index only covers one month
+CREATE INDEX idx_conversation_messages_session_created
+ON conversation_messages(session_id, created_at DESC);
+
+-- rows outside every monthly partition land here instead of failing
+CREATE TABLE conversation_messages_default
+PARTITION OF conversation_messages DEFAULT;
+
+-- rolling summary per session (ConversationSummarizer), shared by workers
+CREATE TABLE conversation_summaries (
+    session_id VARCHAR(100) PRIMARY KEY,
+    summary TEXT NOT NULL,
+
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_conversation_summaries_updated
+ON conversation_summaries(updated_at);
@@ -1,10 +1,18 @@
 import os
 import re
+import time
+import threading
 from openai import OpenAI
 
+import budget_guard
+
 from engine.cache_engine import CacheEngine
 from services.logging_service import LoggingService
 from engine.lead_persistence import LeadPersistenceService
+from engine.lead_writer import LeadWriter
+from engine.event_logger import EventLogger, EVENT_QUESTION, EVENT_CACHE_HIT
+from engine.session_state import SessionStateStore
+from engine.conversation_summary import ConversationSummarizer
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
@@ -34,117 +42,166 @@ class StudentSupportAgentV5:
         self.cache = CacheEngine()
         self.logger = LoggingService()
         self.lead_persistence = LeadPersistenceService()
+        self.lead_writer = LeadWriter(self.lead_persistence)
+
+        # buffered lead_events rows (questions, cache hits)
+        self.events = EventLogger()
 
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-        # scoped per subject+chapter
-        self.session_state = {}
+        # only SessionMemoryService persists history
+        self.memory = session_engine if hasattr(session_engine, "store_message") else None
+
+        # recent turns + rolling summary, bounded per prompt
+        self.conversation = ConversationSummarizer(self._llm, session_memory=self.memory)
+
+        # scoped per subject+chapter; bounded LRU + TTL
+        self.session_state = SessionStateStore()
+
+        # every LLM call reserves tokens here first
+        self.budget = budget_guard.get_token_budget()
+
+        # who the current request thread is answering, for sub-budgets
+        self._request = threading.local()
 
     # ================= MAIN =================
-    def receive_question(self, question, context, session_id):
+    def receive_question(self, question, context, session_id, client_ip=None):
+
+        self._request.session_id = session_id
+        self._request.client_ip = client_ip
 
         try:
             question = question.strip()
             subject = context.get("subject")
             chapter = context.get("chapter")
 
-            key = f"{session_id}_{subject}_{chapter}"
+            key = SessionStateStore.key(session_id, subject, chapter)
 
-            if key not in self.session_state:
-                self.session_state[key] = {
-                    "confusion": 0,
-                    "repetition": 0,
-                    "last_question": "",
-                    "escalated": False,
-                    "rejection_count": 0
-                }
+            state = self.session_state.get(key)
 
-            state = self.session_state[key]
+            try:
+                response = self._respond(question, subject, chapter, session_id, state)
+            finally:
+                # shared backends persist it in the background
+                self.session_state.mark_dirty(key)
 
-            # ---------- SMALL TALK ----------
-            if self._is_smalltalk(question):
-                return {"type": "smalltalk", "message": "Ask me anything from your chapter 😊"}
+            self._remember(session_id, question, response)
 
-            # ---------- CACHE ----------
-            cached = self.cache.lookup(question, subject, chapter)
-            if cached:
-                return {"type": "answer", "message": cached}
+            self.events.log_event(None, session_id, EVENT_QUESTION, response.get("type"), None, None)
 
-            # ---------- INTENT ----------
-            intent = self._intent(question)
+            return response
 
-            # ---------- USER REJECTION ----------
-            if "dont need teacher" in question.lower():
-                state["rejection_count"] += 1
-                return {"type": "answer", "message": "Alright 👍 Let’s continue. Ask your doubt."}
+        except budget_guard.BudgetExceeded as e:
+            self.logger.log("BUDGET_EXCEEDED", {"session_id": session_id, "reason": str(e)})
+            return {"type": "error", "message": "Usage limit reached. Please try again later."}
 
-            # ---------- HELP ----------
-            if intent == "HELP":
-                return self._escalate(question, subject, chapter, session_id)
+        except Exception as e:
+            self.logger.log("AGENT_ERROR", str(e))
+            return {"type": "error", "message": "System error."}
 
-            # ---------- EMOTIONAL ----------
-            if intent == "EMOTIONAL":
-                return self._escalate(question, subject, chapter, session_id)
+        finally:
+            self._request.session_id = None
+            self._request.client_ip = None
 
-            # ---------- SUBJECT CHECK ----------
-            if self._is_wrong_subject(question, subject):
-                return {
-                    "type": "answer",
-                    "message": "This seems from a different subject. I can help briefly, but please select correct Subject & Chapter."
-                }
+    def _remember(self, session_id, question, response):
 
-            # ---------- REPETITION ----------
-            if question.lower() == state["last_question"].lower():
-                state["repetition"] += 1
-            else:
-                state["repetition"] = 0
+        if response.get("type") not in ("answer", "escalation"):
+            return
 
-            state["last_question"] = question
+        for role, message in (("student", question), ("tutor", response["message"])):
 
-            # ---------- CONFUSION ----------
-            if intent == "CONFUSION":
-                state["confusion"] += 1
+            # summarizer first: on a new session it seeds itself from memory
+            self.conversation.record(session_id, role, message)
 
-            # ---------- ESCALATION LOGIC ----------
-            if not state["escalated"]:
+            if self.memory:
+                self.memory.store_message(session_id, role, message)
 
-                if state["confusion"] >= 3 or state["repetition"] >= 3:
-                    return self._escalate(question, subject, chapter, session_id)
+    def _respond(self, question, subject, chapter, session_id, state):
 
-            # ---------- HYBRID CASES ----------
-            if self._is_numerical(question) or self._is_advanced(question):
-                answer = self._answer(question, subject, chapter)
+        # ---------- SMALL TALK ----------
+        if self._is_smalltalk(question):
+            return {"type": "smalltalk", "message": "Ask me anything from your chapter 😊"}
 
-                return {
-                    "type": "answer",
-                    "message": clean(answer) + "\n\nWant help from a teacher?"
-                }
+        # ---------- CACHE ----------
+        cached = self.cache.lookup(question, subject, chapter)
+        if cached:
+            self.events.log_event(None, session_id, EVENT_CACHE_HIT, None, None, None)
+            return {"type": "answer", "message": cached}
 
-            if self._is_exam_query(question):
-                answer = self._answer(question, subject, chapter)
+        # ---------- INTENT ----------
+        intent = self._intent(question)
 
-                return {
-                    "type": "answer",
-                    "message": clean(answer) + "\n\nThis topic is important. A teacher can guide you better."
-                }
+        # ---------- USER REJECTION ----------
+        if "dont need teacher" in question.lower():
+            state.rejection_count += 1
+            return {"type": "answer", "message": "Alright 👍 Let’s continue. Ask your doubt."}
 
-            # ---------- NORMAL FLOW ----------
-            if state["confusion"] == 0:
-                answer = self._answer(question, subject, chapter)
-            elif state["confusion"] == 1:
-                answer = self._simplify(question)
-            else:
-                answer = self._example(question)
+        # ---------- HELP ----------
+        if intent == "HELP":
+            return self._escalate(question, subject, chapter, session_id)
 
-            answer = clean(answer)
+        # ---------- EMOTIONAL ----------
+        if intent == "EMOTIONAL":
+            return self._escalate(question, subject, chapter, session_id)
 
-            self.cache.store(question, subject, chapter, answer)
+        # ---------- SUBJECT CHECK ----------
+        if self._is_wrong_subject(question, subject):
+            return {
+                "type": "answer",
+                "message": "This seems from a different subject. I can help briefly, but please select correct Subject & Chapter."
+            }
 
-            return {"type": "answer", "message": answer}
+        # ---------- REPETITION ----------
+        if question.lower() == state.last_question.lower():
+            state.repetition += 1
+        else:
+            state.repetition = 0
 
-        except Exception as e:
-            self.logger.log("AGENT_ERROR", str(e))
-            return {"type": "error", "message": "System error."}
+        state.last_question = question
+
+        # ---------- CONFUSION ----------
+        if intent == "CONFUSION":
+            state.confusion += 1
+
+        # ---------- ESCALATION LOGIC ----------
+        if not state.escalated:
+
+            if state.confusion >= 3 or state.repetition >= 3:
+                return self._escalate(question, subject, chapter, session_id)
+
+        # summary + last turns, within a fixed token budget
+        history = self.conversation.history(session_id)
+
+        # ---------- HYBRID CASES ----------
+        if self._is_numerical(question) or self._is_advanced(question):
+            answer = self._answer(question, subject, chapter, history)
+
+            return {
+                "type": "answer",
+                "message": clean(answer) + "\n\nWant help from a teacher?"
+            }
+
+        if self._is_exam_query(question):
+            answer = self._answer(question, subject, chapter, history)
+
+            return {
+                "type": "answer",
+                "message": clean(answer) + "\n\nThis topic is important. A teacher can guide you better."
+            }
+
+        # ---------- NORMAL FLOW ----------
+        if state.confusion == 0:
+            answer = self._answer(question, subject, chapter, history)
+        elif state.confusion == 1:
+            answer = self._simplify(question, history)
+        else:
+            answer = self._example(question, history)
+
+        answer = clean(answer)
+
+        self.cache.store(question, subject, chapter, answer)
+
+        return {"type": "answer", "message": answer}
 
     # ================= INTENT =================
     def _intent(self, question):
@@ -184,7 +241,11 @@ class StudentSupportAgentV5:
         return False
 
     # ================= ANSWERS =================
-    def _answer(self, q, subject, chapter):
+    @staticmethod
+    def _history_block(history):
+        return f"\nConversation so far:\n{history}\n" if history else ""
+
+    def _answer(self, q, subject, chapter, history=""):
 
         context = self._context(q, subject, chapter)
 
@@ -196,24 +257,24 @@ Key Idea
 Example (if needed)
 
 No latex.
-
+{self._history_block(history)}
 Question: {q}
 Context: {context}
 """)
 
-    def _simplify(self, q):
+    def _simplify(self, q, history=""):
 
         return self._llm(f"""
 Explain very simply in 2 lines.
-
+{self._history_block(history)}
 Question: {q}
 """)
 
-    def _example(self, q):
+    def _example(self, q, history=""):
 
         return self._llm(f"""
 Explain with simple example.
-
+{self._history_block(history)}
 Question: {q}
 """)
 
@@ -225,11 +286,41 @@ Question: {q}
             return ""
 
     def _llm(self, prompt):
-        res = self.client.chat.completions.create(
-            model=OPENAI_MODEL,
-            temperature=0.2,
-            messages=[{"role": "user", "content": prompt}]
+
+        # raises BudgetExceeded; background callers (summaries) have no
+        # session or IP and only count against the global budgets
+        reservation = self.budget.reserve(
+            budget_guard.estimate_tokens(prompt) + budget_guard.RESERVE_COMPLETION_TOKENS,
+            session_id=getattr(self._request, "session_id", None),
+            client_ip=getattr(self._request, "client_ip", None)
         )
+
+        started = time.perf_counter()
+
+        try:
+            res = self.client.chat.completions.create(
+                model=OPENAI_MODEL,
+                temperature=0.2,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        except Exception:
+            self.budget.release(reservation)
+            raise
+
+        usage = res.usage
+
+        # without reported usage the estimate stays counted
+        if usage:
+            self.budget.reconcile(reservation, usage.total_tokens)
+
+        self.logger.log("OPENAI_USAGE", {
+            "model": OPENAI_MODEL,
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+            "latency_ms": round(1000 * (time.perf_counter() - started), 1)
+        })
+
         return res.choices[0].message.content
 
     def _is_smalltalk(self, q):
@@ -238,29 +329,26 @@ Question: {q}
     # ================= ESCALATION =================
     def _escalate(self, q, s, c, sid):
 
-        key = f"{sid}_{s}_{c}"
-        state = self.session_state[key]
+        state = self.session_state.get(SessionStateStore.key(sid, s, c))
 
-        if state["rejection_count"] >= 2:
+        if state.rejection_count >= 2:
             return {"type": "answer", "message": "Let’s continue learning 👍"}
 
-        state["escalated"] = True
-
-        try:
-            self.lead_persistence.upsert_lead(
-                session_id=sid,
-                subject=s,
-                chapter=c,
-                question=q,
-                escalation_code="ESC",
-                escalation_reason="conversion_trigger",
-                confidence=0.9,
-                engagement_score=0,
-                intent_strength=0.9,
-                status="NEW"
-            )
-        except:
-            pass
+        state.escalated = True
+
+        # persisted in the background — never delays the response
+        self.lead_writer.submit(
+            session_id=sid,
+            subject=s,
+            chapter=c,
+            question=q,
+            escalation_code="ESC",
+            escalation_reason="conversion_trigger",
+            confidence=0.9,
+            engagement_score=0,
+            intent_strength=0.9,
+            status="NEW"
+        )
 
         return {
             "type": "escalation",
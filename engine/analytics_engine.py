@@ -1,18 +1,11 @@
-import os
-import psycopg2
+from services import db_pool
 
 
 class AnalyticsEngine:
 
     def __init__(self):
 
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-        )
+        self.pool = db_pool.get_pool()
 
     # ============================================
     # TOTAL LEADS
@@ -20,17 +13,19 @@ class AnalyticsEngine:
 
     def total_leads(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
 
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM leads
-            """
-        )
+            cursor = conn.cursor()
 
-        result = cursor.fetchone()[0]
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM leads
+                """
+            )
 
-        cursor.close()
+            result = cursor.fetchone()[0]
+
+            cursor.close()
 
         return result
 
@@ -40,20 +35,23 @@ class AnalyticsEngine:
 
     def escalation_distribution(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
+
+            cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            SELECT event_code, COUNT(*)
-            FROM lead_events
-            GROUP BY event_code
-            ORDER BY COUNT(*) DESC
-            """
-        )
+            cursor.execute(
+                """
+                SELECT event_code, COUNT(*)
+                FROM lead_events
+                WHERE event_type = 'ESCALATION'
+                GROUP BY event_code
+                ORDER BY COUNT(*) DESC
+                """
+            )
 
-        rows = cursor.fetchall()
+            rows = cursor.fetchall()
 
-        cursor.close()
+            cursor.close()
 
         return rows
 
@@ -63,26 +61,28 @@ class AnalyticsEngine:
 
     def lead_quality_distribution(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
+
+            cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            SELECT
-                CASE
-                    WHEN confidence >= 80 THEN 'HIGH'
-                    WHEN confidence >= 50 THEN 'MEDIUM'
-                    ELSE 'LOW'
-                END AS quality,
-                COUNT(*)
-            FROM leads
-            GROUP BY quality
-            ORDER BY quality
-            """
-        )
+            cursor.execute(
+                """
+                SELECT
+                    CASE
+                        WHEN confidence >= 80 THEN 'HIGH'
+                        WHEN confidence >= 50 THEN 'MEDIUM'
+                        ELSE 'LOW'
+                    END AS quality,
+                    COUNT(*)
+                FROM leads
+                GROUP BY quality
+                ORDER BY quality
+                """
+            )
 
-        rows = cursor.fetchall()
+            rows = cursor.fetchall()
 
-        cursor.close()
+            cursor.close()
 
         return rows
 
@@ -92,20 +92,22 @@ class AnalyticsEngine:
 
     def subject_demand(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
 
-        cursor.execute(
-            """
-            SELECT subject, COUNT(*)
-            FROM leads
-            GROUP BY subject
-            ORDER BY COUNT(*) DESC
-            """
-        )
+            cursor = conn.cursor()
 
-        rows = cursor.fetchall()
+            cursor.execute(
+                """
+                SELECT subject, COUNT(*)
+                FROM leads
+                GROUP BY subject
+                ORDER BY COUNT(*) DESC
+                """
+            )
 
-        cursor.close()
+            rows = cursor.fetchall()
+
+            cursor.close()
 
         return rows
 
@@ -115,20 +117,22 @@ class AnalyticsEngine:
 
     def chapter_demand(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
+
+            cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            SELECT chapter, COUNT(*)
-            FROM leads
-            GROUP BY chapter
-            ORDER BY COUNT(*) DESC
-            """
-        )
+            cursor.execute(
+                """
+                SELECT chapter, COUNT(*)
+                FROM leads
+                GROUP BY chapter
+                ORDER BY COUNT(*) DESC
+                """
+            )
 
-        rows = cursor.fetchall()
+            rows = cursor.fetchall()
 
-        cursor.close()
+            cursor.close()
 
         return rows
 
@@ -138,19 +142,22 @@ class AnalyticsEngine:
 
     def escalation_timeline(self):
 
-        cursor = self.conn.cursor()
+        with self.pool.connection() as conn:
+
+            cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            SELECT DATE(created_at), COUNT(*)
-            FROM lead_events
-            GROUP BY DATE(created_at)
-            ORDER BY DATE(created_at)
-            """
-        )
+            cursor.execute(
+                """
+                SELECT DATE(created_at), COUNT(*)
+                FROM lead_events
+                WHERE event_type = 'ESCALATION'
+                GROUP BY DATE(created_at)
+                ORDER BY DATE(created_at)
+                """
+            )
 
-        rows = cursor.fetchall()
+            rows = cursor.fetchall()
 
-        cursor.close()
+            cursor.close()
 
         return rows
\ No newline at end of file
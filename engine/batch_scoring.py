@@ -0,0 +1,154 @@
+"""
+NumPy versions of the per-session scoring rules, for replaying history.
+
+Each function mirrors one engine method and takes equal-length 1-D
+arrays (one row per turn / event) instead of scalars. Thresholds
+default to the live engines' values so a replay with no overrides
+reproduces production decisions.
+"""
+
+import numpy as np
+
+from engine.economics_engine import EscalationEconomicsEngine
+from engine.lead_engine import LeadEngine
+from engine.ux_lead_engine import UXLeadEngine
+
+
+PRIORITY_LABELS = np.array(["LOW", "MEDIUM", "HIGH"])
+
+
+def _f(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+# =====================================
+# EscalationEconomicsEngine
+# =====================================
+
+def lead_quality_scores(confidence, engagement_score, intent_strength):
+    """compute_lead_quality_score for every row."""
+
+    e = EscalationEconomicsEngine
+
+    return np.round(
+        _f(confidence) * e.CONFIDENCE_WEIGHT
+        + _f(engagement_score) * e.ENGAGEMENT_WEIGHT
+        + _f(intent_strength) * e.INTENT_WEIGHT,
+        2
+    )
+
+
+def priority_codes(lead_scores,
+                   high=EscalationEconomicsEngine.HIGH_PRIORITY_SCORE,
+                   medium=EscalationEconomicsEngine.MEDIUM_PRIORITY_SCORE):
+    """determine_priority as 0=LOW, 1=MEDIUM, 2=HIGH (index into PRIORITY_LABELS)."""
+
+    scores = _f(lead_scores)
+
+    return (scores >= medium).astype(np.int8) + (scores >= high).astype(np.int8)
+
+
+# =====================================
+# EngagementEngine
+# =====================================
+
+def engagement_scores(question_count, signal_strength, repeat_confusion):
+    """EngagementEngine.compute_score for every row."""
+
+    questions = _f(question_count)
+
+    score = np.select(
+        [questions >= 10, questions >= 5, questions >= 2],
+        [40.0, 25.0, 10.0],
+        default=0.0
+    )
+
+    score += _f(signal_strength) * 4
+    score += np.asarray(repeat_confusion, dtype=bool) * 20.0
+
+    return np.minimum(score, 100.0)
+
+
+# =====================================
+# UXLeadEngine / LeadEngine
+# =====================================
+
+def ux_eligible(escalation_confidence, engagement_score,
+                min_confidence=UXLeadEngine.MIN_ESCALATION_CONFIDENCE,
+                min_engagement=UXLeadEngine.MIN_ENGAGEMENT_SCORE,
+                min_combined=UXLeadEngine.MIN_COMBINED_SCORE):
+    """
+    UXLeadEngine.evaluate's threshold test per row. The "only prompt
+    once per session" rule is applied with first_per_session().
+    """
+
+    confidence = _f(escalation_confidence)
+    engagement = _f(engagement_score)
+
+    return (
+        (confidence >= min_confidence)
+        & (engagement >= min_engagement)
+        & (confidence + engagement >= min_combined)
+    )
+
+
+def lead_qualified(escalation_confidence, threshold=LeadEngine.LEAD_THRESHOLD):
+    """LeadEngine.evaluate_lead's threshold test per row."""
+
+    return _f(escalation_confidence) >= threshold
+
+
+def first_per_session(session_codes, mask):
+    """
+    Keep only the first True row per session (rows in time order), the
+    way the engines ignore repeat qualifications.
+
+    `session_codes` are small ints, e.g. from np.unique(..., return_inverse=True).
+    """
+
+    rows = np.flatnonzero(mask)
+
+    if not len(rows):
+        return np.zeros(len(mask), dtype=bool)
+
+    _, first = np.unique(np.asarray(session_codes)[rows], return_index=True)
+
+    result = np.zeros(len(mask), dtype=bool)
+    result[rows[first]] = True
+
+    return result
+
+
+def running_count(session_codes, mask):
+    """
+    Per row, how many True rows its session has had so far (this row
+    included), rows in time order.
+    """
+
+    codes = np.asarray(session_codes)
+    hits = np.asarray(mask, dtype=np.int64)
+
+    if not len(codes):
+        return np.zeros(0, dtype=np.int64)
+
+    # group rows by session, keeping time order within each group
+    order = np.argsort(codes, kind="stable")
+
+    totals = np.cumsum(hits[order])
+
+    # running total where each session's group starts, minus that row's own hit
+    starts = np.r_[True, codes[order][1:] != codes[order][:-1]]
+    offsets = np.maximum.accumulate(np.where(starts, np.arange(len(codes)), 0))
+
+    counts = np.empty(len(codes), dtype=np.int64)
+    counts[order] = totals - totals[offsets] + hits[order][offsets]
+
+    return counts
+
+
+def sessions_with(session_codes, mask, n_sessions):
+    """Number of distinct sessions with at least one True row."""
+
+    hits = np.bincount(np.asarray(session_codes)[mask], minlength=n_sessions)
+
+    return int(np.count_nonzero(hits))
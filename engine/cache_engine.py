@@ -1,9 +1,10 @@
 import os
-import psycopg2
 import numpy as np
 import json
 from langchain_openai import OpenAIEmbeddings
 
+from services import db_pool
+
 SIMILARITY_THRESHOLD = 0.85
 CACHE_SCAN_LIMIT = 200
 
@@ -17,9 +18,6 @@ class CacheEngine:
 
         self.embedder = OpenAIEmbeddings(model="text-embedding-3-small")
 
-    def _connect(self):
-        return psycopg2.connect(self.database_url)
-
     def cosine_similarity(self, a, b):
         a = np.array(a)
         b = np.array(b)
@@ -33,23 +31,23 @@ class CacheEngine:
         try:
             query_embedding = self.embedder.embed_query(question)
 
-            conn = self._connect()
-            cur = conn.cursor()
+            with db_pool.connection() as conn:
 
-            cur.execute(
-                """
-                SELECT embedding, answer
-                FROM qa_cache
-                WHERE subject = %s
-                ORDER BY created_at DESC
-                LIMIT %s
-                """,
-                (subject, CACHE_SCAN_LIMIT)
-            )
+                cur = conn.cursor()
+
+                cur.execute(
+                    """
+                    SELECT embedding, answer
+                    FROM qa_cache
+                    WHERE subject = %s
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                    """,
+                    (subject, CACHE_SCAN_LIMIT)
+                )
 
-            rows = cur.fetchall()
-            cur.close()
-            conn.close()
+                rows = cur.fetchall()
+                cur.close()
 
         except Exception:
             return None
@@ -78,27 +76,26 @@ class CacheEngine:
         try:
             embedding = self.embedder.embed_query(question)
 
-            conn = self._connect()
-            cur = conn.cursor()
-
-            cur.execute(
-                """
-                INSERT INTO qa_cache
-                (question, embedding, answer, subject, chapter)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (
-                    question,
-                    json.dumps(embedding),
-                    answer,
-                    subject,
-                    chapter
+            with db_pool.connection() as conn:
+
+                cur = conn.cursor()
+
+                cur.execute(
+                    """
+                    INSERT INTO qa_cache
+                    (question, embedding, answer, subject, chapter)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    (
+                        question,
+                        json.dumps(embedding),
+                        answer,
+                        subject,
+                        chapter
+                    )
                 )
-            )
 
-            conn.commit()
-            cur.close()
-            conn.close()
+                cur.close()
 
         except Exception:
             pass
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+from datetime import datetime
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHROMA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "chroma_db"))
+
+# collection served when no pointer has been written yet
+DEFAULT_COLLECTION = "curionest"
+
+POINTER_FILE = "active_collection.json"
+
+# versioned builds: curionest_20261019T101500
+VERSION_PATTERN = re.compile(r"^curionest_\d{8}T\d{6}$")
+
+# versions retained (including the active one) after a switchover
+KEEP_VERSIONS = int(os.getenv("CHROMA_KEEP_VERSIONS", "2"))
+
+
+# =====================================================
+# POINTER
+# =====================================================
+
+def pointer_path(chroma_dir=CHROMA_DIR):
+    return os.path.join(chroma_dir, POINTER_FILE)
+
+
+def pointer_mtime(chroma_dir=CHROMA_DIR):
+
+    try:
+        return os.stat(pointer_path(chroma_dir)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def read_active(chroma_dir=CHROMA_DIR):
+
+    try:
+        with open(pointer_path(chroma_dir), "r", encoding="utf-8") as f:
+            return json.load(f).get("collection") or DEFAULT_COLLECTION
+
+    except (FileNotFoundError, ValueError):
+        return DEFAULT_COLLECTION
+
+
+def set_active(name, chroma_dir=CHROMA_DIR):
+    """Atomically repoint serving to `name`."""
+
+    os.makedirs(chroma_dir, exist_ok=True)
+
+    previous = read_active(chroma_dir)
+
+    path = pointer_path(chroma_dir)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "collection": name,
+            "previous": previous,
+            "switched_at": datetime.utcnow().isoformat()
+        }, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+    return previous
+
+
+# =====================================================
+# VERSIONS
+# =====================================================
+
+def new_version_name():
+    return f"{DEFAULT_COLLECTION}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
+
+
+def _collection_names(client):
+
+    # chromadb returns names (0.6) or Collection objects (older / 1.x)
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def list_versions(client):
+    return sorted(n for n in _collection_names(client) if VERSION_PATTERN.match(n))
+
+
+def collect_garbage(client, keep=KEEP_VERSIONS, chroma_dir=CHROMA_DIR):
+    """
+    Drop old versioned collections, keeping the newest `keep`.
+
+    The active collection is never dropped.
+    """
+
+    active = read_active(chroma_dir)
+
+    versions = [v for v in list_versions(client) if v != active]
+
+    # active counts towards the retained versions
+    stale = versions[:max(len(versions) - (keep - 1), 0)]
+
+    for name in stale:
+        client.delete_collection(name)
+
+    return stale
+
+
+# =====================================================
+# VALIDATION
+# =====================================================
+
+def validate_chapter(collection, subject, chapter):
+    """
+    Check a chapter has chunks and that its vectors retrieve themselves.
+    """
+
+    where = {"$and": [{"subject": subject}, {"chapter": chapter}]}
+
+    try:
+
+        res = collection.get(where=where, include=[])
+        count = len(res.get("ids") or [])
+
+        if not count:
+            return {"valid": False, "count": 0, "reason": "no chunks"}
+
+        sample = collection.get(
+            where=where,
+            limit=1,
+            include=["embeddings"]
+        )
+
+        embeddings = sample.get("embeddings")
+
+        if embeddings is None or len(embeddings) == 0:
+            return {"valid": False, "count": count, "reason": "missing embeddings"}
+
+        probe = collection.query(
+            query_embeddings=[list(embeddings[0])],
+            n_results=1,
+            where=where,
+            include=["distances"]
+        )
+
+        similarity = round(1 - probe["distances"][0][0], 4)
+
+        # identical duplicates may win the probe, so compare scores not ids
+        if similarity < 0.99:
+            return {
+                "valid": False,
+                "count": count,
+                "similarity": similarity,
+                "reason": "self-retrieval mismatch"
+            }
+
+        return {"valid": True, "count": count, "similarity": similarity}
+
+    except Exception as e:
+
+        return {"valid": False, "count": 0, "reason": str(e)}
@@ -0,0 +1,362 @@
+import os
+import queue
+import threading
+from collections import OrderedDict, deque
+
+
+# messages (student + tutor) passed verbatim — two turns by default
+RECENT_MESSAGES = int(os.getenv("CONVERSATION_RECENT_MESSAGES", "4"))
+
+# hard cap on the history block added to a prompt (summary + recent)
+HISTORY_TOKEN_BUDGET = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "600"))
+
+# the rolling summary is asked to stay under this
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))
+
+# sessions whose summary a worker keeps (least recently used evicted)
+MAX_SESSIONS = int(os.getenv("CONVERSATION_SUMMARY_MAX_SESSIONS", "10000"))
+
+# pending summary refreshes; beyond this they are skipped, not queued
+QUEUE_SIZE = int(os.getenv("CONVERSATION_SUMMARY_QUEUE_SIZE", "1000"))
+
+# aged-out messages held per session while a refresh is pending or failing
+MAX_OVERFLOW = 20
+
+
+def estimate_tokens(text):
+    """~4 characters per token — close enough for budgeting English prompts."""
+    return len(text) // 4 + 1
+
+
+def clip(text, tokens):
+
+    limit = tokens * 4
+
+    if len(text) <= limit:
+        return text
+
+    return text[:max(limit - 3, 0)] + "..."
+
+
+class _Conversation:
+
+    __slots__ = ("recent", "overflow", "summary", "refreshing", "generation")
+
+    def __init__(self, recent=()):
+        # (role, message), oldest first
+        self.recent = deque(recent, maxlen=RECENT_MESSAGES)
+        # messages pushed out of `recent`, not yet folded into `summary`
+        self.overflow = []
+        self.summary = ""
+        self.refreshing = False
+        # session_memory.generation() this state was loaded at; None = never
+        self.generation = None
+
+
+class ConversationSummarizer:
+    """
+    Bounded conversation context for prompts.
+
+    Keeps the last RECENT_MESSAGES messages verbatim per session. Older
+    messages are folded into a rolling summary by a single background
+    worker (one LLM call per refresh, never on the request path), so
+    the history block stays within HISTORY_TOKEN_BUDGET however long
+    the session runs.
+
+    With a session_memory the summary is stored after each refresh, and
+    when the memory reloads a session (another worker handled turns)
+    the recent turns and summary are reloaded too.
+    """
+
+    def __init__(self, llm, session_memory=None):
+
+        # llm(prompt) → text
+        self.llm = llm
+        self.session_memory = session_memory
+
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._skipped = 0
+        self._reloads = 0
+
+        self._init_worker()
+
+    def _init_worker(self):
+
+        self._pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="conversation-summary",
+            daemon=True
+        )
+        self._thread.start()
+
+    # ==========================
+    # STATE
+    # ==========================
+
+    def _conversation(self, session_id):
+        """Caller holds _lock."""
+
+        conv = self._conversations.get(session_id)
+
+        if conv is None:
+
+            conv = self._conversations[session_id] = _Conversation()
+
+            while len(self._conversations) > MAX_SESSIONS:
+                self._conversations.popitem(last=False)
+
+        else:
+            self._conversations.move_to_end(session_id)
+
+        return conv
+
+    def _sync(self, session_id, first_sight_only=False):
+        """
+        (Re)load recent turns and the stored summary when this worker
+        hasn't seen the session, or session_memory reloaded it since.
+        """
+
+        if first_sight_only:
+            with self._lock:
+                if session_id in self._conversations:
+                    return
+
+        recent = []
+        generation = 0
+
+        if self.session_memory is not None:
+            recent = [
+                (m["role"], m["message"])
+                for m in self.session_memory.get_recent_messages(session_id, RECENT_MESSAGES)
+            ]
+            generation = self.session_memory.generation(session_id)
+
+        with self._lock:
+            conv = self._conversations.get(session_id)
+            if conv is not None and conv.generation == generation:
+                return
+
+        summary = None
+
+        if self.session_memory is not None:
+            try:
+                summary = self.session_memory.load_summary(session_id)
+            except Exception as e:
+                print("CONVERSATION SUMMARY LOAD ERROR:", e)
+
+        with self._lock:
+
+            conv = self._conversation(session_id)
+
+            if conv.generation == generation:
+                return
+
+            if conv.generation is not None:
+                self._reloads += 1
+
+            conv.recent.clear()
+            conv.recent.extend(recent)
+            conv.overflow = []
+
+            if summary is not None:
+                conv.summary = summary
+
+            conv.generation = generation
+
+    # ==========================
+    # RECORD
+    # ==========================
+
+    def record(self, session_id, role, message):
+
+        # forked child: the parent's worker thread doesn't exist here
+        if os.getpid() != self._pid:
+            self._init_worker()
+
+        # once per session per worker; history() does the re-checks
+        self._sync(session_id, first_sight_only=True)
+
+        with self._lock:
+
+            conv = self._conversation(session_id)
+
+            if len(conv.recent) == conv.recent.maxlen:
+                conv.overflow.append(conv.recent[0])
+                del conv.overflow[:-MAX_OVERFLOW]
+
+            conv.recent.append((role, message))
+
+            # a full turn has aged out — refresh, one job per session at a time
+            if len(conv.overflow) < 2 or conv.refreshing:
+                return
+
+            conv.refreshing = True
+
+        try:
+            self._queue.put_nowait(session_id)
+
+        except queue.Full:
+
+            with self._lock:
+                conv.refreshing = False
+                self._skipped += 1
+
+    # ==========================
+    # READ
+    # ==========================
+
+    def history(self, session_id):
+        """
+        Prompt-ready history (summary + recent turns) within
+        HISTORY_TOKEN_BUDGET, or "" for a new session.
+        """
+
+        self._sync(session_id)
+
+        with self._lock:
+            conv = self._conversation(session_id)
+            summary = conv.summary
+            recent = list(conv.recent)
+
+        parts = []
+        budget = HISTORY_TOKEN_BUDGET
+
+        if summary:
+            summary = clip(summary, min(SUMMARY_TOKEN_BUDGET, budget))
+            budget -= estimate_tokens(summary)
+            parts.append(f"Earlier in this conversation: {summary}")
+
+        lines = []
+
+        # newest first, so the oldest verbatim turns are what gets cut
+        for role, message in reversed(recent):
+
+            line = f"{'Student' if role == 'student' else 'Tutor'}: {message}"
+            cost = estimate_tokens(line)
+
+            if cost > budget:
+                line = clip(line, budget)
+                cost = estimate_tokens(line)
+
+            if budget <= 0 or cost > budget:
+                break
+
+            lines.append(line)
+            budget -= cost
+
+        if lines:
+            parts.append("Recent turns:\n" + "\n".join(reversed(lines)))
+
+        return "\n\n".join(parts)
+
+    # ==========================
+    # BACKGROUND REFRESH
+    # ==========================
+
+    def _run(self):
+
+        while True:
+
+            session_id = self._queue.get()
+
+            with self._lock:
+
+                conv = self._conversations.get(session_id)
+
+                if conv is None:
+                    continue
+
+                summary = conv.summary
+                folding = conv.overflow
+                conv.overflow = []
+                generation = conv.generation
+
+            try:
+                new_summary = self._summarize(summary, folding)
+
+            except Exception as e:
+
+                print("CONVERSATION SUMMARY ERROR:", e)
+
+                with self._lock:
+                    self._refresh_failures += 1
+                    if conv.generation == generation:
+                        conv.overflow = (folding + conv.overflow)[-MAX_OVERFLOW:]
+                    conv.refreshing = False
+
+                continue
+
+            with self._lock:
+
+                self._refreshes += 1
+
+                # reloaded meanwhile: the stored summary is newer than ours
+                current = conv.generation == generation
+
+                if current:
+                    conv.summary = new_summary
+
+                conv.refreshing = False
+
+                # more aged out while we were summarizing
+                again = len(conv.overflow) >= 2
+
+                if again:
+                    conv.refreshing = True
+
+            if current and self.session_memory is not None:
+                try:
+                    self.session_memory.save_summary(session_id, new_summary)
+                except Exception as e:
+                    print("CONVERSATION SUMMARY SAVE ERROR:", e)
+
+            if again:
+                try:
+                    self._queue.put_nowait(session_id)
+                except queue.Full:
+                    with self._lock:
+                        conv.refreshing = False
+                        self._skipped += 1
+
+    def _summarize(self, summary, messages):
+
+        transcript = "\n".join(
+            f"{'Student' if role == 'student' else 'Tutor'}: {clip(message, 200)}"
+            for role, message in messages
+        )
+
+        return clip(self.llm(f"""
+Update the running summary of a tutoring conversation.
+Keep topics covered, what the student struggled with, and open questions.
+At most {SUMMARY_TOKEN_BUDGET * 3 // 4} words. Plain text.
+
+Current summary: {summary or "(none)"}
+
+New turns:
+{transcript}
+""").strip(), SUMMARY_TOKEN_BUDGET)
+
+    # ==========================
+    # METRICS
+    # ==========================
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "sessions": len(self._conversations),
+                "queued": self._queue.qsize(),
+                "refreshes": self._refreshes,
+                "refresh_failures": self._refresh_failures,
+                "skipped": self._skipped,
+                "reloads": self._reloads,
+            }
@@ -1,5 +1,4 @@
-import os
-import psycopg2
+from services import db_pool
 from services.logging_service import LoggingService
 
 
@@ -9,22 +8,7 @@ class DomainEngine:
 
         self.logger = LoggingService()
 
-        try:
-
-            self.conn = psycopg2.connect(
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT"),
-                dbname=os.getenv("DB_NAME"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-            )
-
-            self.conn.autocommit = True
-
-        except Exception as e:
-
-            self.logger.log("DOMAIN_DB_CONNECTION_ERROR", str(e))
-            self.conn = None
+        self.pool = db_pool.get_pool()
 
 
     # =====================================
@@ -63,29 +47,28 @@ class DomainEngine:
 
     def get_domain_config(self):
 
-        if not self.conn:
-            return {}
-
         try:
 
-            cursor = self.conn.cursor()
+            with self.pool.connection(autocommit=True) as conn:
+
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                SELECT
-                    d.name as domain,
-                    b.name as board,
-                    c.name as category,
-                    t.name as topic
-                FROM domains d
-                JOIN boards b ON b.domain_id = d.id
-                JOIN categories c ON c.board_id = b.id
-                JOIN topics t ON t.category_id = c.id
-                ORDER BY d.name, b.name, c.name
-            """)
+                cursor.execute("""
+                    SELECT
+                        d.name as domain,
+                        b.name as board,
+                        c.name as category,
+                        t.name as topic
+                    FROM domains d
+                    JOIN boards b ON b.domain_id = d.id
+                    JOIN categories c ON c.board_id = b.id
+                    JOIN topics t ON t.category_id = c.id
+                    ORDER BY d.name, b.name, c.name
+                """)
 
-            rows = cursor.fetchall()
+                rows = cursor.fetchall()
 
-            cursor.close()
+                cursor.close()
 
             config = {}
 
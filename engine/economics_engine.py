@@ -1,15 +1,38 @@
-import time
+import os
+
+from engine import shared_counter
+
+
+# sqlite (workers on one host, default) | postgres (all hosts) | memory (per worker)
+BUDGET_BACKEND = os.getenv("ESCALATION_BUDGET_BACKEND", shared_counter.BACKEND).lower()
+
+MAX_ESCALATIONS_PER_HOUR = int(os.getenv("ESCALATION_BUDGET_PER_HOUR", "20"))
 
 
 class EscalationEconomicsEngine:
 
+    # lead quality score weights
+    CONFIDENCE_WEIGHT = 0.6
+    ENGAGEMENT_WEIGHT = 1.2
+    INTENT_WEIGHT = 8
+
+    # priority tier cutoffs
+    HIGH_PRIORITY_SCORE = 70
+    MEDIUM_PRIORITY_SCORE = 45
+
     def __init__(self):
 
         # escalation budget
-        self.max_escalations_per_hour = 20
+        self.max_escalations_per_hour = MAX_ESCALATIONS_PER_HOUR
 
-        # tracking
-        self.escalation_timestamps = []
+        # last hour in per-minute buckets, shared by every engine in the
+        # process and, with a shared backend, by every worker
+        self.escalations = shared_counter.get_sliding_window(
+            "escalations",
+            window_seconds=3600,
+            bucket_seconds=60,
+            backend=BUDGET_BACKEND
+        )
 
     # =============================
     # LEAD QUALITY SCORE
@@ -24,9 +47,9 @@ class EscalationEconomicsEngine:
 
         score = 0
 
-        score += confidence * 0.6
-        score += engagement_score * 1.2
-        score += intent_strength * 8
+        score += confidence * self.CONFIDENCE_WEIGHT
+        score += engagement_score * self.ENGAGEMENT_WEIGHT
+        score += intent_strength * self.INTENT_WEIGHT
 
         return round(score, 2)
 
@@ -36,15 +59,7 @@ class EscalationEconomicsEngine:
 
     def escalation_budget_available(self):
 
-        current_time = time.time()
-
-        # remove timestamps older than 1 hour
-        self.escalation_timestamps = [
-            ts for ts in self.escalation_timestamps
-            if current_time - ts < 3600
-        ]
-
-        return len(self.escalation_timestamps) < self.max_escalations_per_hour
+        return self.escalations.available(self.max_escalations_per_hour)
 
     # =============================
     # REGISTER ESCALATION
@@ -52,7 +67,7 @@ class EscalationEconomicsEngine:
 
     def register_escalation(self):
 
-        self.escalation_timestamps.append(time.time())
+        self.escalations.add()
 
     # =============================
     # PRIORITY TIER
@@ -60,10 +75,10 @@ class EscalationEconomicsEngine:
 
     def determine_priority(self, lead_score):
 
-        if lead_score >= 70:
+        if lead_score >= self.HIGH_PRIORITY_SCORE:
             return "HIGH"
 
-        if lead_score >= 45:
+        if lead_score >= self.MEDIUM_PRIORITY_SCORE:
             return "MEDIUM"
 
         return "LOW"
\ No newline at end of file
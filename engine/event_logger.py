@@ -1,20 +1,303 @@
+import io
 import os
+import csv
+import time
+import uuid
+import atexit
+import threading
+from collections import deque
+
 import psycopg2
 
+from services import db_pool
 
-class EventLogger:
+
+# events held in memory at most; beyond this new events are dropped
+BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+
+# flush as soon as this many events are waiting ...
+FLUSH_BATCH_SIZE = int(os.getenv("EVENT_FLUSH_BATCH_SIZE", "500"))
+
+# ... or at least this often
+FLUSH_INTERVAL_SECONDS = float(os.getenv("EVENT_FLUSH_INTERVAL_SECONDS", "2"))
+
+COLUMNS = (
+    "lead_id",
+    "session_id",
+    "event_type",
+    "event_code",
+    "confidence",
+    "engagement_score",
+)
+
+COPY_SQL = f"COPY lead_events ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# lead_events.session_id is VARCHAR(100)
+MAX_SESSION_ID_LENGTH = 100
+
+# code / type values are free text; keep a runaway value out of the table
+MAX_TEXT_LENGTH = 200
+
+# errors caused by a row's contents (too long, bad uuid, missing lead),
+# as opposed to the database being unreachable
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+class EventSink:
+    """
+    Process-wide buffer in front of lead_events.
+
+    append() is a bounded in-memory enqueue; a background thread
+    flushes by size or time with a single COPY per batch. A batch
+    rejected for its contents is split in halves until the bad rows
+    are isolated; those are dropped and counted, the rest written.
+    Batches that fail for any other reason (DB down) are put back,
+    space permitting, and retried on the next flush. Events that don't
+    fit are dropped and counted.
+    """
 
     def __init__(self):
 
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
+        self._init_state()
+
+        atexit.register(self.close)
+
+    def _init_state(self):
+
+        self._pid = os.getpid()
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+        self._enqueued = 0
+        self._flushed = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._flush_failures = 0
+        self._last_flush_ms = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="event-sink",
+            daemon=True
         )
+        self._thread.start()
+
+    # =============================
+    # HOT PATH
+    # =============================
+
+    def append(self, row):
+
+        # forked child: the parent's flusher thread doesn't exist here
+        if os.getpid() != self._pid:
+            self._init_state()
+
+        with self._lock:
+
+            if len(self._buffer) >= BUFFER_SIZE:
+                self._dropped += 1
+                return False
+
+            self._buffer.append(row)
+            self._enqueued += 1
+
+            if len(self._buffer) >= FLUSH_BATCH_SIZE:
+                self._wakeup.set()
+
+        return True
+
+    # =============================
+    # FLUSHING
+    # =============================
+
+    def _run(self):
+
+        while not self._stopped.is_set():
+
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+            self.flush()
+
+    def flush(self):
+
+        with self._flush_lock:
+
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+
+            try:
+                written, rejected = self._copy_isolating(rows)
+
+            except Exception as e:
+
+                print("EVENT FLUSH ERROR:", e)
+
+                with self._lock:
+
+                    self._flush_failures += 1
+
+                    # oldest first, ahead of anything appended meanwhile
+                    space = max(BUFFER_SIZE - len(self._buffer), 0)
+                    keep = rows[:space]
+
+                    self._buffer.extendleft(reversed(keep))
+                    self._dropped += len(rows) - len(keep)
+
+                return 0
+
+            with self._lock:
+                self._flushed += written
+                self._rejected += rejected
+                self._last_flush_ms = round(1000 * (time.perf_counter() - started), 3)
+
+            return written
+
+    def _copy_isolating(self, rows):
+        """
+        COPY rows, bisecting on row-level errors. Returns (written,
+        rejected). Any other error propagates — but only before the first
+        chunk lands, so a retried batch is never partly duplicated.
+        """
+
+        try:
+            self._copy(rows)
+            return len(rows), 0
+
+        except ROW_ERRORS as e:
 
-        self.conn.autocommit = True
+            if len(rows) == 1:
+                print("EVENT REJECTED:", e)
+                return 0, 1
+
+        middle = len(rows) // 2
+
+        written, rejected = self._copy_isolating(rows[:middle])
+
+        try:
+            w, r = self._copy_isolating(rows[middle:])
+
+        except Exception as e:
+
+            # the first half is in; the rest can't be requeued without
+            # reordering, so count it as dropped
+            print("EVENT FLUSH ERROR:", e)
+
+            with self._lock:
+                self._flush_failures += 1
+                self._dropped += len(rows) - middle
+
+            return written, rejected
+
+        return written + w, rejected + r
+
+    def _copy(self, rows):
+
+        data = io.StringIO()
+        writer = csv.writer(data)
+
+        # None → empty unquoted field → NULL under FORMAT csv
+        writer.writerows(rows)
+        data.seek(0)
+
+        with db_pool.connection() as conn:
+
+            cursor = conn.cursor()
+            cursor.copy_expert(COPY_SQL, data)
+            cursor.close()
+
+    def close(self):
+
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(5)
+
+        self.flush()
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "buffered": len(self._buffer),
+                "enqueued": self._enqueued,
+                "flushed": self._flushed,
+                "dropped": self._dropped,
+                "rejected": self._rejected,
+                "flush_failures": self._flush_failures,
+                "last_flush_ms": self._last_flush_ms,
+            }
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_event_sink():
+
+    global _sink
+
+    if _sink is None:
+
+        with _sink_lock:
+
+            if _sink is None:
+                _sink = EventSink()
+
+    return _sink
+
+
+# lead_events.event_type values written through the sink; ESCALATION
+# rows are inserted by LeadPersistenceService.upsert_lead itself
+EVENT_QUESTION = "QUESTION"
+EVENT_CACHE_HIT = "CACHE_HIT"
+EVENT_CONTACT_CAPTURED = "CONTACT_CAPTURED"
+
+
+def _text(value, limit):
+
+    if value is None:
+        return None
+
+    return str(value)[:limit]
+
+
+def _float_or_none(value):
+
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _uuid_or_none(value):
+
+    if value is None:
+        return None
+
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class EventLogger:
+
+    def __init__(self):
+
+        self.sink = get_event_sink()
 
     def log_event(
         self,
@@ -26,28 +309,15 @@ class EventLogger:
         engagement_score
     ):
 
-        cursor = self.conn.cursor()
-
-        cursor.execute(
-            """
-            INSERT INTO lead_events (
-                lead_id,
-                session_id,
-                event_type,
-                event_code,
-                confidence,
-                engagement_score
-            )
-            VALUES (%s,%s,%s,%s,%s,%s)
-            """,
-            (
-                lead_id,
-                session_id,
-                event_type,
-                event_code,
-                confidence,
-                engagement_score
-            )
-        )
+        return self.sink.append((
+            _uuid_or_none(lead_id),
+            _text(session_id, MAX_SESSION_ID_LENGTH),
+            _text(event_type, MAX_TEXT_LENGTH),
+            _text(event_code, MAX_TEXT_LENGTH),
+            _float_or_none(confidence),
+            _float_or_none(engagement_score)
+        ))
+
+    def flush(self):
 
-        cursor.close()
\ No newline at end of file
+        return self.sink.flush()
@@ -1,19 +1,177 @@
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import time
+import atexit
+import threading
+from datetime import datetime
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+
+from services import db_pool
+
+
+# identity tokens remembered per worker
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+
+# visits answered from the cache are added to identities this often
+VISIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("IDENTITY_VISIT_FLUSH_SECONDS", "2"))
 
 
 class IdentityEngine:
 
-    def __init__(self):
+    # Create the identity or bump last_seen / total_sessions — one statement.
+    RESOLVE_SQL = """
+        INSERT INTO identities (identity_token)
+        VALUES (%(token)s)
+        ON CONFLICT (identity_token) DO UPDATE
+        SET last_seen = NOW(),
+            total_sessions = identities.total_sessions + 1
+        RETURNING id
+    """
+
+    # Same upsert with the session registration chained on.
+    START_SESSION_SQL = """
+        WITH identity AS (
+            INSERT INTO identities (identity_token)
+            VALUES (%(token)s)
+            ON CONFLICT (identity_token) DO UPDATE
+            SET last_seen = NOW(),
+                total_sessions = identities.total_sessions + 1
+            RETURNING id
+        ),
+        registered AS (
+            INSERT INTO sessions (identity_id, session_id)
+            SELECT id, %(session_id)s FROM identity
+            ON CONFLICT (session_id) DO NOTHING
+        )
+        SELECT id FROM identity
+    """
+
+    # Visits counted while the token was cached, one row per identity.
+    RECORD_VISITS_SQL = """
+        UPDATE identities i
+        SET last_seen = GREATEST(i.last_seen, v.seen),
+            total_sessions = i.total_sessions + v.visits
+        FROM (VALUES %s) AS v(id, visits, seen)
+        WHERE i.id = v.id::uuid
+    """
+
+    def __init__(self, cache_size=IDENTITY_CACHE_SIZE):
+
+        self.pool = db_pool.get_pool()
+
+        # identity_token → (identity_id, last registered session_id)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_lock = threading.Lock()
+
+        self._init_visits()
+
+        atexit.register(self.flush_visits)
 
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
+    def _init_visits(self):
+
+        self._pid = os.getpid()
+
+        # identity_id → (visits, last seen) not yet written
+        self._visits = {}
+        self._visits_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._visit_thread = threading.Thread(
+            target=self._run,
+            name="identity-visits",
+            daemon=True
         )
+        self._visit_thread.start()
+
+    # ================================
+    # Token Cache (LRU)
+    # ================================
+
+    def _cached(self, identity_token):
+
+        with self.cache_lock:
+
+            entry = self.cache.get(identity_token)
+
+            if entry:
+                self.cache.move_to_end(identity_token)
+
+            return entry
+
+    def _remember(self, identity_token, identity_id, session_id=None):
+
+        with self.cache_lock:
+
+            self.cache[identity_token] = (identity_id, session_id)
+            self.cache.move_to_end(identity_token)
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    # ================================
+    # Visits On Cache Hits
+    # ================================
+
+    def _record_visit(self, identity_id):
+        """What the upsert's DO UPDATE would have done, batched."""
+
+        # forked child: the parent's flusher thread doesn't exist here
+        if os.getpid() != self._pid:
+            self._init_visits()
+
+        now = datetime.utcnow()
+
+        with self._visits_lock:
+            visits, _ = self._visits.get(identity_id, (0, now))
+            self._visits[identity_id] = (visits + 1, now)
+
+    def _run(self):
+
+        while True:
+
+            time.sleep(VISIT_FLUSH_INTERVAL_SECONDS)
+
+            self.flush_visits()
+
+    def flush_visits(self):
+
+        with self._flush_lock:
+
+            with self._visits_lock:
+                visits, self._visits = self._visits, {}
+
+            if not visits:
+                return 0
+
+            try:
+
+                with self.pool.connection() as conn:
+
+                    cur = conn.cursor()
+
+                    execute_values(
+                        cur,
+                        self.RECORD_VISITS_SQL,
+                        [(str(identity_id), n, seen) for identity_id, (n, seen) in visits.items()]
+                    )
+
+                    cur.close()
+
+            except Exception as e:
+
+                print("IDENTITY VISIT ERROR:", e)
+
+                # merge back; retried on the next flush
+                with self._visits_lock:
+                    for identity_id, (n, seen) in visits.items():
+                        pending, latest = self._visits.get(identity_id, (0, seen))
+                        self._visits[identity_id] = (pending + n, max(latest, seen))
+
+                return 0
+
+            return len(visits)
 
     # ================================
     # Resolve or Create Identity
@@ -21,67 +179,78 @@ class IdentityEngine:
 
     def resolve_identity(self, identity_token):
 
-        cur = self.conn.cursor(cursor_factory=RealDictCursor)
+        entry = self._cached(identity_token)
 
-        cur.execute(
-            """
-            SELECT id, total_sessions
-            FROM identities
-            WHERE identity_token = %s
-            """,
-            (identity_token,)
-        )
+        if entry:
+            self._record_visit(entry[0])
+            return entry[0]
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+            cur.execute(self.RESOLVE_SQL, {"token": identity_token})
 
-        identity = cur.fetchone()
+            identity_id = cur.fetchone()[0]
 
-        if identity:
+            cur.close()
+
+        self._remember(identity_token, identity_id)
+
+        return identity_id
+
+    # ================================
+    # Register Session
+    # ================================
+
+    def register_session(self, identity_id, session_id):
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
 
             cur.execute(
                 """
-                UPDATE identities
-                SET last_seen = NOW(),
-                    total_sessions = total_sessions + 1
-                WHERE id = %s
+                INSERT INTO sessions (identity_id, session_id)
+                VALUES (%s, %s)
+                ON CONFLICT (session_id) DO NOTHING
                 """,
-                (identity["id"],)
+                (identity_id, session_id)
             )
 
-            self.conn.commit()
+            cur.close()
 
-            return identity["id"]
+    # ================================
+    # Resolve + Register (Session Start)
+    # ================================
 
-        # create new identity
+    def start_session(self, identity_token, session_id):
+        """
+        Resolve the identity and register the session in one statement.
 
-        cur.execute(
-            """
-            INSERT INTO identities (identity_token)
-            VALUES (%s)
-            RETURNING id
-            """,
-            (identity_token,)
-        )
+        Repeat calls for the same token + session inside this worker
+        are answered from the cache; their visit is still counted, in a
+        background batch.
+        """
 
-        identity_id = cur.fetchone()["id"]
+        entry = self._cached(identity_token)
 
-        self.conn.commit()
+        if entry and entry[1] == session_id:
+            self._record_visit(entry[0])
+            return entry[0]
 
-        return identity_id
+        with self.pool.connection() as conn:
 
-    # ================================
-    # Register Session
-    # ================================
+            cur = conn.cursor()
 
-    def register_session(self, identity_id, session_id):
+            cur.execute(self.START_SESSION_SQL, {
+                "token": identity_token,
+                "session_id": session_id
+            })
 
-        cur = self.conn.cursor()
+            identity_id = cur.fetchone()[0]
 
-        cur.execute(
-            """
-            INSERT INTO sessions (identity_id, session_id)
-            VALUES (%s, %s)
-            ON CONFLICT (session_id) DO NOTHING
-            """,
-            (identity_id, session_id)
-        )
+            cur.close()
 
-        self.conn.commit()
\ No newline at end of file
+        self._remember(identity_token, identity_id, session_id)
+
+        return identity_id
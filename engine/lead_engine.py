@@ -1,4 +1,18 @@
+import os
 import time
+import heapq
+import threading
+
+
+# a QUALIFIED / CONTACT_REQUESTED lead not updated for this long expires
+LEAD_TTL_SECONDS = float(os.getenv("LEAD_TTL_SECONDS", "86400"))
+
+# CONTACT_CAPTURED / DECLINED leads are kept in memory this long, then
+# reduced to a tombstone so the session is never qualified again
+LEAD_RETENTION_SECONDS = float(os.getenv("LEAD_RETENTION_SECONDS", "3600"))
+
+# a failed on_expire hook is retried after this long
+EXPIRE_RETRY_SECONDS = 60
 
 
 class LeadEngine:
@@ -10,10 +24,55 @@ class LeadEngine:
     STATUS_DECLINED = "DECLINED"
     STATUS_EXPIRED = "EXPIRED"
 
-    def __init__(self):
+    STATUSES = (
+        STATUS_QUALIFIED,
+        STATUS_CONTACT_REQUESTED,
+        STATUS_CONTACT_CAPTURED,
+        STATUS_DECLINED,
+        STATUS_EXPIRED
+    )
+
+    # still waiting on the student — these expire
+    OPEN_STATUSES = (STATUS_QUALIFIED, STATUS_CONTACT_REQUESTED)
+
+    # the student answered — these are final
+    CLOSED_STATUSES = (STATUS_CONTACT_CAPTURED, STATUS_DECLINED)
+
+    # minimum escalation confidence for a session to become a lead
+    LEAD_THRESHOLD = 25
+
+    def __init__(
+        self,
+        on_expire=None,
+        ttl_seconds=LEAD_TTL_SECONDS,
+        retention_seconds=LEAD_RETENTION_SECONDS
+    ):
         # session_id → lead object
         self.leads = {}
 
+        # status → {session_id: None}, insertion ordered
+        self._by_status = {status: {} for status in self.STATUSES}
+
+        # (deadline, seq, session_id); entries whose seq no longer matches
+        # _seqs[session_id] are stale and skipped when popped
+        self._deadlines = []
+        self._seqs = {}
+        self._seq = 0
+
+        # session_id → final status of closed leads evicted from memory
+        self._closed = {}
+
+        # on_expire(lead) persists the EXPIRED status; the lead is only
+        # evicted once it returns without raising, and never without it
+        self.on_expire = on_expire
+        self.ttl_seconds = ttl_seconds
+        self.retention_seconds = retention_seconds
+
+        self._lock = threading.RLock()
+
+        self._expired = 0
+        self._evicted = 0
+
     # ===============================
     # Lead Qualification
     # ===============================
@@ -30,33 +89,42 @@ class LeadEngine:
         intent_strength
     ):
 
-        LEAD_THRESHOLD = 25
-
         # Below threshold → not a lead
-        if escalation_confidence < LEAD_THRESHOLD:
+        if escalation_confidence < self.LEAD_THRESHOLD:
             return None
 
-        # If already exists → prevent duplicate qualification
-        existing = self.leads.get(session_id)
-        if existing:
-            return existing
-
-        lead = {
-            "session_id": session_id,
-            "subject": subject,
-            "chapter": chapter,
-            "escalation_code": escalation_code,
-            "escalation_reason": escalation_reason,
-            "escalation_confidence": escalation_confidence,
-            "engagement_score": engagement_score,
-            "intent_strength": intent_strength,
-            "status": self.STATUS_QUALIFIED,
-            "created_at": time.time(),
-            "updated_at": time.time()
-        }
-
-        self.leads[session_id] = lead
-        return lead
+        self.expire_due()
+
+        with self._lock:
+
+            # If already exists → prevent duplicate qualification
+            existing = self.leads.get(session_id)
+            if existing:
+                return existing
+
+            # closed and evicted → never qualify (or notify) again
+            if session_id in self._closed:
+                return None
+
+            lead = {
+                "session_id": session_id,
+                "subject": subject,
+                "chapter": chapter,
+                "escalation_code": escalation_code,
+                "escalation_reason": escalation_reason,
+                "escalation_confidence": escalation_confidence,
+                "engagement_score": engagement_score,
+                "intent_strength": intent_strength,
+                "status": self.STATUS_QUALIFIED,
+                "created_at": time.time(),
+                "updated_at": time.time()
+            }
+
+            self.leads[session_id] = lead
+            self._by_status[lead["status"]][session_id] = None
+            self._schedule(lead)
+
+            return lead
 
     # ===============================
     # Lifecycle Updates
@@ -64,32 +132,166 @@ class LeadEngine:
 
     def update_status(self, session_id, new_status):
 
-        if session_id not in self.leads:
+        if new_status not in self.STATUSES:
             return False
 
-        if new_status not in {
-            self.STATUS_QUALIFIED,
-            self.STATUS_CONTACT_REQUESTED,
-            self.STATUS_CONTACT_CAPTURED,
-            self.STATUS_DECLINED,
-            self.STATUS_EXPIRED
-        }:
-            return False
+        with self._lock:
+
+            lead = self.leads.get(session_id)
+
+            if lead is None:
+                return False
+
+            self._set_status(lead, new_status)
+            self._schedule(lead)
+
+        self.expire_due()
 
-        self.leads[session_id]["status"] = new_status
-        self.leads[session_id]["updated_at"] = time.time()
         return True
 
+    def _set_status(self, lead, new_status):
+        """Caller holds _lock."""
+
+        self._by_status[lead["status"]].pop(lead["session_id"], None)
+        self._by_status[new_status][lead["session_id"]] = None
+
+        lead["status"] = new_status
+        lead["updated_at"] = time.time()
+
+    # ===============================
+    # Expiry
+    # ===============================
+
+    def _schedule(self, lead, delay=None):
+        """Caller holds _lock. (Re)arm the lead's deadline; older entries go stale."""
+
+        if delay is None:
+            if lead["status"] in self.OPEN_STATUSES:
+                delay = self.ttl_seconds
+            else:
+                delay = self.retention_seconds
+
+        self._seq += 1
+        self._seqs[lead["session_id"]] = self._seq
+
+        heapq.heappush(self._deadlines, (time.time() + delay, self._seq, lead["session_id"]))
+
+        # stale entries pile up when leads are updated often
+        if len(self._deadlines) > 2 * len(self.leads) + 64:
+            self._deadlines = [
+                entry for entry in self._deadlines
+                if self._seqs.get(entry[2]) == entry[1]
+            ]
+            heapq.heapify(self._deadlines)
+
+    def expire_due(self, now=None):
+        """
+        Expire open leads past their deadline, evict them once on_expire
+        has persisted them, and reduce closed leads past retention to a
+        tombstone. Work is proportional to the leads due, not to how many
+        are held. Returns the number of leads evicted.
+        """
+
+        now = now or time.time()
+
+        due = []
+
+        with self._lock:
+
+            while self._deadlines and self._deadlines[0][0] <= now:
+
+                _, seq, session_id = heapq.heappop(self._deadlines)
+
+                if self._seqs.get(session_id) != seq:
+                    continue
+
+                lead = self.leads[session_id]
+
+                if lead["status"] in self.OPEN_STATUSES:
+                    self._set_status(lead, self.STATUS_EXPIRED)
+                    self._expired += 1
+
+                due.append((lead, seq))
+
+        evicted = 0
+
+        for lead, seq in due:
+
+            if lead["status"] == self.STATUS_EXPIRED:
+
+                # nothing would persist it — keep it rather than lose it
+                if self.on_expire is None:
+                    continue
+
+                try:
+                    self.on_expire(lead)
+
+                except Exception as e:
+
+                    print("LEAD EXPIRE ERROR:", e)
+
+                    with self._lock:
+                        if self._seqs.get(lead["session_id"]) == seq:
+                            self._schedule(lead, EXPIRE_RETRY_SECONDS)
+
+                    continue
+
+            with self._lock:
+
+                # updated while the hook ran — it has a new deadline
+                if self._seqs.get(lead["session_id"]) != seq:
+                    continue
+
+                self.leads.pop(lead["session_id"], None)
+                self._seqs.pop(lead["session_id"], None)
+                self._by_status[lead["status"]].pop(lead["session_id"], None)
+                self._evicted += 1
+
+                if lead["status"] in self.CLOSED_STATUSES:
+                    self._closed[lead["session_id"]] = lead["status"]
+
+            evicted += 1
+
+        return evicted
+
     # ===============================
     # Lead Retrieval
     # ===============================
 
     def get_lead(self, session_id):
+        self.expire_due()
         return self.leads.get(session_id)
 
     def get_all_leads(self):
+        self.expire_due()
         return self.leads
 
+    def get_leads_by_status(self, status):
+        """Leads in `status`, in the order they entered it, without scanning the others."""
+
+        self.expire_due()
+
+        with self._lock:
+            return [self.leads[sid] for sid in self._by_status.get(status, ())]
+
+    def count_by_status(self):
+
+        with self._lock:
+            return {status: len(ids) for status, ids in self._by_status.items()}
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "leads": len(self.leads),
+                "by_status": self.count_by_status(),
+                "scheduled": len(self._deadlines),
+                "closed_evicted": len(self._closed),
+                "expired": self._expired,
+                "evicted": self._evicted,
+            }
+
     # ===============================
     # Deduplication Logic
     # ===============================
@@ -104,4 +306,4 @@ class LeadEngine:
         if not lead:
             return False
 
-        return lead["status"] == self.STATUS_QUALIFIED
\ No newline at end of file
+        return lead["status"] == self.STATUS_QUALIFIED
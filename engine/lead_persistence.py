@@ -1,7 +1,5 @@
-import os
-import psycopg2
+from services import db_pool
 from services.logging_service import LoggingService
-from engine.event_logger import EventLogger
 
 
 class LeadPersistenceService:
@@ -10,27 +8,109 @@ class LeadPersistenceService:
 
         self.logger = LoggingService()
 
-        try:
-            self.conn = psycopg2.connect(
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT"),
-                dbname=os.getenv("DB_NAME"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-            )
-
-            self.conn.autocommit = True
-
-        except Exception as e:
-            self.logger.log("DB_CONNECTION_ERROR", str(e))
-            self.conn = None
-
-        self.event_logger = EventLogger()
+        self.pool = db_pool.get_pool()
 
     # =============================
     # UPSERT LEAD (SESSION SAFE + SCORE EVOLUTION)
     # =============================
 
+    # One round trip: insert the lead, or raise its confidence when the
+    # new signal is stronger, and record the escalation event — all in a
+    # single statement. leads.session_id is UNIQUE, so concurrent
+    # escalations for one session converge on one row.
+    UPSERT_LEAD_SQL = """
+        WITH prior AS (
+            SELECT id, confidence
+            FROM leads
+            WHERE session_id = %(session_id)s
+        ),
+        upserted AS (
+            INSERT INTO leads (
+                session_id,
+                subject,
+                chapter,
+                question,
+                escalation_code,
+                escalation_reason,
+                confidence,
+                engagement_score,
+                intent_strength,
+                status
+            )
+            VALUES (
+                %(session_id)s,
+                %(subject)s,
+                %(chapter)s,
+                %(question)s,
+                %(escalation_code)s,
+                %(escalation_reason)s,
+                %(confidence)s,
+                %(engagement_score)s,
+                %(intent_strength)s,
+                %(status)s
+            )
+            ON CONFLICT (session_id) DO UPDATE
+            SET confidence = EXCLUDED.confidence,
+                escalation_code = EXCLUDED.escalation_code,
+                escalation_reason = EXCLUDED.escalation_reason,
+                updated_at = NOW()
+            WHERE EXCLUDED.confidence > leads.confidence
+            RETURNING id
+        ),
+        target AS (
+            SELECT id FROM upserted
+            UNION ALL
+            SELECT id FROM prior
+            WHERE NOT EXISTS (SELECT 1 FROM upserted)
+        ),
+        event AS (
+            INSERT INTO lead_events (
+                lead_id,
+                session_id,
+                event_type,
+                event_code,
+                confidence,
+                engagement_score
+            )
+            SELECT
+                id,
+                %(session_id)s,
+                'ESCALATION',
+                %(escalation_code)s,
+                %(confidence)s,
+                %(engagement_score)s
+            FROM target
+        )
+        SELECT
+            (SELECT id FROM target),
+            (SELECT confidence FROM prior),
+            EXISTS (SELECT 1 FROM upserted)
+    """
+
+    # Move a contact captured before its lead was written (see
+    # capture_lead) into lead_contacts. DELETE ... RETURNING claims the
+    # pending row, so when the writer and /capture-lead both try, only
+    # one inserts.
+    ATTACH_PENDING_CONTACT_SQL = """
+        WITH pending AS (
+            DELETE FROM pending_lead_contacts p
+            USING leads l
+            WHERE p.session_id = %(session_id)s
+              AND l.session_id = p.session_id
+            RETURNING l.id AS lead_id, p.name, p.email, p.phone
+        ),
+        inserted AS (
+            INSERT INTO lead_contacts (lead_id, name, email, phone)
+            SELECT lead_id, name, email, phone
+            FROM pending
+            ON CONFLICT (lead_id) DO NOTHING
+            RETURNING id
+        )
+        SELECT
+            (SELECT lead_id FROM pending),
+            EXISTS (SELECT 1 FROM inserted)
+    """
+
     def upsert_lead(
         self,
         session_id,
@@ -43,101 +123,53 @@ class LeadPersistenceService:
         engagement_score,
         intent_strength,
         status,
+        raise_errors=False,
     ):
 
-        if not self.conn:
-            self.logger.log("DB_CONNECTION_MISSING", "Cannot persist lead")
-            return None
+        params = {
+            "session_id": session_id,
+            "subject": subject,
+            "chapter": chapter,
+            "question": question,
+            "escalation_code": escalation_code,
+            "escalation_reason": escalation_reason,
+            "confidence": confidence,
+            "engagement_score": engagement_score,
+            "intent_strength": intent_strength,
+            "status": status,
+        }
 
         try:
 
-            cursor = self.conn.cursor()
+            with self.pool.connection() as conn:
 
-            # 1️⃣ Check if lead already exists for session
+                cursor = conn.cursor()
 
-            cursor.execute(
-                """
-                SELECT id, confidence
-                FROM leads
-                WHERE session_id = %s
-                LIMIT 1
-                """,
-                (session_id,),
-            )
+                cursor.execute(self.UPSERT_LEAD_SQL, params)
+                lead_id, existing_confidence, written = cursor.fetchone()
 
-            existing = cursor.fetchone()
+                # a concurrent insert committed after our snapshot was
+                # taken: ON CONFLICT saw it, `prior` could not — rerun
+                if lead_id is None:
+                    cursor.execute(self.UPSERT_LEAD_SQL, params)
+                    lead_id, existing_confidence, written = cursor.fetchone()
 
-            if existing:
+                # commit the lead first: a capture that committed its
+                # pending contact before this point is seen below, and one
+                # that commits later sees the lead. Run on every write (a
+                # primary-key probe when nothing waits) so a retried write
+                # still attaches.
+                conn.commit()
 
-                lead_id = existing[0]
-                existing_confidence = existing[1]
+                cursor.execute(self.ATTACH_PENDING_CONTACT_SQL, {"session_id": session_id})
+                _, attached = cursor.fetchone()
 
-                # 2️⃣ Update lead if new signal is stronger
+                if attached:
+                    self.logger.log("CONTACT_ATTACHED", {"session_id": session_id})
 
-                if confidence > existing_confidence:
-
-                    cursor.execute(
-                        """
-                        UPDATE leads
-                        SET confidence = %s,
-                            escalation_code = %s,
-                            escalation_reason = %s,
-                            updated_at = NOW()
-                        WHERE id = %s
-                        """,
-                        (
-                            confidence,
-                            escalation_code,
-                            escalation_reason,
-                            lead_id,
-                        ),
-                    )
-
-                    self.logger.log(
-                        "LEAD_CONFIDENCE_UPDATED",
-                        {
-                            "session_id": session_id,
-                            "old_confidence": existing_confidence,
-                            "new_confidence": confidence,
-                        },
-                    )
-
-            else:
-
-                # 3️⃣ Create new lead
-
-                cursor.execute(
-                    """
-                    INSERT INTO leads (
-                        session_id,
-                        subject,
-                        chapter,
-                        question,
-                        escalation_code,
-                        escalation_reason,
-                        confidence,
-                        engagement_score,
-                        intent_strength,
-                        status
-                    )
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    RETURNING id
-                    """,
-                    (
-                        session_id,
-                        subject,
-                        chapter,
-                        question,
-                        escalation_code,
-                        escalation_reason,
-                        confidence,
-                        engagement_score,
-                        intent_strength,
-                        status,
-                    ),
-                )
+                cursor.close()
 
-                lead_id = cursor.fetchone()[0]
+            if existing_confidence is None:
 
                 self.logger.log(
                     "LEAD_CREATED",
@@ -147,32 +179,27 @@ class LeadPersistenceService:
                     },
                 )
 
-            cursor.close()
+            elif written:
 
-            # =============================
-            # EVENT LOGGING
-            # =============================
-
-            try:
-
-                self.event_logger.log_event(
-                    lead_id,
-                    session_id,
-                    "ESCALATION",
-                    escalation_code,
-                    confidence,
-                    engagement_score,
+                self.logger.log(
+                    "LEAD_CONFIDENCE_UPDATED",
+                    {
+                        "session_id": session_id,
+                        "old_confidence": existing_confidence,
+                        "new_confidence": confidence,
+                    },
                 )
 
-            except Exception as event_error:
-
-                self.logger.log("EVENT_LOGGING_FAILED", str(event_error))
-
             return lead_id
 
         except Exception as e:
 
             self.logger.log("LEAD_PERSISTENCE_ERROR", str(e))
+
+            # background writer retries / spills instead of losing the lead
+            if raise_errors:
+                raise
+
             return None
 
     # =============================
@@ -181,33 +208,32 @@ class LeadPersistenceService:
 
     def save_contact(self, lead_id, name=None, email=None, phone=None):
 
-        if not self.conn:
-            self.logger.log("DB_CONNECTION_MISSING", "Cannot persist contact")
-            return False
-
         try:
 
-            cursor = self.conn.cursor()
+            with self.pool.connection() as conn:
 
-            cursor.execute(
-                """
-                INSERT INTO lead_contacts (
-                    lead_id,
-                    name,
-                    email,
-                    phone
+                cursor = conn.cursor()
+
+                cursor.execute(
+                    """
+                    INSERT INTO lead_contacts (
+                        lead_id,
+                        name,
+                        email,
+                        phone
+                    )
+                    VALUES (%s,%s,%s,%s)
+                    ON CONFLICT (lead_id) DO NOTHING
+                    """,
+                    (
+                        lead_id,
+                        name,
+                        email,
+                        phone,
+                    ),
                 )
-                VALUES (%s,%s,%s,%s)
-                """,
-                (
-                    lead_id,
-                    name,
-                    email,
-                    phone,
-                ),
-            )
 
-            cursor.close()
+                cursor.close()
 
             self.logger.log(
                 "CONTACT_CAPTURED",
@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+from services.logging_service import LoggingService
+
+
+QUEUE_SIZE = int(os.getenv("LEAD_WRITER_QUEUE_SIZE", "1000"))
+
+# durable overflow for leads that can't reach Postgres yet
+SPILL_DIR = os.getenv("LEAD_SPILL_DIR", "lead_spill")
+
+MAX_RETRIES = int(os.getenv("LEAD_WRITER_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.getenv("LEAD_WRITER_BACKOFF_SECONDS", "0.5"))
+
+# how often a spilled backlog is retried while the DB is down
+RECOVERY_INTERVAL_SECONDS = float(os.getenv("LEAD_WRITER_RECOVERY_SECONDS", "15"))
+
+
+def _pid_alive(pid):
+
+    # os.kill(pid, 0) terminates the target on Windows — never probe there
+    if os.name != "posix":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+class LeadWriter:
+    """
+    Persists escalation leads off the request thread.
+
+    submit() only enqueues. A single worker thread writes leads in
+    FIFO order (so each session's escalations land in order), retrying
+    with backoff. When the DB stays unreachable the backlog goes to an
+    fsync'd JSONL spill file, and from then on new leads go there too
+    until the backlog has been replayed. Spill files left behind by
+    dead workers are picked up on startup.
+    """
+
+    def __init__(self, persistence):
+
+        self.persistence = persistence
+        self.logger = LoggingService()
+
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+        os.makedirs(SPILL_DIR, exist_ok=True)
+
+        self.spill_path = os.path.join(SPILL_DIR, f"leads.{os.getpid()}.jsonl")
+        self.replay_path = f"{self.spill_path}.replay"
+
+        self._spill_lock = threading.Lock()
+        self._spilling = False
+        self._stopped = threading.Event()
+
+        self._written = 0
+        self._retries = 0
+        self._spilled = 0
+        self._replayed = 0
+
+        self._claim_orphans()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="lead-writer",
+            daemon=True
+        )
+        self._thread.start()
+
+        atexit.register(self.close)
+
+    # =============================
+    # PUBLIC
+    # =============================
+
+    def submit(self, **lead):
+
+        record = dict(lead, queued_at=time.time())
+
+        with self._spill_lock:
+
+            if self._spilling:
+                self._spill_locked([record])
+                return
+
+        try:
+            self.queue.put_nowait(record)
+
+        except queue.Full:
+
+            with self._spill_lock:
+                self._spill_locked([record])
+
+    def close(self, timeout=5.0):
+
+        if self._stopped.is_set():
+            return
+
+        self._stopped.set()
+
+        # wake the worker if it is waiting on an empty queue
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+        self._thread.join(timeout)
+
+        if self._thread.is_alive():
+            # still inside a write; it spills its own queue once that returns
+            self.logger.log("LEAD_WRITER_CLOSE_TIMEOUT", {"queued": self.queue.qsize()})
+            return
+
+        # the worker is gone — only leads submitted after its last drain remain
+        self._spill_queued()
+
+    def stats(self):
+
+        return {
+            "queued": self.queue.qsize(),
+            "written": self._written,
+            "retries": self._retries,
+            "spilled": self._spilled,
+            "replayed": self._replayed,
+            "spilling": self._spilling,
+        }
+
+    # =============================
+    # WORKER
+    # =============================
+
+    def _run(self):
+
+        while not self._stopped.is_set():
+
+            try:
+                record = self.queue.get(timeout=RECOVERY_INTERVAL_SECONDS)
+            except queue.Empty:
+                record = None
+
+            if record is not None:
+
+                with self._spill_lock:
+                    spilling = self._spilling
+
+                # keep order: nothing overtakes an unreplayed backlog
+                if spilling or not self._write(record, retry=True):
+                    with self._spill_lock:
+                        self._spill_locked([record])
+
+                continue
+
+            if self._stopped.is_set():
+                break
+
+            if self._spilling:
+                self._replay()
+
+        # stopping: whatever is still queued goes to the spill file
+        self._spill_queued()
+
+    def _spill_queued(self):
+
+        records = []
+
+        while True:
+
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if record is not None:
+                records.append(record)
+
+        if records:
+            with self._spill_lock:
+                self._spill_locked(records)
+
+    def _write(self, record, retry):
+
+        lead = {k: v for k, v in record.items() if k != "queued_at"}
+
+        attempts = MAX_RETRIES + 1 if retry else 1
+
+        for attempt in range(attempts):
+
+            try:
+                self.persistence.upsert_lead(raise_errors=True, **lead)
+                self._written += 1
+                return True
+
+            except Exception:
+
+                if attempt + 1 == attempts or self._stopped.is_set():
+                    break
+
+                self._retries += 1
+
+                # close() cuts the backoff short
+                if self._stopped.wait(min(BACKOFF_SECONDS * (2 ** attempt), 30)):
+                    break
+
+        return False
+
+    # =============================
+    # SPILL FILE
+    # =============================
+
+    def _spill_locked(self, records):
+        """Append records durably. Caller holds _spill_lock."""
+
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        if not self._spilling:
+            self.logger.log("LEAD_WRITER_SPILLING", {"path": self.spill_path})
+
+        self._spilling = True
+        self._spilled += len(records)
+
+    @staticmethod
+    def _read(path):
+
+        if not os.path.exists(path):
+            return []
+
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _replay(self):
+
+        with self._spill_lock:
+
+            if not os.path.exists(self.replay_path):
+
+                if not os.path.exists(self.spill_path):
+                    self._spilling = False
+                    return
+
+                # new spills go to a fresh file while we replay this one
+                os.replace(self.spill_path, self.replay_path)
+
+        records = self._read(self.replay_path)
+
+        for i, record in enumerate(records):
+
+            if self._stopped.is_set() or not self._write(record, retry=False):
+
+                with self._spill_lock:
+
+                    # put the unwritten tail back in front of newer spills
+                    remaining = records[i:] + self._read(self.spill_path)
+
+                    tmp_path = f"{self.spill_path}.tmp"
+
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        for r in remaining:
+                            f.write(json.dumps(r, default=str) + "\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                    os.replace(tmp_path, self.spill_path)
+                    os.remove(self.replay_path)
+
+                return
+
+            self._replayed += 1
+
+        with self._spill_lock:
+
+            os.remove(self.replay_path)
+
+            if not os.path.exists(self.spill_path):
+                self._spilling = False
+                self.logger.log("LEAD_WRITER_RECOVERED", {"replayed": len(records)})
+
+    def _claim_orphans(self):
+        """Adopt spill files from previous runs / dead workers."""
+
+        records = []
+        claimed = []
+
+        for name in sorted(os.listdir(SPILL_DIR)):
+
+            if not name.startswith("leads.") or name.endswith((".tmp", ".claimed")):
+                continue
+
+            path = os.path.join(SPILL_DIR, name)
+
+            try:
+                pid = int(name.split(".")[1])
+            except (IndexError, ValueError):
+                continue
+
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+
+            # rename first: if two workers boot together only one wins
+            claim_path = f"{self.spill_path}.{len(claimed)}.claimed"
+
+            try:
+                os.replace(path, claim_path)
+            except FileNotFoundError:
+                continue
+
+            claimed.append(claim_path)
+            records.extend(self._read(claim_path))
+
+        if records:
+
+            records.sort(key=lambda r: r.get("queued_at", 0))
+
+            with self._spill_lock:
+                self._spill_locked(records)
+
+        for path in claimed:
+            os.remove(path)
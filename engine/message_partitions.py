@@ -0,0 +1,299 @@
+import os
+import re
+import argparse
+from datetime import date, datetime
+
+from services import db_pool
+
+
+PARENT_TABLE = "conversation_messages"
+
+# catches rows outside every monthly partition, so inserts never fail
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+# months of partitions kept ready beyond the current one
+MONTHS_AHEAD = int(os.getenv("CONVERSATION_PARTITION_MONTHS_AHEAD", "2"))
+
+# whole months kept before the current one; older partitions are dropped
+RETENTION_MONTHS = int(os.getenv("CONVERSATION_RETENTION_MONTHS", "6"))
+
+# only one worker runs maintenance at a time
+ADVISORY_LOCK_KEY = 4504501
+
+# DDL that needs a lock on the parent gives up after this rather than
+# queueing (and stalling every query queued behind it); retried next run
+LOCK_TIMEOUT = os.getenv("CONVERSATION_PARTITION_LOCK_TIMEOUT", "2s")
+
+PARTITION_PATTERN = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def _add_months(month, n):
+
+    index = month.year * 12 + (month.month - 1) + n
+
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _month(name):
+
+    match = PARTITION_PATTERN.match(name)
+
+    if match:
+        return date(int(match.group(1)), int(match.group(2)), 1)
+
+    return None
+
+
+def existing_partitions(cur):
+    """
+    ({first day of month: partition name} for attached partitions,
+    set of names whose DETACH ... CONCURRENTLY was interrupted,
+    whether the DEFAULT partition exists).
+    """
+
+    cur.execute(
+        """
+        SELECT child.relname, pg_inherits.inhdetachpending
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        (PARENT_TABLE,)
+    )
+
+    partitions = {}
+    detaching = set()
+    has_default = False
+
+    for name, detach_pending in cur.fetchall():
+
+        if name == DEFAULT_PARTITION:
+            has_default = True
+            continue
+
+        month = _month(name)
+
+        if month is None:
+            continue
+
+        if detach_pending:
+            detaching.add(name)
+        else:
+            partitions[month] = name
+
+    return partitions, detaching, has_default
+
+
+def detached_tables(cur):
+    """Monthly tables already detached but not yet dropped (interrupted run)."""
+
+    cur.execute(
+        """
+        SELECT relname
+        FROM pg_class
+        WHERE relkind = 'r'
+          AND NOT relispartition
+          AND relname LIKE %s
+        """,
+        (f"{PARENT_TABLE}_p%",)
+    )
+
+    return {name for (name,) in cur.fetchall() if _month(name) is not None}
+
+
+def _plan(partitions, detaching, has_default, current, oldest_kept, months_ahead):
+    """(months to create, partitions to expire) — empty when nothing is due."""
+
+    missing = [
+        _add_months(current, n)
+        for n in range(0, months_ahead + 1)
+        if _add_months(current, n) not in partitions
+    ]
+
+    expired = [name for month, name in sorted(partitions.items()) if month < oldest_kept]
+
+    return missing, expired + sorted(detaching), not has_default
+
+
+def needs_maintenance(today=None, months_ahead=MONTHS_AHEAD, retention_months=RETENTION_MONTHS):
+    """Catalog read only — no locks, no DDL. Cheap enough to poll from every worker."""
+
+    current = (today or datetime.utcnow().date()).replace(day=1)
+    oldest_kept = _add_months(current, -retention_months)
+
+    with db_pool.connection(autocommit=True) as conn:
+
+        cur = conn.cursor()
+
+        missing, expired, no_default = _plan(
+            *existing_partitions(cur), current, oldest_kept, months_ahead
+        )
+
+        leftovers = any(_month(name) < oldest_kept for name in detached_tables(cur))
+
+        cur.close()
+
+    return bool(missing or expired or no_default or leftovers)
+
+
+def _create_partition(cur, month):
+    """
+    Build the month's table detached, move in any rows that already
+    landed in the DEFAULT partition for that month, then ATTACH it —
+    which only takes SHARE UPDATE EXCLUSIVE on the parent, unlike
+    CREATE TABLE ... PARTITION OF.
+    """
+
+    name = partition_name(month)
+    bounds = (month, _add_months(month, 1))
+
+    cur.execute("BEGIN")
+
+    try:
+        cur.execute(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+        cur.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= %s AND created_at < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            bounds
+        )
+
+        cur.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            bounds
+        )
+
+        cur.execute("COMMIT")
+
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+
+
+def _detach(cur, name, pending, has_default):
+    """
+    Take an expired partition out of the parent before it is dropped, so
+    the DROP never locks conversation_messages. CONCURRENTLY avoids
+    blocking reads and inserts, but Postgres refuses it while a DEFAULT
+    partition exists; then a plain DETACH is used, which holds its lock
+    only for the catalog update and gives up after LOCK_TIMEOUT.
+    """
+
+    if pending:
+        # a previous CONCURRENTLY run was interrupted mid-detach
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} FINALIZE")
+
+    elif has_default:
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+
+    else:
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} CONCURRENTLY")
+
+
+def maintain(today=None, months_ahead=MONTHS_AHEAD, retention_months=RETENTION_MONTHS):
+    """
+    Ensure the DEFAULT partition, create missing monthly partitions up to
+    `months_ahead`, and expire the ones older than `retention_months` —
+    detached first (see _detach), then dropped, instead of row DELETEs.
+    A step that can't get its lock within LOCK_TIMEOUT is skipped until
+    the next run. Returns {"created": [...], "dropped": [...]}, or None
+    when another process holds the maintenance lock.
+
+    Meant for a single scheduled job (python -m engine.message_partitions);
+    workers only call it when needs_maintenance() says work is due.
+    """
+
+    # created_at is stamped in UTC
+    current = (today or datetime.utcnow().date()).replace(day=1)
+    oldest_kept = _add_months(current, -retention_months)
+
+    created, dropped = [], []
+
+    # DETACH ... CONCURRENTLY can't run inside a transaction block
+    with db_pool.connection(autocommit=True) as conn:
+
+        cur = conn.cursor()
+
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+
+        if not cur.fetchone()[0]:
+            cur.close()
+            return None
+
+        try:
+
+            cur.execute("SET lock_timeout = %s", (LOCK_TIMEOUT,))
+
+            partitions, detaching, has_default = existing_partitions(cur)
+
+            missing, expired, no_default = _plan(
+                partitions, detaching, has_default, current, oldest_kept, months_ahead
+            )
+
+            if no_default:
+                cur.execute(
+                    f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"
+                )
+                created.append(DEFAULT_PARTITION)
+                has_default = True
+
+            for month in missing:
+
+                try:
+                    _create_partition(cur, month)
+                    created.append(partition_name(month))
+                except Exception as e:
+                    print("CONVERSATION PARTITION CREATE ERROR:", e)
+
+            for name in expired:
+
+                try:
+                    _detach(cur, name, name in detaching, has_default)
+                except Exception as e:
+                    print("CONVERSATION PARTITION DETACH ERROR:", e)
+                    continue
+
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+                dropped.append(name)
+
+            # detached by an interrupted run, never dropped
+            for name in sorted(detached_tables(cur)):
+                if _month(name) < oldest_kept:
+                    cur.execute(f"DROP TABLE IF EXISTS {name}")
+                    dropped.append(name)
+
+            # summaries of conversations whose messages are gone
+            cur.execute(
+                "DELETE FROM conversation_summaries WHERE updated_at < %s",
+                (oldest_kept,)
+            )
+
+        finally:
+            cur.execute("RESET lock_timeout")
+            cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+            cur.close()
+
+    return {"created": created, "dropped": dropped}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="conversation_messages partition maintenance")
+
+    parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS)
+
+    args = parser.parse_args()
+
+    print(maintain(months_ahead=args.months_ahead, retention_months=args.retention_months))
@@ -1,6 +1,8 @@
 import os
+import time
 import chromadb
 from chromadb.config import Settings
+from engine import collection_registry
 from services.logging_service import LoggingService
 from langchain_openai import OpenAIEmbeddings
 
@@ -8,7 +10,10 @@ from langchain_openai import OpenAIEmbeddings
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHROMA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "chroma_db"))
 
-COLLECTION_NAME = "curionest"
+COLLECTION_NAME = collection_registry.DEFAULT_COLLECTION
+
+# how often the active-collection pointer is re-checked (one stat call)
+POINTER_REFRESH_SECONDS = float(os.getenv("RAG_POINTER_REFRESH_SECONDS", "30"))
 
 # distance threshold for valid semantic matches
 DISTANCE_THRESHOLD = float(os.getenv("RAG_DISTANCE_THRESHOLD", "0.35"))
@@ -44,16 +49,75 @@ class ChromaRAGStore:
 
         # -------- Collection --------
 
+        self.collection_name = None
+        self._pointer_mtime = None
+        self._pointer_checked_at = 0.0
+
         try:
-            self.collection = self.client.get_or_create_collection(
-                name=COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine"}
-            )
+            self._load_active_collection()
         except Exception as e:
             self.logger.log("CHROMA_COLLECTION_ERROR", str(e))
             raise e
 
 
+    # =====================================================
+    # ACTIVE COLLECTION (BLUE/GREEN POINTER)
+    # =====================================================
+
+    def _load_active_collection(self):
+
+        self._pointer_mtime = collection_registry.pointer_mtime(CHROMA_DIR)
+        self._pointer_checked_at = time.monotonic()
+
+        name = collection_registry.read_active(CHROMA_DIR)
+
+        if name == self.collection_name:
+            return
+
+        if name == collection_registry.DEFAULT_COLLECTION:
+            # no blue/green build yet: the single default collection
+            collection = self.client.get_or_create_collection(
+                name=name,
+                metadata={"hnsw:space": "cosine"}
+            )
+
+        else:
+            # a pointer to a missing (e.g. garbage-collected) version
+            # raises here rather than serving an empty store; on refresh
+            # the current collection is kept
+            collection = self.client.get_collection(name=name)
+
+        # single reference swap — in-flight queries keep the old collection
+        self.collection = collection
+        self.collection_name = name
+
+        self.logger.log("CHROMA_COLLECTION_ACTIVE", {"collection": name})
+
+    def _refresh_collection(self):
+
+        if time.monotonic() - self._pointer_checked_at < POINTER_REFRESH_SECONDS:
+            return
+
+        self._pointer_checked_at = time.monotonic()
+
+        if collection_registry.pointer_mtime(CHROMA_DIR) == self._pointer_mtime:
+            return
+
+        try:
+            self._load_active_collection()
+        except Exception as e:
+            # keep serving the previous collection
+            self.logger.log("CHROMA_COLLECTION_SWITCH_ERROR", str(e))
+
+    def validate_chapter(self, subject, chapter):
+
+        return collection_registry.validate_chapter(
+            self.collection,
+            subject,
+            chapter
+        )
+
+
     # =====================================================
     # SEARCH
     # =====================================================
@@ -66,6 +130,8 @@ class ChromaRAGStore:
         if not k:
             k = MAX_CHUNKS
 
+        self._refresh_collection()
+
         try:
 
             query_embedding = self.embedder.embed_query(query)
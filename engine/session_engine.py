@@ -1,64 +1,341 @@
-class SessionEngine:
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+
+# sessions untouched this long are dropped
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "7200"))
+
+# most sessions a worker keeps (least recently used evicted)
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+
+# when set, each worker saves its sessions to <path>.<pid> at exit, and
+# the store is restored from all of them at startup
+SESSION_SNAPSHOT_PATH = os.getenv("SESSION_SNAPSHOT_PATH")
+
+# engagement score weights
+QUESTION_POINTS = 3
+ESCALATION_POINTS = 10
+ADVANCED_POINTS = 5
+NEW_CHAPTER_POINTS = 2
+MAX_ENGAGEMENT_SCORE = 100
+
+
+class SessionRecord:
+    """Per-session counters plus the UX lead flags, score kept up to date."""
+
+    __slots__ = (
+        "questions",
+        "escalations",
+        "difficulty_hits",
+        "chapter_counts",
+        "raw_score",
+        "lead_prompted",
+        "contact_captured",
+        "last_interaction",
+    )
 
     def __init__(self):
-        self.sessions = {}
+        self.questions = 0
+        self.escalations = 0
+        self.difficulty_hits = 0
+        self.chapter_counts = {}
+        self.raw_score = 0
+        self.lead_prompted = False
+        self.contact_captured = False
+        self.last_interaction = time.time()
+
+    @property
+    def engagement_score(self):
+        return min(self.raw_score, MAX_ENGAGEMENT_SCORE)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+
+        record = cls()
+
+        for field in cls.__slots__:
+            if field in data:
+                setattr(record, field, data[field])
+
+        return record
+
+
+class SessionStore:
+    """
+    LRU + TTL bounded map of SessionRecord, shared by SessionEngine and
+    UXLeadEngine.
+
+    Entries are kept in last-touched order, so expiry and the size cap
+    both evict from the front.
+    """
+
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, max_entries=SESSION_MAX_ENTRIES):
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+        self._evicted = 0
+
+    def get(self, session_id, create=True):
+
+        now = time.time()
+
+        with self._lock:
+
+            self._evict_expired(now)
+
+            record = self._sessions.get(session_id)
+
+            if record is None:
+
+                if not create:
+                    return None
+
+                record = self._sessions[session_id] = SessionRecord()
+
+                while len(self._sessions) > self.max_entries:
+                    self._sessions.popitem(last=False)
+                    self._evicted += 1
+
+            else:
+                self._sessions.move_to_end(session_id)
+
+            record.last_interaction = now
+
+            return record
+
+    @contextmanager
+    def update(self, session_id, create=True):
+        """
+        Record (or None) with the store locked, for read-modify-write:
+
+            with store.update(session_id) as session:
+                session.questions += 1
+        """
+
+        with self._lock:
+            yield self.get(session_id, create=create)
+
+    def peek(self, session_id):
+        """Record without creating or touching it (None if absent)."""
+
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _evict_expired(self, now):
+
+        cutoff = now - self.ttl_seconds
+
+        while self._sessions:
+
+            record = next(iter(self._sessions.values()))
+
+            if record.last_interaction >= cutoff:
+                return
+
+            self._sessions.popitem(last=False)
+            self._evicted += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # =============================
+    # SNAPSHOT / RESTORE
+    # =============================
+
+    def snapshot(self, path):
+        """
+        Write live sessions as JSON lines to `<path>.<pid>` (atomic
+        replace), so workers exiting together don't overwrite each other.
+        """
+
+        with self._lock:
+
+            self._evict_expired(time.time())
+
+            rows = [
+                json.dumps({"session_id": sid, **record.to_dict()})
+                for sid, record in self._sessions.items()
+            ]
+
+        target = f"{path}.{os.getpid()}"
+
+        with open(f"{target}.tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(rows) + ("\n" if rows else ""))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(f"{target}.tmp", target)
+
+        return len(rows)
+
+    @staticmethod
+    def snapshot_files(path):
+        """Every worker's snapshot of `path` (plus a single-file one from before)."""
+
+        files = [
+            f for f in glob.glob(f"{glob.escape(path)}.*")
+            if f[len(path) + 1:].isdigit()
+        ]
+
+        if os.path.exists(path):
+            files.append(path)
+
+        return files
+
+    def restore(self, path):
+        """
+        Merge all workers' snapshots, skipping sessions that expired
+        meanwhile; a session saved by several workers keeps its most
+        recent copy. Files holding only expired sessions are removed.
+        """
+
+        cutoff = time.time() - self.ttl_seconds
+
+        latest = {}
+
+        for snapshot_file in self.snapshot_files(path):
+
+            try:
+
+                if os.path.getmtime(snapshot_file) < cutoff:
+                    os.remove(snapshot_file)
+                    continue
+
+                with open(snapshot_file, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+
+            except OSError as e:
+                print("SESSION SNAPSHOT ERROR:", e)
+                continue
+
+            for line in lines:
+
+                if not line.strip():
+                    continue
+
+                data = json.loads(line)
+
+                if data.get("last_interaction", 0) < cutoff:
+                    continue
+
+                known = latest.get(data["session_id"])
+
+                if known is None or known.last_interaction < data["last_interaction"]:
+                    latest[data["session_id"]] = SessionRecord.from_dict(data)
+
+        records = sorted(latest.items(), key=lambda item: item[1].last_interaction)
+
+        with self._lock:
+
+            for session_id, record in records:
+                self._sessions[session_id] = record
+                self._sessions.move_to_end(session_id)
+
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+        return len(records)
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "sessions": len(self._sessions),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": self._evicted,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+
+    global _store
+
+    if _store is None:
+
+        with _store_lock:
+
+            if _store is None:
+
+                _store = SessionStore()
+
+                if SESSION_SNAPSHOT_PATH:
+                    _store.restore(SESSION_SNAPSHOT_PATH)
+                    atexit.register(_store.snapshot, SESSION_SNAPSHOT_PATH)
+
+    return _store
+
+
+class SessionEngine:
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_session_store()
+
+    def get_session(self, session_id):
+        return self.store.get(session_id)
 
     # ================= QUESTION EVENT =================
 
     def update_on_question(self, session_id, chapter=None, difficulty=None):
 
-        session = self.sessions.get(session_id)
+        with self.store.update(session_id) as session:
 
-        if not session:
-            session = {
-                "questions": 0,
-                "escalations": 0,
-                "chapters": set(),
-                "difficulty_hits": 0
-            }
+            session.questions += 1
+            session.raw_score += QUESTION_POINTS
 
-        session["questions"] += 1
+            if chapter:
 
-        if chapter:
-            session["chapters"].add(chapter)
+                count = session.chapter_counts.get(chapter, 0) + 1
+                session.chapter_counts[chapter] = count
 
-        if difficulty == "advanced":
-            session["difficulty_hits"] += 1
+                if count == 1:
+                    session.raw_score += NEW_CHAPTER_POINTS
 
-        self.sessions[session_id] = session
+            if difficulty == "advanced":
+                session.difficulty_hits += 1
+                session.raw_score += ADVANCED_POINTS
 
+        return session
 
     # ================= ESCALATION EVENT =================
 
     def update_on_escalation(self, session_id):
 
-        session = self.sessions.get(session_id)
+        with self.store.update(session_id, create=False) as session:
 
-        if not session:
-            return
+            if not session:
+                return None
 
-        session["escalations"] += 1
+            session.escalations += 1
+            session.raw_score += ESCALATION_POINTS
 
+        return session
 
     # ================= ENGAGEMENT SCORE =================
 
     def calculate_engagement_score(self, session_id):
 
-        session = self.sessions.get(session_id)
+        session = self.store.peek(session_id)
 
         if not session:
             return 0
 
-        questions = session["questions"]
-        escalations = session["escalations"]
-        difficulty_hits = session["difficulty_hits"]
-        chapter_depth = len(session["chapters"])
-
-        score = (
-            questions * 3 +
-            escalations * 10 +
-            difficulty_hits * 5 +
-            chapter_depth * 2
-        )
-
-        return min(score, 100)
+        return session.engagement_score
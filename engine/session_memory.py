@@ -1,13 +1,127 @@
 import os
-import psycopg2
+import time
+import atexit
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from services import db_pool
+from engine import message_partitions
+
+
+# messages kept in memory per session
+RING_SIZE = int(os.getenv("SESSION_MEMORY_RING_SIZE", "20"))
+
+# sessions kept in memory per worker (least recently used evicted)
+MAX_SESSIONS = int(os.getenv("SESSION_MEMORY_MAX_SESSIONS", "10000"))
+
+# unwritten messages held at most; beyond this new ones are not persisted
+WRITE_BUFFER_SIZE = int(os.getenv("SESSION_MEMORY_WRITE_BUFFER_SIZE", "10000"))
+
+FLUSH_BATCH_SIZE = int(os.getenv("SESSION_MEMORY_FLUSH_BATCH_SIZE", "500"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_MEMORY_FLUSH_INTERVAL_SECONDS", "1"))
+
+# a ring is checked against Postgres at most this often (0 = every read);
+# raise it when routing is sticky and other workers rarely see a session
+REVALIDATE_SECONDS = float(os.getenv("SESSION_MEMORY_REVALIDATE_SECONDS", "0"))
+
+# how often a worker checks (catalog read only) whether partition
+# maintenance is overdue and, if so, runs it under an advisory lock; 0
+# leaves it entirely to the scheduled job (python -m engine.message_partitions)
+PARTITION_CHECK_SECONDS = float(os.getenv("CONVERSATION_PARTITION_CHECK_SECONDS", "21600"))
+
+
+class _Ring:
+
+    __slots__ = ("messages", "mark", "checked_at", "generation")
+
+    def __init__(self):
+        # (created_at, role, message), oldest first
+        self.messages = deque(maxlen=RING_SIZE)
+        # (row count, latest created_at) the DB should hold for the
+        # session given what this worker has loaded and written; None
+        # until hydrated
+        self.mark = None
+        self.checked_at = 0.0
+        # set from a per-worker sequence whenever rows are (re)loaded from
+        # the DB, so a ring evicted and rebuilt never repeats a value
+        self.generation = 0
 
 
 class SessionMemoryService:
+    """
+    Recent conversation history per session.
+
+    Reads are served from a bounded in-memory ring of the last
+    RING_SIZE messages. The first read for a session this worker hasn't
+    seen hydrates the ring from Postgres. Later reads compare the
+    session's row count and latest created_at (one index-only lookup)
+    with what this worker loaded and wrote; when another worker has
+    added turns the ring is reloaded. Messages carry a client-assigned
+    created_at and are inserted in background batches.
+    """
 
     def __init__(self):
 
-        self.conn = psycopg2.connect(os.getenv("DATABASE_URL"))
-        self.conn.autocommit = True
+        self.pool = db_pool.get_pool()
+
+        self._rings = OrderedDict()
+        self._rings_lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evicted = 0
+        self._generations = 0
+
+        self._init_writer()
+
+        atexit.register(self.close)
+
+    def _init_writer(self):
+
+        self._pid = os.getpid()
+
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+        self._written = 0
+        self._dropped = 0
+        self._flush_failures = 0
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="session-memory-writer",
+            daemon=True
+        )
+        self._thread.start()
+
+    # ==========================
+    # RING BUFFER
+    # ==========================
+
+    def _ring(self, session_id):
+        """Caller holds _rings_lock."""
+
+        ring = self._rings.get(session_id)
+
+        if ring is None:
+
+            ring = self._rings[session_id] = _Ring()
+
+            while len(self._rings) > MAX_SESSIONS:
+                self._rings.popitem(last=False)
+                self._evicted += 1
+
+        else:
+            self._rings.move_to_end(session_id)
+
+        return ring
 
     # ==========================
     # STORE MESSAGE
@@ -15,24 +129,26 @@ class SessionMemoryService:
 
     def store_message(self, session_id, role, message):
 
-        try:
+        # forked child: the parent's writer thread doesn't exist here
+        if os.getpid() != self._pid:
+            self._init_writer()
 
-            cursor = self.conn.cursor()
+        created_at = datetime.utcnow()
 
-            cursor.execute(
-                """
-                INSERT INTO conversation_messages
-                (session_id, role, message)
-                VALUES (%s,%s,%s)
-                """,
-                (session_id, role, message)
-            )
+        with self._rings_lock:
+            self._ring(session_id).messages.append((created_at, role, message))
 
-            cursor.close()
+        with self._pending_lock:
 
-        except Exception as e:
+            if len(self._pending) >= WRITE_BUFFER_SIZE:
+                self._dropped += 1
+                print("SESSION MEMORY STORE ERROR: write buffer full")
+                return
+
+            self._pending.append((session_id, role, message, created_at))
 
-            print("SESSION MEMORY STORE ERROR:", e)
+            if len(self._pending) >= FLUSH_BATCH_SIZE:
+                self._wakeup.set()
 
     # ==========================
     # GET RECENT MESSAGES
@@ -40,13 +156,111 @@ class SessionMemoryService:
 
     def get_recent_messages(self, session_id, limit=10):
 
+        mark = None
+
+        if limit <= RING_SIZE:
+
+            with self._rings_lock:
+                ring = self._rings.get(session_id)
+                known = ring.mark if ring is not None else None
+                fresh = ring is not None and time.monotonic() - ring.checked_at < REVALIDATE_SECONDS
+
+            if known is not None:
+
+                try:
+                    mark = known if fresh else self._mark(session_id)
+
+                except Exception as e:
+
+                    print("SESSION MEMORY FETCH ERROR:", e)
+
+                    # best effort: whatever this worker has seen
+                    mark = known
+
+                with self._rings_lock:
+
+                    ring = self._rings.get(session_id)
+
+                    if ring is not None and ring.mark == mark:
+                        self._hits += 1
+                        ring.checked_at = time.monotonic()
+                        self._rings.move_to_end(session_id)
+                        return self._format(list(ring.messages)[-limit:])
+
+                    # another worker added turns (or the ring was evicted)
+                    self._stale += 1
+
+            with self._rings_lock:
+                self._misses += 1
+
         try:
+            if mark is None:
+                mark = self._mark(session_id)
+
+            rows = self._fetch(session_id, max(limit, RING_SIZE))
+
+        except Exception as e:
 
-            cursor = self.conn.cursor()
+            print("SESSION MEMORY FETCH ERROR:", e)
+
+            # best effort: whatever this worker has seen
+            with self._rings_lock:
+                ring = self._rings.get(session_id)
+                return self._format(list(ring.messages)[-limit:]) if ring else []
+
+        with self._rings_lock:
+
+            ring = self._ring(session_id)
+
+            # rows not yet flushed are only in the ring — merge, don't replace
+            merged = sorted(set(rows) | set(ring.messages), key=lambda m: m[0])
+
+            ring.messages.clear()
+            ring.messages.extend(merged[-RING_SIZE:])
+            ring.mark = mark
+            ring.checked_at = time.monotonic()
+            self._generations += 1
+            ring.generation = self._generations
+
+        return self._format(merged[-limit:])
+
+    def generation(self, session_id):
+        """Changes whenever the session's ring is reloaded from the DB."""
+
+        with self._rings_lock:
+            ring = self._rings.get(session_id)
+            return ring.generation if ring is not None else 0
+
+    def _mark(self, session_id):
+
+        with self.pool.connection(autocommit=True) as conn:
+
+            cursor = conn.cursor()
 
             cursor.execute(
                 """
-                SELECT role, message
+                SELECT COUNT(*), MAX(created_at)
+                FROM conversation_messages
+                WHERE session_id=%s
+                """,
+                (session_id,)
+            )
+
+            count, latest = cursor.fetchone()
+
+            cursor.close()
+
+        return (count, latest)
+
+    def _fetch(self, session_id, limit):
+
+        with self.pool.connection(autocommit=True) as conn:
+
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                SELECT created_at, role, message
                 FROM conversation_messages
                 WHERE session_id=%s
                 ORDER BY created_at DESC
@@ -59,15 +273,187 @@ class SessionMemoryService:
 
             cursor.close()
 
-            rows.reverse()
+        return [tuple(r) for r in rows]
 
-            return [
-                {"role": r[0], "message": r[1]}
-                for r in rows
-            ]
+    # ==========================
+    # ROLLING SUMMARY
+    # ==========================
 
-        except Exception as e:
+    def load_summary(self, session_id):
+        """The session's stored conversation summary, or None."""
 
-            print("SESSION MEMORY FETCH ERROR:", e)
+        with self.pool.connection(autocommit=True) as conn:
+
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT summary FROM conversation_summaries WHERE session_id=%s",
+                (session_id,)
+            )
+
+            row = cursor.fetchone()
+
+            cursor.close()
+
+        return row[0] if row else None
+
+    def save_summary(self, session_id, summary):
+
+        with self.pool.connection() as conn:
+
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                INSERT INTO conversation_summaries (session_id, summary, updated_at)
+                VALUES (%s, %s, now())
+                ON CONFLICT (session_id) DO UPDATE
+                SET summary = EXCLUDED.summary,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (session_id, summary)
+            )
+
+            cursor.close()
+
+    @staticmethod
+    def _format(messages):
+
+        return [
+            {"role": role, "message": message}
+            for _, role, message in messages
+        ]
+
+    # ==========================
+    # WRITE-BEHIND
+    # ==========================
+
+    def _run(self):
+
+        next_partition_check = 0.0
+
+        while not self._stopped.is_set():
+
+            # fallback for a missed scheduled run: no DDL unless work is due
+            if PARTITION_CHECK_SECONDS > 0 and time.monotonic() >= next_partition_check:
+
+                next_partition_check = time.monotonic() + PARTITION_CHECK_SECONDS
+
+                try:
+                    if message_partitions.needs_maintenance():
+                        message_partitions.maintain()
+                except Exception as e:
+                    print("CONVERSATION PARTITION ERROR:", e)
+
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+            self.flush()
+
+    def flush(self):
+
+        with self._flush_lock:
+
+            with self._pending_lock:
+                rows = list(self._pending)
+                self._pending.clear()
+
+            if not rows:
+                return 0
+
+            try:
+
+                with self.pool.connection() as conn:
+
+                    cursor = conn.cursor()
+
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO conversation_messages
+                        (session_id, role, message, created_at)
+                        VALUES %s
+                        """,
+                        rows,
+                        page_size=FLUSH_BATCH_SIZE
+                    )
+
+                    cursor.close()
+
+            except Exception as e:
+
+                print("SESSION MEMORY STORE ERROR:", e)
+
+                with self._pending_lock:
+
+                    self._flush_failures += 1
+
+                    # oldest first, ahead of anything stored meanwhile
+                    space = max(WRITE_BUFFER_SIZE - len(self._pending), 0)
+                    keep = rows[:space]
+
+                    self._pending.extendleft(reversed(keep))
+                    self._dropped += len(rows) - len(keep)
+
+                return 0
+
+            # what this worker wrote is not a reason to reload
+            written = {}
+
+            for session_id, _, _, created_at in rows:
+                count, latest = written.get(session_id, (0, created_at))
+                written[session_id] = (count + 1, max(latest, created_at))
+
+            with self._rings_lock:
+
+                for session_id, (count, latest) in written.items():
+
+                    ring = self._rings.get(session_id)
+
+                    if ring is not None and ring.mark is not None:
+                        known_count, known_latest = ring.mark
+                        ring.mark = (
+                            known_count + count,
+                            max(known_latest, latest) if known_latest else latest
+                        )
+
+            with self._pending_lock:
+                self._written += len(rows)
+
+            return len(rows)
+
+    def close(self):
+
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(5)
+
+        self.flush()
+
+    # ==========================
+    # METRICS
+    # ==========================
+
+    def stats(self):
+
+        with self._rings_lock:
+            sessions = len(self._rings)
+            hits, misses, stale, evicted = self._hits, self._misses, self._stale, self._evicted
+
+        with self._pending_lock:
 
-            return []
\ No newline at end of file
+            return {
+                "sessions": sessions,
+                "ring_size": RING_SIZE,
+                "max_sessions": MAX_SESSIONS,
+                "hits": hits,
+                "misses": misses,
+                "stale": stale,
+                "evicted": evicted,
+                "pending": len(self._pending),
+                "written": self._written,
+                "dropped": self._dropped,
+                "flush_failures": self._flush_failures,
+            }
@@ -0,0 +1,648 @@
+import os
+import sys
+import time
+import atexit
+import sqlite3
+import threading
+from itertools import islice
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+
+from services import db_pool
+
+
+# most (session, subject, chapter) states a worker keeps in memory
+MAX_ENTRIES = int(os.getenv("SESSION_STATE_MAX_ENTRIES", "50000"))
+
+# states untouched this long are dropped
+TTL_SECONDS = float(os.getenv("SESSION_STATE_TTL_SECONDS", "7200"))
+
+# entries sampled when estimating memory for /metrics
+SIZE_SAMPLE = 100
+
+# memory (per worker) | sqlite (shared by workers on one host) | postgres
+BACKEND = os.getenv("SESSION_STATE_BACKEND", "memory").lower()
+
+SQLITE_PATH = os.getenv("SESSION_STATE_SQLITE_PATH", "curionest_session_state.db")
+
+# cached states are refreshed with what other workers wrote this often,
+# in one query for every row changed since the last refresh
+REFRESH_INTERVAL_SECONDS = float(os.getenv("SESSION_STATE_REFRESH_SECONDS", "1"))
+
+# refresh windows overlap by this much, for clock differences between hosts
+CLOCK_SKEW_SECONDS = 2
+
+# dirty states are written to a shared backend this often, in one batch
+FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_STATE_FLUSH_SECONDS", "0.5"))
+
+# expired rows are deleted from a shared backend this often
+PRUNE_INTERVAL_SECONDS = float(os.getenv("SESSION_STATE_PRUNE_SECONDS", "600"))
+
+STATE_FIELDS = (
+    "confusion",
+    "repetition",
+    "last_question",
+    "escalated",
+    "rejection_count",
+)
+
+
+class AgentSessionState:
+    """Conversation signals the agent tracks per session + subject + chapter."""
+
+    __slots__ = STATE_FIELDS + (
+        "touched",
+        "version",
+    )
+
+    def __init__(self):
+        self.confusion = 0
+        self.repetition = 0
+        self.last_question = ""
+        self.escalated = False
+        self.rejection_count = 0
+        self.touched = time.monotonic()
+        # updated_at (epoch) of the values held, as written to the backend
+        self.version = 0.0
+
+    def snapshot(self):
+        return tuple(getattr(self, field) for field in STATE_FIELDS)
+
+    def apply(self, values):
+        for field, value in zip(STATE_FIELDS, values):
+            setattr(self, field, value)
+
+
+# =====================================
+# BACKENDS
+# =====================================
+# load(key) → (STATE_FIELDS tuple, updated_at epoch) or None
+# changed_since(since epoch) → [(key, STATE_FIELDS tuple, updated_at epoch)]
+# save_many([(key, STATE_FIELDS tuple, updated_at epoch)]) — last writer wins
+# prune(older_than epoch)
+
+class MemoryBackend:
+    """Today's behaviour: state lives only in this worker."""
+
+    shared = False
+
+    def load(self, key):
+        return None
+
+    def changed_since(self, since):
+        return []
+
+    def save_many(self, rows):
+        pass
+
+    def prune(self, older_than):
+        pass
+
+
+class SqliteBackend:
+    """One WAL-mode file shared by every worker on the host."""
+
+    shared = True
+
+    UPSERT_SQL = """
+    INSERT INTO agent_session_state
+    (state_key, confusion, repetition, last_question, escalated, rejection_count, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (state_key) DO UPDATE SET
+        confusion = excluded.confusion,
+        repetition = excluded.repetition,
+        last_question = excluded.last_question,
+        escalated = excluded.escalated,
+        rejection_count = excluded.rejection_count,
+        updated_at = excluded.updated_at
+    WHERE excluded.updated_at >= agent_session_state.updated_at
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+
+        self.path = path
+
+        # sqlite connections are per thread: request threads read,
+        # the flusher writes
+        self._local = threading.local()
+
+        conn = self._conn()
+
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_session_state (
+            state_key TEXT PRIMARY KEY,
+            confusion INTEGER,
+            repetition INTEGER,
+            last_question TEXT,
+            escalated INTEGER,
+            rejection_count INTEGER,
+            updated_at REAL
+        )
+        """)
+
+        conn.commit()
+
+    def _conn(self):
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def load(self, key):
+
+        row = self._conn().execute(
+            """
+            SELECT confusion, repetition, last_question, escalated, rejection_count, updated_at
+            FROM agent_session_state
+            WHERE state_key = ? AND updated_at >= ?
+            """,
+            (key, time.time() - TTL_SECONDS)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return row[:3] + (bool(row[3]), row[4]), row[5]
+
+    def changed_since(self, since):
+
+        rows = self._conn().execute(
+            """
+            SELECT state_key, confusion, repetition, last_question, escalated,
+                   rejection_count, updated_at
+            FROM agent_session_state
+            WHERE updated_at > ?
+            """,
+            (since,)
+        ).fetchall()
+
+        return [
+            (row[0], row[1:4] + (bool(row[4]), row[5]), row[6])
+            for row in rows
+        ]
+
+    def save_many(self, rows):
+
+        conn = self._conn()
+
+        with conn:
+            conn.executemany(
+                self.UPSERT_SQL,
+                [(key, *values, updated_at) for key, values, updated_at in rows]
+            )
+
+    def prune(self, older_than):
+
+        conn = self._conn()
+
+        with conn:
+            conn.execute("DELETE FROM agent_session_state WHERE updated_at < ?", (older_than,))
+
+
+class PostgresBackend:
+    """agent_session_state in Postgres — shared across hosts."""
+
+    shared = True
+
+    UPSERT_SQL = """
+    INSERT INTO agent_session_state
+    (state_key, confusion, repetition, last_question, escalated, rejection_count, updated_at)
+    VALUES %s
+    ON CONFLICT (state_key) DO UPDATE SET
+        confusion = EXCLUDED.confusion,
+        repetition = EXCLUDED.repetition,
+        last_question = EXCLUDED.last_question,
+        escalated = EXCLUDED.escalated,
+        rejection_count = EXCLUDED.rejection_count,
+        updated_at = EXCLUDED.updated_at
+    WHERE EXCLUDED.updated_at >= agent_session_state.updated_at
+    """
+
+    def __init__(self):
+
+        self.pool = db_pool.get_pool()
+
+    def load(self, key):
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+
+            cur.execute(
+                """
+                SELECT confusion, repetition, last_question, escalated, rejection_count,
+                       EXTRACT(EPOCH FROM updated_at)
+                FROM agent_session_state
+                WHERE state_key = %s
+                  AND updated_at >= NOW() - make_interval(secs => %s)
+                """,
+                (key, TTL_SECONDS)
+            )
+
+            row = cur.fetchone()
+            cur.close()
+
+        if row is None:
+            return None
+
+        return row[:5], float(row[5])
+
+    def changed_since(self, since):
+
+        # served by idx_agent_session_state_updated
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+
+            cur.execute(
+                """
+                SELECT state_key, confusion, repetition, last_question, escalated,
+                       rejection_count, EXTRACT(EPOCH FROM updated_at)
+                FROM agent_session_state
+                WHERE updated_at > to_timestamp(%s)
+                """,
+                (since,)
+            )
+
+            rows = cur.fetchall()
+            cur.close()
+
+        return [(row[0], row[1:6], float(row[6])) for row in rows]
+
+    def save_many(self, rows):
+
+        # one statement may not touch the same key twice
+        latest = {}
+
+        for key, values, updated_at in rows:
+            latest[key] = (key, *values, updated_at)
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+
+            execute_values(
+                cur,
+                self.UPSERT_SQL,
+                list(latest.values()),
+                template="(%s, %s, %s, %s, %s, %s, to_timestamp(%s))"
+            )
+
+            cur.close()
+
+    def prune(self, older_than):
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+            cur.execute(
+                "DELETE FROM agent_session_state WHERE updated_at < to_timestamp(%s)",
+                (older_than,)
+            )
+            cur.close()
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SqliteBackend,
+    "postgres": PostgresBackend,
+}
+
+
+def make_backend(name=BACKEND):
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown SESSION_STATE_BACKEND: {name}")
+
+    return BACKENDS[name]()
+
+
+# =====================================
+# STORE
+# =====================================
+
+class SessionStateStore:
+    """
+    LRU + TTL bounded map of AgentSessionState, optionally backed by a
+    shared store.
+
+    Entries are kept in last-touched order, so both expiry and the size
+    cap evict from the front; each get() does O(1) work plus whatever
+    expired entries it sweeps.
+
+    With a shared backend, get() only reads the backend the first time
+    this worker sees a key, and mark_dirty() only queues the state. A
+    background thread writes dirty states in batches (write-behind) and
+    every REFRESH_INTERVAL_SECONDS pulls all rows other workers changed
+    since its last pull in one indexed query, so a session moving
+    between workers sees what the other one wrote without a backend
+    round trip per request.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS, backend=None):
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend or make_backend()
+
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evicted_ttl = 0
+        self._evicted_lru = 0
+
+        self._loads = 0
+        self._load_failures = 0
+        self._refreshed = 0
+        self._refresh_failures = 0
+        self._flushed = 0
+        self._flush_failures = 0
+
+        self._init_flusher()
+
+        atexit.register(self.close)
+
+    def _init_flusher(self):
+
+        self._pid = os.getpid()
+
+        # key → (state, updated_at); states are held even if evicted meanwhile
+        self._dirty = {}
+        self._inflight = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # changes up to here have been pulled from the backend
+        self._refreshed_to = time.time()
+
+        if self.backend.shared:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="session-state-flusher",
+                daemon=True
+            )
+            self._thread.start()
+
+    @staticmethod
+    def key(session_id, subject, chapter):
+        return f"{session_id}_{subject}_{chapter}"
+
+    # =============================
+    # READ
+    # =============================
+
+    def get(self, key):
+        """State for `key`, created fresh if missing or expired."""
+
+        if os.getpid() != self._pid:
+            self._init_flusher()
+
+        now = time.monotonic()
+
+        with self._lock:
+
+            self._evict_expired(now)
+
+            state = self._states.get(key)
+
+            # kept current by refresh(), never re-read per request
+            if state is not None:
+                self._hits += 1
+                self._states.move_to_end(key)
+                state.touched = now
+                return state
+
+        loaded = None
+
+        if self.backend.shared:
+
+            try:
+                loaded = self.backend.load(key)
+                self._loads += 1
+
+            except Exception as e:
+                print("SESSION STATE LOAD ERROR:", e)
+                self._load_failures += 1
+
+        with self._lock:
+
+            state = self._states.get(key)
+
+            if state is None:
+
+                self._misses += 1
+
+                state = self._states[key] = AgentSessionState()
+
+                while len(self._states) > self.max_entries:
+                    self._states.popitem(last=False)
+                    self._evicted_lru += 1
+
+            else:
+                self._hits += 1
+                self._states.move_to_end(key)
+
+            # local changes not yet flushed win over what we just read
+            if loaded is not None and key not in self._dirty and key not in self._inflight:
+                values, updated_at = loaded
+
+                if updated_at > state.version:
+                    state.apply(values)
+                    state.version = updated_at
+
+            state.touched = now
+
+            return state
+
+    def _evict_expired(self, now):
+
+        cutoff = now - self.ttl_seconds
+
+        while self._states:
+
+            state = next(iter(self._states.values()))
+
+            if state.touched >= cutoff:
+                return
+
+            self._states.popitem(last=False)
+            self._evicted_ttl += 1
+
+    # =============================
+    # WRITE-BEHIND
+    # =============================
+
+    def mark_dirty(self, key):
+        """Queue `key`'s state for the next batched write."""
+
+        if not self.backend.shared:
+            return
+
+        with self._lock:
+
+            state = self._states.get(key)
+
+            if state is not None:
+                self._dirty[key] = (state, time.time())
+
+    def _run(self):
+
+        next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+        next_refresh = time.monotonic() + REFRESH_INTERVAL_SECONDS
+
+        while not self._stopped.wait(FLUSH_INTERVAL_SECONDS):
+
+            self.flush()
+
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + REFRESH_INTERVAL_SECONDS
+                self.refresh()
+
+            if time.monotonic() >= next_prune:
+
+                next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+
+                try:
+                    self.backend.prune(time.time() - self.ttl_seconds)
+                except Exception as e:
+                    print("SESSION STATE PRUNE ERROR:", e)
+
+    def flush(self):
+
+        with self._lock:
+
+            dirty, self._dirty = self._dirty, {}
+            self._inflight = set(dirty)
+
+            rows = [
+                (key, state.snapshot(), updated_at)
+                for key, (state, updated_at) in dirty.items()
+            ]
+
+        if not rows:
+            return 0
+
+        try:
+            self.backend.save_many(rows)
+
+        except Exception as e:
+
+            print("SESSION STATE FLUSH ERROR:", e)
+
+            with self._lock:
+
+                self._flush_failures += 1
+                self._inflight = set()
+
+                # retry next round unless the state was dirtied again meanwhile
+                for key, entry in dirty.items():
+                    self._dirty.setdefault(key, entry)
+
+            return 0
+
+        with self._lock:
+
+            self._flushed += len(rows)
+            self._inflight = set()
+
+            for state, updated_at in dirty.values():
+                state.version = max(state.version, updated_at)
+
+        return len(rows)
+
+    def refresh(self):
+        """Apply rows other workers wrote since the last refresh to cached states."""
+
+        started = time.time()
+
+        try:
+            rows = self.backend.changed_since(self._refreshed_to - CLOCK_SKEW_SECONDS)
+
+        except Exception as e:
+            print("SESSION STATE REFRESH ERROR:", e)
+            self._refresh_failures += 1
+            return 0
+
+        applied = 0
+
+        with self._lock:
+
+            for key, values, updated_at in rows:
+
+                state = self._states.get(key)
+
+                # uncached keys are loaded on first get(); local changes win
+                if state is None or key in self._dirty or key in self._inflight:
+                    continue
+
+                # overlapping windows and our own writes come back too
+                if updated_at <= state.version:
+                    continue
+
+                state.apply(values)
+                state.version = updated_at
+                applied += 1
+
+            self._refreshed += applied
+            self._refreshed_to = started
+
+        return applied
+
+    def close(self):
+
+        self._stopped.set()
+
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(5)
+
+        if self.backend.shared:
+            self.flush()
+
+    # =============================
+    # METRICS
+    # =============================
+
+    def __len__(self):
+        return len(self._states)
+
+    def stats(self):
+
+        with self._lock:
+
+            self._evict_expired(time.monotonic())
+
+            count = len(self._states)
+
+            sample = [
+                sys.getsizeof(k) + sys.getsizeof(s) + sys.getsizeof(s.last_question)
+                for k, s in islice(reversed(self._states.items()), SIZE_SAMPLE)
+            ]
+
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": count,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evicted_ttl": self._evicted_ttl,
+                "evicted_lru": self._evicted_lru,
+                "approx_bytes": int(count * sum(sample) / len(sample)) if sample else 0,
+                "loads": self._loads,
+                "load_failures": self._load_failures,
+                "refreshed": self._refreshed,
+                "refresh_failures": self._refresh_failures,
+                "dirty": len(self._dirty),
+                "flushed": self._flushed,
+                "flush_failures": self._flush_failures,
+            }
@@ -0,0 +1,708 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+
+from services import db_pool
+
+
+# sqlite (shared by workers on one host) | postgres | memory (per worker —
+# a limit is then enforced once per worker, not once overall)
+BACKEND = os.getenv("SHARED_COUNTER_BACKEND", "sqlite").lower()
+
+SQLITE_PATH = os.getenv("SHARED_COUNTER_SQLITE_PATH", "curionest_counters.db")
+
+# local increments are pushed, and other workers' pulled, this often
+SYNC_INTERVAL_SECONDS = float(os.getenv("SHARED_COUNTER_SYNC_SECONDS", "2"))
+
+
+# =====================================
+# BACKENDS
+# =====================================
+# sync({(name, bucket): delta}, names, oldest_bucket) → {(name, bucket): total}
+#     for `names` at buckets >= oldest_bucket, deltas applied atomically first
+# prune(name, oldest_bucket, prefix=False) — drop buckets before it, for
+#     one name or every name starting with `name`
+
+# names per SELECT ... IN (...) when reading many keyed counters
+READ_CHUNK = 500
+
+
+def _prefix_end(prefix):
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class MemoryBackend:
+    """Counts live only in this worker."""
+
+    shared = False
+
+    def sync(self, deltas, names, oldest_bucket):
+        return {}
+
+    def prune(self, name, oldest_bucket, prefix=False):
+        pass
+
+
+class SqliteBackend:
+    """One WAL-mode file shared by every worker on the host."""
+
+    shared = True
+
+    def __init__(self, path=SQLITE_PATH):
+
+        self.path = path
+
+        self._local = threading.local()
+
+        conn = self._conn()
+
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS shared_counters (
+            name TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, bucket)
+        )
+        """)
+
+    def _conn(self):
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # autocommit mode: transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def sync(self, deltas, names, oldest_bucket):
+
+        conn = self._conn()
+
+        # write lock up front, so the read below includes every writer;
+        # a read-only call (first touch of a key) doesn't need it
+        conn.execute("BEGIN IMMEDIATE" if deltas else "BEGIN")
+
+        try:
+
+            conn.executemany(
+                """
+                INSERT INTO shared_counters (name, bucket, value) VALUES (?, ?, ?)
+                ON CONFLICT (name, bucket) DO UPDATE SET value = value + excluded.value
+                """,
+                [(name, bucket, delta) for (name, bucket), delta in deltas.items()]
+            )
+
+            totals = {}
+
+            for i in range(0, len(names), READ_CHUNK):
+
+                chunk = names[i:i + READ_CHUNK]
+
+                rows = conn.execute(
+                    f"""
+                    SELECT name, bucket, value FROM shared_counters
+                    WHERE name IN ({', '.join('?' * len(chunk))}) AND bucket >= ?
+                    """,
+                    (*chunk, oldest_bucket)
+                )
+
+                for name, bucket, value in rows:
+                    totals[(name, bucket)] = value
+
+            conn.execute("COMMIT")
+
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return totals
+
+    def prune(self, name, oldest_bucket, prefix=False):
+
+        if prefix:
+            self._conn().execute(
+                "DELETE FROM shared_counters WHERE name >= ? AND name < ? AND bucket < ?",
+                (name, _prefix_end(name), oldest_bucket)
+            )
+
+        else:
+            self._conn().execute(
+                "DELETE FROM shared_counters WHERE name = ? AND bucket < ?",
+                (name, oldest_bucket)
+            )
+
+
+class PostgresBackend:
+    """shared_counters in Postgres — shared across hosts."""
+
+    shared = True
+
+    def __init__(self):
+
+        self.pool = db_pool.get_pool()
+
+    def sync(self, deltas, names, oldest_bucket):
+
+        totals = {}
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+
+            if deltas:
+                # sorted, so concurrent workers lock rows in the same order
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO shared_counters (name, bucket, value) VALUES %s
+                    ON CONFLICT (name, bucket)
+                    DO UPDATE SET value = shared_counters.value + EXCLUDED.value
+                    """,
+                    [(name, bucket, delta) for (name, bucket), delta in sorted(deltas.items())]
+                )
+
+            for i in range(0, len(names), READ_CHUNK):
+
+                cur.execute(
+                    """
+                    SELECT name, bucket, value FROM shared_counters
+                    WHERE name = ANY(%s) AND bucket >= %s
+                    """,
+                    (list(names[i:i + READ_CHUNK]), oldest_bucket)
+                )
+
+                for name, bucket, value in cur.fetchall():
+                    totals[(name, bucket)] = value
+
+            cur.close()
+
+        return totals
+
+    def prune(self, name, oldest_bucket, prefix=False):
+
+        with self.pool.connection() as conn:
+
+            cur = conn.cursor()
+
+            if prefix:
+                cur.execute(
+                    "DELETE FROM shared_counters WHERE name >= %s AND name < %s AND bucket < %s",
+                    (name, _prefix_end(name), oldest_bucket)
+                )
+
+            else:
+                cur.execute(
+                    "DELETE FROM shared_counters WHERE name = %s AND bucket < %s",
+                    (name, oldest_bucket)
+                )
+
+            cur.close()
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SqliteBackend,
+    "postgres": PostgresBackend,
+}
+
+
+def make_backend(name=BACKEND):
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown shared counter backend: {name}")
+
+    if name == "memory":
+        print("SHARED COUNTER WARNING: memory backend counts per worker; "
+              "limits multiply by the number of workers")
+
+    return BACKENDS[name]()
+
+
+# =====================================
+# COUNTERS
+# =====================================
+
+class _SyncedCounter:
+    """Background push/pull loop shared by the counters below."""
+
+    def _init_syncer(self):
+
+        self._pid = os.getpid()
+
+        # bucket (KeyedWindowCounter: (key, bucket)) → local adds not yet pushed
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+
+        if self.backend.shared:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"counter-sync-{self.name}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+
+        while not self._stopped.is_set():
+
+            self._wakeup.wait(SYNC_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+            self.sync()
+
+    def close(self):
+
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(5)
+
+        self.sync()
+
+
+# =====================================
+# SLIDING WINDOW
+# =====================================
+
+class SlidingWindowCounter(_SyncedCounter):
+    """
+    Events in the last `window_seconds`, kept as a fixed ring of
+    `bucket_seconds` buckets with a running total — add() and count()
+    are O(1) (plus clearing buckets that aged out since the last call).
+
+    With a shared backend the ring holds every worker's counts as of
+    the last sync plus this worker's unsynced adds. A background thread
+    pushes local adds and pulls the global buckets every
+    SYNC_INTERVAL_SECONDS, so reads never touch the backend (the global
+    buckets are loaded once, synchronously, on construction). Between
+    syncs other workers' adds are not yet visible, so a global limit can
+    be overshot by what they add in that interval.
+    """
+
+    def __init__(self, name, window_seconds=3600, bucket_seconds=60, backend=None):
+
+        self.name = name
+        self.bucket_seconds = bucket_seconds
+        self.size = max(int(window_seconds // bucket_seconds), 1)
+        self.backend = backend or make_backend()
+
+        self._lock = threading.Lock()
+
+        self._counts = [0] * self.size
+        self._total = 0
+        # newest bucket the ring has been advanced to
+        self._head = self._bucket(time.time())
+
+        self._syncs = 0
+        self._sync_failures = 0
+        self._last_sync = None
+        self._pruned_at = None
+
+        self._init_syncer()
+
+        # start from the global count, not 0, before serving any read
+        self.sync()
+
+        atexit.register(self.close)
+
+    def _bucket(self, now):
+        return int(now // self.bucket_seconds)
+
+    def _advance(self, now):
+        """Caller holds _lock. Clear buckets that left the window."""
+
+        bucket = self._bucket(now)
+
+        if bucket <= self._head:
+            return
+
+        for b in range(self._head + 1, min(bucket, self._head + self.size) + 1):
+            slot = b % self.size
+            self._total -= self._counts[slot]
+            self._counts[slot] = 0
+
+        self._head = bucket
+
+    # =============================
+    # READ / WRITE
+    # =============================
+
+    def add(self, n=1):
+        """Count `n` now; a negative `n` hands back an earlier overestimate."""
+
+        if os.getpid() != self._pid:
+            self._init_syncer()
+
+        now = time.time()
+
+        with self._lock:
+
+            self._advance(now)
+
+            self._counts[self._head % self.size] += n
+            self._total += n
+
+            if self.backend.shared:
+                self._pending[self._head] = self._pending.get(self._head, 0) + n
+
+        if n <= 0:
+            return
+
+        # shorten the window in which other workers can't see this
+        self._wakeup.set()
+
+    def count(self):
+
+        with self._lock:
+            self._advance(time.time())
+            return self._total
+
+    def available(self, limit):
+        return self.count() < limit
+
+    # =============================
+    # SYNC
+    # =============================
+
+    def sync(self):
+
+        if not self.backend.shared:
+            return False
+
+        with self._sync_lock:
+
+            with self._lock:
+                deltas, self._pending = self._pending, {}
+                head = self._head
+
+            oldest = head - self.size + 1
+
+            try:
+                totals = self.backend.sync(
+                    {(self.name, bucket): delta for bucket, delta in deltas.items()},
+                    [self.name],
+                    oldest
+                )
+
+                # once per bucket rollover is plenty
+                if head != self._pruned_at:
+                    self.backend.prune(self.name, oldest)
+                    self._pruned_at = head
+
+            except Exception as e:
+
+                print("SHARED COUNTER SYNC ERROR:", e)
+
+                with self._lock:
+
+                    self._sync_failures += 1
+
+                    for bucket, delta in deltas.items():
+                        self._pending[bucket] = self._pending.get(bucket, 0) + delta
+
+                return False
+
+            with self._lock:
+
+                self._advance(time.time())
+
+                counts = [0] * self.size
+
+                for (_, bucket), value in totals.items():
+                    if self._head - self.size < bucket <= self._head:
+                        counts[bucket % self.size] += value
+
+                # adds made while the backend call was in flight
+                for bucket, delta in self._pending.items():
+                    if self._head - self.size < bucket <= self._head:
+                        counts[bucket % self.size] += delta
+
+                self._counts = counts
+                self._total = sum(counts)
+
+                self._syncs += 1
+                self._last_sync = time.time()
+
+        return True
+
+    # =============================
+    # METRICS
+    # =============================
+
+    def stats(self):
+
+        with self._lock:
+
+            self._advance(time.time())
+
+            return {
+                "count": self._total,
+                "window_seconds": self.size * self.bucket_seconds,
+                "bucket_seconds": self.bucket_seconds,
+                "backend": type(self.backend).__name__,
+                "pending": sum(self._pending.values()),
+                "syncs": self._syncs,
+                "sync_failures": self._sync_failures,
+                "last_sync": self._last_sync,
+            }
+
+
+# =====================================
+# PER-KEY FIXED WINDOW
+# =====================================
+
+class KeyedWindowCounter(_SyncedCounter):
+    """
+    One count per key (session, client IP, ...) for the current
+    `window_seconds` bucket, e.g. this UTC hour. Stored in the backend
+    as `<name>:<key>` rows, so keys are shared like a single counter.
+
+    Only keys this worker has touched in the current bucket are held
+    (at most `max_keys`, least recently used dropped) and synced; the
+    same push/pull thread as SlidingWindowCounter keeps reads local.
+    The first touch of a key in a bucket reads its global count from
+    the backend once, so a worker new to a key doesn't start it at 0.
+    """
+
+    def __init__(self, name, window_seconds=3600, max_keys=10000, backend=None):
+
+        self.name = name
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.backend = backend or make_backend()
+
+        self._lock = threading.Lock()
+
+        # key → [bucket, count]
+        self._counts = OrderedDict()
+
+        self._syncs = 0
+        self._sync_failures = 0
+        self._last_sync = None
+        self._pruned_at = None
+
+        self._init_syncer()
+
+        atexit.register(self.close)
+
+    def _bucket(self, now):
+        return int(now // self.window_seconds)
+
+    def _entry(self, key, bucket):
+        """
+        [bucket, count] for `key` in `bucket`, seeded from the backend
+        the first time it is needed. Call without _lock held.
+        """
+
+        with self._lock:
+
+            entry = self._counts.get(key)
+
+            if entry is not None and entry[0] == bucket:
+                self._counts.move_to_end(key)
+                return entry
+
+        seed = 0
+
+        if self.backend.shared:
+
+            name = f"{self.name}:{key}"
+
+            try:
+                seed = self.backend.sync({}, [name], bucket).get((name, bucket), 0)
+
+            except Exception as e:
+                # counted from 0 until the next sync pulls the real total
+                print("SHARED COUNTER READ ERROR:", e)
+
+        with self._lock:
+
+            entry = self._counts.get(key)
+
+            # another thread seeded it meanwhile
+            if entry is not None and entry[0] == bucket:
+                self._counts.move_to_end(key)
+                return entry
+
+            entry = self._counts[key] = [bucket, seed]
+            self._counts.move_to_end(key)
+
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+
+            return entry
+
+    def add(self, key, n=1):
+        """Count `n` for `key` now; a negative `n` hands back an earlier overestimate."""
+
+        if os.getpid() != self._pid:
+            self._init_syncer()
+
+        bucket = self._bucket(time.time())
+
+        entry = self._entry(key, bucket)
+
+        with self._lock:
+
+            entry[1] += n
+
+            if self.backend.shared:
+                self._pending[(key, bucket)] = self._pending.get((key, bucket), 0) + n
+
+        if n <= 0:
+            return
+
+        # shorten the window in which other workers can't see this
+        self._wakeup.set()
+
+    def count(self, key):
+        return self._entry(key, self._bucket(time.time()))[1]
+
+    def available(self, key, limit):
+        return self.count(key) < limit
+
+    def sync(self):
+
+        if not self.backend.shared:
+            return False
+
+        with self._sync_lock:
+
+            bucket = self._bucket(time.time())
+            prefix = f"{self.name}:"
+
+            with self._lock:
+                deltas, self._pending = self._pending, {}
+                keys = [k for k, entry in self._counts.items() if entry[0] == bucket]
+
+            try:
+                totals = self.backend.sync(
+                    {(prefix + key, b): delta for (key, b), delta in deltas.items()},
+                    [prefix + key for key in keys],
+                    bucket
+                )
+
+                if bucket != self._pruned_at:
+                    self.backend.prune(prefix, bucket, prefix=True)
+                    self._pruned_at = bucket
+
+            except Exception as e:
+
+                print("SHARED COUNTER SYNC ERROR:", e)
+
+                with self._lock:
+
+                    self._sync_failures += 1
+
+                    for pending_key, delta in deltas.items():
+                        self._pending[pending_key] = self._pending.get(pending_key, 0) + delta
+
+                return False
+
+            with self._lock:
+
+                for key in keys:
+
+                    entry = self._counts.get(key)
+
+                    if entry is None or entry[0] != bucket:
+                        continue
+
+                    # adds made while the backend call was in flight
+                    entry[1] = (
+                        totals.get((prefix + key, bucket), 0)
+                        + self._pending.get((key, bucket), 0)
+                    )
+
+                self._syncs += 1
+                self._last_sync = time.time()
+
+        return True
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "keys": len(self._counts),
+                "max_keys": self.max_keys,
+                "window_seconds": self.window_seconds,
+                "backend": type(self.backend).__name__,
+                "pending": len(self._pending),
+                "syncs": self._syncs,
+                "sync_failures": self._sync_failures,
+                "last_sync": self._last_sync,
+            }
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_sliding_window(name, window_seconds=3600, bucket_seconds=60, backend=None):
+    """
+    Process-wide counter per name, so every caller shares one ring and
+    syncer. `backend` is an instance or a BACKENDS name; it only matters
+    on the first call for a name.
+    """
+
+    with _counters_lock:
+
+        counter = _counters.get(name)
+
+        if counter is None:
+
+            if isinstance(backend, str):
+                backend = make_backend(backend)
+
+            counter = _counters[name] = SlidingWindowCounter(
+                name,
+                window_seconds=window_seconds,
+                bucket_seconds=bucket_seconds,
+                backend=backend
+            )
+
+        return counter
+
+
+def get_keyed_window(name, window_seconds=3600, max_keys=10000, backend=None):
+    """Process-wide KeyedWindowCounter per name; see get_sliding_window()."""
+
+    with _counters_lock:
+
+        counter = _counters.get(name)
+
+        if counter is None:
+
+            if isinstance(backend, str):
+                backend = make_backend(backend)
+
+            counter = _counters[name] = KeyedWindowCounter(
+                name,
+                window_seconds=window_seconds,
+                max_keys=max_keys,
+                backend=backend
+            )
+
+        return counter
+
+
+def stats():
+    with _counters_lock:
+        counters = list(_counters.values())
+    return {counter.name: counter.stats() for counter in counters}
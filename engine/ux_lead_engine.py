@@ -1,5 +1,9 @@
 # engine/ux_lead_engine.py
 
+import time
+
+from engine.session_engine import get_session_store
+
 
 class UXLeadEngine:
 
@@ -15,10 +19,10 @@ class UXLeadEngine:
     # INITIALIZATION
     # ================================
 
-    def __init__(self):
+    def __init__(self, store=None):
 
-        # session memory
-        self.sessions = {}
+        # same bounded store SessionEngine uses — one record per session
+        self.store = store if store is not None else get_session_store()
 
     # ================================
     # SESSION INITIALIZATION
@@ -26,13 +30,7 @@ class UXLeadEngine:
 
     def _ensure_session(self, session_id):
 
-        if session_id not in self.sessions:
-
-            self.sessions[session_id] = {
-                "lead_prompted": False,
-                "contact_captured": False,
-                "last_interaction": None
-            }
+        return self.store.get(session_id)
 
     # ================================
     # ELIGIBILITY EVALUATION
@@ -40,9 +38,7 @@ class UXLeadEngine:
 
     def evaluate(self, session_id, escalation_confidence, engagement_score):
 
-        self._ensure_session(session_id)
-
-        session = self.sessions[session_id]
+        session = self._ensure_session(session_id)
 
         # -------------------------------
         # Combined behavioral signal
@@ -58,12 +54,12 @@ class UXLeadEngine:
             escalation_confidence >= self.MIN_ESCALATION_CONFIDENCE
             and engagement_score >= self.MIN_ENGAGEMENT_SCORE
             and combined_score >= self.MIN_COMBINED_SCORE
-            and not session["lead_prompted"]
+            and not session.lead_prompted
         )
 
         if eligible:
 
-            session["lead_prompted"] = True
+            session.lead_prompted = True
 
             return True
 
@@ -75,9 +71,10 @@ class UXLeadEngine:
 
     def mark_contact_captured(self, session_id):
 
-        self._ensure_session(session_id)
+        session = self._ensure_session(session_id)
 
-        self.sessions[session_id]["contact_captured"] = True
+        session.contact_captured = True
+        session.last_interaction = time.time()
 
     # ================================
     # PROMPT MESSAGE
@@ -0,0 +1,380 @@
+import csv
+import sys
+import json
+import time
+import argparse
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from engine import batch_scoring
+from engine.economics_engine import EscalationEconomicsEngine
+from engine.lead_engine import LeadEngine
+from engine.ux_lead_engine import UXLeadEngine
+
+
+FETCH_SIZE = 50000
+
+# every question is needed too: engagement is rebuilt from the session's
+# history, the way EngagementEngine.compute_score sees it
+EVENTS_SQL = """
+SELECT session_id, event_type, confidence
+FROM lead_events
+WHERE event_type IN ('QUESTION', 'ESCALATION')
+  AND created_at >= %s AND created_at < %s
+ORDER BY created_at
+"""
+
+
+def to_percent(confidence, scale="auto"):
+    """
+    Confidence on the 0-100 scale the engines' thresholds use. The agent
+    records escalations as probabilities (0-1); "auto" rescales a column
+    whose values all fit in 0-1.
+    """
+
+    confidence = np.asarray(confidence, dtype=np.float64)
+
+    if scale == "auto":
+        finite = confidence[np.isfinite(confidence)]
+        scale = 100 if len(finite) and finite.max() <= 1 else 1
+
+    return confidence * float(scale)
+
+
+def _engagement(codes, is_question, is_signal):
+    """
+    EngagementEngine.compute_score per row from the session's history so
+    far: questions asked, escalation signals seen, and whether a signal
+    has repeated.
+    """
+
+    signals = batch_scoring.running_count(codes, is_signal)
+
+    return batch_scoring.engagement_scores(
+        batch_scoring.running_count(codes, is_question),
+        signals,
+        signals >= 2
+    )
+
+
+def _columns(session_ids, confidence, engagement, intent=None, keep=None):
+    """
+    Session ids → small int codes; scores → float arrays. `keep` selects
+    the rows replayed; every session counts towards n_sessions.
+    """
+
+    sessions, codes = np.unique(np.asarray(session_ids, dtype=object).astype(str), return_inverse=True)
+
+    if keep is None:
+        keep = np.ones(len(codes), dtype=bool)
+
+    columns = {
+        "session": codes[keep],
+        "n_sessions": len(sessions),
+        "confidence": np.asarray(confidence, dtype=np.float64)[keep],
+        "engagement_score": np.nan_to_num(np.asarray(engagement, dtype=np.float64))[keep],
+    }
+
+    if intent is not None:
+        columns["intent_strength"] = np.asarray(intent, dtype=np.float64)[keep]
+
+    return columns
+
+
+def load_lead_events(since=None, until=None, confidence_scale="auto"):
+    """
+    ESCALATION rows in the window, in time order, as column arrays on the
+    engines' scale: confidence as a percentage and engagement rebuilt
+    from each session's QUESTION / ESCALATION history. (The agent stores
+    engagement_score 0 on its escalations, so the stored value is unused.)
+    """
+
+    from services import db_pool
+
+    session_ids, event_types, confidence = [], [], []
+
+    with db_pool.connection(autocommit=False) as conn:
+
+        # named cursor: rows stream from the server FETCH_SIZE at a time
+        cursor = conn.cursor(name="escalation_simulator")
+        cursor.itersize = FETCH_SIZE
+
+        cursor.execute(EVENTS_SQL, (since or datetime.min, until or datetime.max))
+
+        while True:
+
+            rows = cursor.fetchmany(FETCH_SIZE)
+
+            if not rows:
+                break
+
+            s, t, c = zip(*rows)
+
+            session_ids.extend(s)
+            event_types.extend(t)
+            confidence.extend(c)
+
+        cursor.close()
+
+    if not session_ids:
+        return _columns([], [], [])
+
+    _, codes = np.unique(np.asarray(session_ids, dtype=object).astype(str), return_inverse=True)
+
+    is_escalation = np.asarray(event_types, dtype=object) == "ESCALATION"
+
+    confidence = np.array([np.nan if c is None else c for c in confidence], dtype=np.float64)
+
+    engagement = _engagement(codes, ~is_escalation, is_escalation)
+
+    keep = is_escalation & np.isfinite(confidence)
+
+    return _columns(
+        session_ids,
+        to_percent(np.where(keep, confidence, np.nan), confidence_scale),
+        engagement,
+        keep=keep
+    )
+
+
+def load_csv(path, confidence_scale="auto"):
+    """
+    Rows exported elsewhere, in time order. Needs session_id and
+    confidence columns. engagement_score is used when present; otherwise
+    it is computed from question_count, signal_strength and
+    repeat_confusion. intent_strength is used when present.
+    """
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    if not rows:
+        return _columns([], [], [])
+
+    def column(name):
+        return [float(r[name] or 0) for r in rows]
+
+    if "engagement_score" in rows[0]:
+        engagement = column("engagement_score")
+
+    else:
+        engagement = batch_scoring.engagement_scores(
+            column("question_count"),
+            column("signal_strength"),
+            np.asarray(column("repeat_confusion")) > 0
+        )
+
+    return _columns(
+        [r["session_id"] for r in rows],
+        to_percent(column("confidence"), confidence_scale),
+        engagement,
+        column("intent_strength") if "intent_strength" in rows[0] else None
+    )
+
+
+def check_inputs(columns, lead_thresholds, min_confidence, min_engagement):
+    """
+    (errors, warnings). Errors mean no setting in the grid can ever
+    produce a lead — e.g. confidence on the wrong scale — so the replay
+    would be meaningless; warnings flag a grid that can never prompt.
+    """
+
+    confidence = columns["confidence"]
+    engagement = columns["engagement_score"]
+
+    if not len(confidence):
+        return ["no escalation rows to replay"], []
+
+    errors, warnings = [], []
+
+    if confidence.max() < min(lead_thresholds):
+        errors.append(
+            f"max confidence {confidence.max():g} is below every lead threshold "
+            f"(lowest {min(lead_thresholds):g}) — check --confidence-scale"
+        )
+
+    if confidence.max() < min_confidence or engagement.max() < min_engagement:
+        warnings.append(
+            f"no row reaches the UX prompt minimums (confidence {min_confidence:g}, "
+            f"engagement {min_engagement:g}); max seen {confidence.max():g} / {engagement.max():g}"
+        )
+
+    return errors, warnings
+
+
+# =====================================
+# SIMULATION
+# =====================================
+
+def simulate(
+    columns,
+    lead_thresholds=(LeadEngine.LEAD_THRESHOLD,),
+    combined_thresholds=(UXLeadEngine.MIN_COMBINED_SCORE,),
+    min_confidence=UXLeadEngine.MIN_ESCALATION_CONFIDENCE,
+    min_engagement=UXLeadEngine.MIN_ENGAGEMENT_SCORE,
+    high_priority=EscalationEconomicsEngine.HIGH_PRIORITY_SCORE,
+    medium_priority=EscalationEconomicsEngine.MEDIUM_PRIORITY_SCORE,
+    intent_strength=0.0,
+):
+    """
+    One result per (lead threshold, combined threshold) pair:
+
+    - escalation_rate: share of turns at or above the lead threshold
+    - lead_rate: share of sessions that become a lead
+    - prompt_rate: share of sessions shown the UX contact prompt
+    - priority: tier counts of each new lead, scored at its first
+      qualifying turn
+    """
+
+    session = columns["session"]
+    n_sessions = columns["n_sessions"]
+    confidence = columns["confidence"]
+    engagement = columns["engagement_score"]
+
+    intent = columns.get("intent_strength")
+
+    if intent is None:
+        intent = np.full(len(confidence), intent_strength, dtype=np.float64)
+
+    n_rows = len(confidence)
+
+    # threshold-independent, so computed once
+    priority = batch_scoring.priority_codes(
+        batch_scoring.lead_quality_scores(confidence, engagement, intent),
+        high=high_priority,
+        medium=medium_priority
+    )
+
+    results = []
+
+    for lead_threshold, combined in itertools.product(lead_thresholds, combined_thresholds):
+
+        qualified = batch_scoring.lead_qualified(confidence, lead_threshold)
+        new_leads = batch_scoring.first_per_session(session, qualified)
+
+        prompted = batch_scoring.first_per_session(
+            session,
+            batch_scoring.ux_eligible(
+                confidence,
+                engagement,
+                min_confidence=min_confidence,
+                min_engagement=min_engagement,
+                min_combined=combined
+            )
+        )
+
+        tiers = np.bincount(priority[new_leads], minlength=3)
+
+        leads = int(new_leads.sum())
+        prompts = int(prompted.sum())
+
+        results.append({
+            "lead_threshold": lead_threshold,
+            "combined_threshold": combined,
+            "escalation_rate": round(float(qualified.sum()) / n_rows, 4) if n_rows else None,
+            "leads": leads,
+            "lead_rate": round(leads / n_sessions, 4) if n_sessions else None,
+            "prompts": prompts,
+            "prompt_rate": round(prompts / n_sessions, 4) if n_sessions else None,
+            "priority": {
+                str(label): int(n) for label, n in zip(batch_scoring.PRIORITY_LABELS, tiers)
+            },
+        })
+
+    return results
+
+
+def _floats(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Replay lead_events against escalation thresholds")
+
+    parser.add_argument("--csv", help="replay a CSV export instead of lead_events")
+    parser.add_argument("--hours", type=float, default=24 * 30, help="lead_events window (default 30 days)")
+    parser.add_argument("--since", help="ISO timestamp (UTC); overrides --hours")
+    parser.add_argument("--until", help="ISO timestamp (UTC); default now")
+    parser.add_argument("--lead-thresholds", type=_floats, default=[LeadEngine.LEAD_THRESHOLD],
+                        help="comma separated, e.g. 20,25,30")
+    parser.add_argument("--combined-thresholds", type=_floats, default=[UXLeadEngine.MIN_COMBINED_SCORE],
+                        help="comma separated, e.g. 20,25,30")
+    parser.add_argument("--min-confidence", type=float, default=UXLeadEngine.MIN_ESCALATION_CONFIDENCE)
+    parser.add_argument("--min-engagement", type=float, default=UXLeadEngine.MIN_ENGAGEMENT_SCORE)
+    parser.add_argument("--high-priority", type=float, default=EscalationEconomicsEngine.HIGH_PRIORITY_SCORE)
+    parser.add_argument("--medium-priority", type=float, default=EscalationEconomicsEngine.MEDIUM_PRIORITY_SCORE)
+    parser.add_argument("--intent-strength", type=float, default=0.0,
+                        help="used for priority when the data has no intent_strength column")
+    parser.add_argument("--confidence-scale", choices=["auto", "1", "100"], default="auto",
+                        help="multiply confidence by this to reach 0-100; auto rescales 0-1 data")
+    parser.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    if args.csv:
+        columns = load_csv(args.csv, args.confidence_scale)
+
+    else:
+        since = args.since or (datetime.utcnow() - timedelta(hours=args.hours)).isoformat()
+        columns = load_lead_events(since, args.until, args.confidence_scale)
+
+    loaded = time.perf_counter()
+
+    errors, warnings = check_inputs(
+        columns,
+        args.lead_thresholds,
+        args.min_confidence,
+        args.min_engagement
+    )
+
+    for warning in warnings:
+        print("WARNING:", warning, file=sys.stderr)
+
+    if errors:
+        parser.exit(1, "escalation_simulator: nothing can qualify:\n  " + "\n  ".join(errors) + "\n")
+
+    results = simulate(
+        columns,
+        lead_thresholds=args.lead_thresholds,
+        combined_thresholds=args.combined_thresholds,
+        min_confidence=args.min_confidence,
+        min_engagement=args.min_engagement,
+        high_priority=args.high_priority,
+        medium_priority=args.medium_priority,
+        intent_strength=args.intent_strength
+    )
+
+    finished = time.perf_counter()
+
+    if args.json:
+        print(json.dumps({
+            "rows": len(columns["confidence"]),
+            "sessions": columns["n_sessions"],
+            "load_seconds": round(loaded - started, 3),
+            "simulate_seconds": round(finished - loaded, 3),
+            "results": results,
+        }, indent=2))
+
+    else:
+
+        print(
+            f"\n=== {len(columns['confidence'])} events, {columns['n_sessions']} sessions "
+            f"(load {loaded - started:.2f}s, simulate {finished - loaded:.2f}s) ==="
+        )
+
+        print(f"{'lead':>6} {'comb':>6} {'esc_rate':>9} {'leads':>7} {'lead_rate':>9} "
+              f"{'prompts':>8} {'prompt_rate':>11}  HIGH/MEDIUM/LOW")
+
+        for r in results:
+            p = r["priority"]
+            print(
+                f"{r['lead_threshold']:>6g} {r['combined_threshold']:>6g} "
+                f"{r['escalation_rate'] or 0:>9.4f} {r['leads']:>7} {r['lead_rate'] or 0:>9.4f} "
+                f"{r['prompts']:>8} {r['prompt_rate'] or 0:>11.4f}  "
+                f"{p['HIGH']}/{p['MEDIUM']}/{p['LOW']}"
+            )
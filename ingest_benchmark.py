@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import importlib
+import tempfile
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+import knowledge_ingest
+from knowledge_ingest import ingest_document
+
+
+DOCS_DIR = "docs"
+
+EMBEDDING_DIM = 1536
+
+STAGES = ["parse", "split", "dedup", "embed", "store"]
+
+
+# =====================================================
+# EMBEDDERS
+# =====================================================
+
+class FakeEmbedder:
+    """
+    Offline stand-in for OpenAIEmbeddings.
+
+    Vectors are deterministic per text (seeded from its hash), so
+    dedup and storage behave as in a real run with zero API spend.
+    `latency_ms` simulates per-batch API latency.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, latency_ms=0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+
+    def _vector(self, text):
+
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+
+        vec = np.random.RandomState(seed).standard_normal(self.dim).astype(np.float32)
+        vec /= np.linalg.norm(vec)
+
+        return vec.tolist()
+
+    def embed_documents(self, texts):
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def load_embedder(spec, dim, latency_ms):
+    """`fake`, `openai`, or `package.module:ClassName`."""
+
+    if spec == "fake":
+        return FakeEmbedder(dim=dim, latency_ms=latency_ms)
+
+    if spec == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model="text-embedding-3-small")
+
+    module_name, _, class_name = spec.partition(":")
+
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def iter_files(docs_dir):
+    """Yield (subject, chapter, path) — chapter/subject are the parent dirs."""
+
+    for root, _, files in sorted(os.walk(docs_dir)):
+
+        parts = os.path.relpath(root, docs_dir).split(os.sep)
+
+        if len(parts) < 2:
+            continue
+
+        subject, chapter = parts[-2], parts[-1]
+
+        for file in sorted(files):
+
+            if file.lower().endswith((".pdf", ".txt")):
+                yield subject, chapter, os.path.join(root, file)
+
+
+def peak_rss_mb():
+
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+
+    return round(peak / 1024, 1)
+
+
+def git_commit():
+
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+
+def run_benchmark(docs_dir=DOCS_DIR, embedder="fake", dim=EMBEDDING_DIM,
+                  latency_ms=0.0, batch_size=None):
+
+    if batch_size:
+        knowledge_ingest.EMBED_BATCH_SIZE = batch_size
+
+    model = load_embedder(embedder, dim, latency_ms)
+
+    # scratch store — never touches the served chroma_db
+    chroma_dir = tempfile.mkdtemp(prefix="curionest_bench_")
+
+    try:
+
+        client = chromadb.PersistentClient(
+            path=chroma_dir,
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+        collection = client.get_or_create_collection(
+            name="benchmark",
+            metadata={"hnsw:space": "cosine"}
+        )
+
+        stats = {}
+        files = 0
+
+        start = time.perf_counter()
+
+        for subject, chapter, path in iter_files(docs_dir):
+
+            ingest_document(
+                file_path=path,
+                subject=subject,
+                chapter=chapter,
+                source="benchmark",
+                version="bench",
+                collection=collection,
+                embedder=model,
+                stats=stats
+            )
+
+            files += 1
+
+        elapsed = time.perf_counter() - start
+
+    finally:
+        shutil.rmtree(chroma_dir, ignore_errors=True)
+
+    pages = stats.get("pages", 0)
+    chunks = stats.get("chunks", 0)
+
+    stages = {}
+
+    for stage in STAGES:
+
+        seconds = stats.get(f"{stage}_seconds", 0.0)
+
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "share": round(seconds / elapsed, 4) if elapsed else 0.0
+        }
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "docs_dir": docs_dir,
+            "embedder": embedder,
+            "dim": dim,
+            "latency_ms": latency_ms,
+            "batch_size": knowledge_ingest.EMBED_BATCH_SIZE,
+            "dedup": knowledge_ingest.DEDUP_ENABLED
+        },
+        "totals": {
+            "files": files,
+            "pages": pages,
+            "chunks": chunks,
+            "seconds": round(elapsed, 4)
+        },
+        "throughput": {
+            "pages_per_s": round(pages / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_s": round(chunks / elapsed, 2) if elapsed else 0.0
+        },
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark document ingestion")
+
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument(
+        "--embedder",
+        default="fake",
+        help="fake | openai | package.module:ClassName"
+    )
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--output", help="write the JSON report here")
+
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        docs_dir=args.docs_dir,
+        embedder=args.embedder,
+        dim=args.dim,
+        latency_ms=args.latency_ms,
+        batch_size=args.batch_size
+    )
+
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import hashlib
+
+import numpy as np
+
+
+# word shingles per MinHash set
+SHINGLE_SIZE = 5
+
+# signature length and LSH banding (16 bands x 4 rows: pairs at 0.8
+# similarity become candidates with ~99.9% probability)
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# estimated Jaccard similarity at which a chunk counts as a near duplicate
+NEAR_DUP_THRESHOLD = float(os.getenv("INGEST_NEAR_DUP_THRESHOLD", "0.8"))
+
+# provenance entries kept per surviving chunk (bounds metadata size)
+MAX_PROVENANCE = 50
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_text(text):
+    """Lowercase and drop punctuation/whitespace noise."""
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+def content_hash(text):
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def minhash_signature(text):
+
+    words = normalize_text(text).split()
+
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {
+            " ".join(words[i:i + SHINGLE_SIZE])
+            for i in range(len(words) - SHINGLE_SIZE + 1)
+        }
+
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+            for s in shingles
+        ),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+    # (a*h + b) mod p for every permutation x shingle, min per permutation;
+    # a, b, h < 2^32 so the products never overflow uint64
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+
+    return permuted.min(axis=1)
+
+
+def merge_provenance(metadata, entries):
+    """Append dropped-chunk references to a surviving chunk's metadata."""
+
+    existing = json.loads(metadata.get("duplicates") or "[]")
+
+    merged = existing + [e for e in entries if e not in existing]
+
+    metadata["duplicates"] = json.dumps(merged[:MAX_PROVENANCE])
+    metadata["dup_count"] = len(merged)
+
+    return metadata
+
+
+class ChunkDeduplicator:
+    """
+    Exact + near-duplicate index for the chunks of one chapter.
+
+    Exact duplicates are caught by normalized-text hash; near
+    duplicates by MinHash signatures bucketed with LSH and confirmed
+    against NEAR_DUP_THRESHOLD.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD):
+
+        self.threshold = threshold
+
+        self.ids = set()
+        self.by_hash = {}
+        self.signatures = {}
+        self.buckets = {}
+
+        self.rows = NUM_PERM // LSH_BANDS
+
+    def _bands(self, signature):
+
+        for band in range(LSH_BANDS):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows].tobytes()
+
+    def add(self, chunk_id, text):
+
+        self.ids.add(chunk_id)
+        self.by_hash.setdefault(content_hash(text), chunk_id)
+
+        signature = minhash_signature(text)
+        self.signatures[chunk_id] = signature
+
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, []).append(chunk_id)
+
+    def find_duplicate(self, text):
+        """Return (kept_chunk_id, "exact" | "near") or (None, None)."""
+
+        exact = self.by_hash.get(content_hash(text))
+
+        if exact:
+            return exact, "exact"
+
+        signature = minhash_signature(text)
+
+        best_id = None
+        best_score = 0.0
+        checked = set()
+
+        for key in self._bands(signature):
+
+            for candidate in self.buckets.get(key, ()):
+
+                if candidate in checked:
+                    continue
+
+                checked.add(candidate)
+
+                score = float(np.mean(self.signatures[candidate] == signature))
+
+                if score >= self.threshold and score > best_score:
+                    best_id = candidate
+                    best_score = score
+
+        if best_id:
+            return best_id, "near"
+
+        return None, None
@@ -1,24 +1,66 @@
+import os
 import sqlite3
+from datetime import datetime, timezone
+
+from budget_guard import DB_PATH, COUNTER_PREFIX
+from engine.shared_counter import SqliteBackend
+
+# usage_counters (one row of daily/hourly totals) lived here before,
+# and in the log database before that
+LEGACY_DB_PATHS = [DB_PATH, "curionest_logs.db"]
+
+
+def _epoch(text, fmt):
+    return datetime.strptime(text, fmt).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _legacy_row():
+
+    for path in LEGACY_DB_PATHS:
+
+        if not os.path.exists(path):
+            continue
+
+        legacy = sqlite3.connect(path)
+
+        try:
+            row = legacy.execute(
+                "SELECT daily_tokens, hourly_tokens, day, hour FROM usage_counters WHERE id = 1"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+
+        legacy.close()
+
+        if row and row[2]:
+            return row
+
+    return None
+
+
+# creates shared_counters
+SqliteBackend(DB_PATH)
+
+conn = sqlite3.connect(DB_PATH)
+
+# carry the current totals over so the move doesn't reset the budget
+row = _legacy_row()
+
+if row:
+
+    daily_tokens, hourly_tokens, day, hour = row
+
+    buckets = [
+        (f"{COUNTER_PREFIX}:daily", int(_epoch(day, "%Y-%m-%d") // 86400), daily_tokens),
+        (f"{COUNTER_PREFIX}:hourly", int(_epoch(hour, "%Y-%m-%dT%H") // 3600), hourly_tokens),
+    ]
+
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO shared_counters (name, bucket, value) VALUES (?, ?, ?)",
+            buckets
+        )
 
-conn = sqlite3.connect("curionest_logs.db")
-cur = conn.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS usage_counters (
-    id INTEGER PRIMARY KEY CHECK (id = 1),
-    daily_tokens INTEGER DEFAULT 0,
-    hourly_tokens INTEGER DEFAULT 0,
-    day TEXT,
-    hour TEXT
-)
-""")
-
-cur.execute("""
-INSERT OR IGNORE INTO usage_counters (id, daily_tokens, hourly_tokens, day, hour)
-VALUES (1, 0, 0, '', '')
-""")
-
-conn.commit()
 conn.close()
 
-print("usage_counters table ready")
+print(f"shared_counters table ready in {DB_PATH}")
@@ -1,18 +1,36 @@
 import os
-import uuid
+import json
+import time
+import random
+import hashlib
 import chromadb
 
+from contextlib import contextmanager
+
 from chromadb.config import Settings
 
 from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 
+from engine import collection_registry
+from ingest_dedup import ChunkDeduplicator, content_hash, merge_provenance
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHROMA_DIR = os.path.join(BASE_DIR, "chroma_db")
 
-COLLECTION_NAME = "curionest"
+COLLECTION_NAME = collection_registry.DEFAULT_COLLECTION
+
+# chunks embedded + stored per round trip (also the checkpoint granularity)
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+
+# retry policy for failed embedding batches (rate limits, network blips)
+EMBED_MAX_RETRIES = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("INGEST_EMBED_BACKOFF_SECONDS", "2"))
+
+# drop exact / near-duplicate chunks within a chapter before embedding
+DEDUP_ENABLED = os.getenv("INGEST_DEDUP", "1") == "1"
 
 
 def normalize(value: str):
@@ -20,14 +38,38 @@ def normalize(value: str):
     return value.strip().lower().replace(" ", "_")
 
 
-def ingest_document(file_path, subject, chapter, source, version):
+@contextmanager
+def timed(stats, stage):
+    """Accumulate wall time of a stage into `stats` (no-op without it)."""
 
-    print(f"\nIngesting: {file_path}")
+    if stats is None:
+        yield
+        return
 
-    file_name = os.path.basename(file_path)
+    start = time.perf_counter()
 
-    subject = normalize(subject)
-    chapter = normalize(chapter)
+    try:
+        yield
+    finally:
+        key = f"{stage}_seconds"
+        stats[key] = stats.get(key, 0.0) + time.perf_counter() - start
+
+
+def chunk_id(subject, chapter, file_name, version, index, text):
+    """
+    Deterministic chunk id.
+
+    Re-ingesting the same file produces the same ids, so an
+    interrupted run can be resumed without duplicating vectors.
+    """
+
+    key = f"{subject}|{chapter}|{file_name}|{version}|{index}|{text}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+    return f"{chapter}_{digest}"
+
+
+def load_chunks(file_path, stats=None):
 
     ext = os.path.splitext(file_path)[1].lower()
 
@@ -44,11 +86,15 @@ def ingest_document(file_path, subject, chapter, source, version):
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
-    documents = loader.load()
+    with timed(stats, "parse"):
+        documents = loader.load()
+
+    if stats is not None:
+        stats["pages"] = stats.get("pages", 0) + len(documents)
 
     if not documents:
         print("No documents loaded")
-        return
+        return []
 
     # ----------------------------
     # Chunking (optimized)
@@ -59,50 +105,198 @@ def ingest_document(file_path, subject, chapter, source, version):
         chunk_overlap=80
     )
 
-    chunks = splitter.split_documents(documents)
+    with timed(stats, "split"):
+        chunks = splitter.split_documents(documents)
 
     if not chunks:
         print("No chunks created — skipping file")
-        return
+        return []
 
-    # ----------------------------
-    # Vector DB connection
-    # ----------------------------
+    texts = []
+
+    for c in chunks:
+
+        clean_text = c.page_content.strip()
+
+        if len(clean_text) < 50:
+            continue
+
+        texts.append(clean_text)
+
+    if not texts:
+        print("All chunks filtered — nothing to store")
+
+    return texts
 
-    client = chromadb.PersistentClient(
+
+def get_client():
+
+    return chromadb.PersistentClient(
         path=CHROMA_DIR,
         settings=Settings(anonymized_telemetry=False)
     )
 
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
+
+def get_collection(name=None):
+    """Open `name`, or the collection currently being served."""
+
+    if not name:
+        name = collection_registry.read_active(CHROMA_DIR)
+
+    return get_client().get_or_create_collection(
+        name=name,
         metadata={"hnsw:space": "cosine"}
     )
 
-    # ----------------------------
-    # Embedding model
-    # ----------------------------
 
-    embedder = OpenAIEmbeddings(
-        model="text-embedding-3-small"
+def embed_with_retry(embedder, texts):
+    """Embed one batch, retrying with exponential backoff + jitter."""
+
+    attempt = 0
+
+    while True:
+
+        try:
+            return embedder.embed_documents(texts)
+
+        except Exception as e:
+
+            if attempt >= EMBED_MAX_RETRIES:
+                raise
+
+            delay = EMBED_BACKOFF_SECONDS * (2 ** attempt)
+            delay += random.uniform(0, EMBED_BACKOFF_SECONDS)
+
+            print(
+                f"Embedding batch failed ({e}) — "
+                f"retry {attempt + 1}/{EMBED_MAX_RETRIES} in {delay:.1f}s"
+            )
+
+            time.sleep(delay)
+            attempt += 1
+
+
+def deduplicate(collection, subject, chapter, file_name, ids, texts, metadata):
+    """
+    Drop chunks that duplicate content already in the chapter.
+
+    Dropped chunks are recorded on the chunk that survives (metadata
+    `duplicates` / `dup_count`), so provenance is kept without storing
+    the vector twice.
+    """
+
+    dedup = ChunkDeduplicator()
+
+    existing = collection.get(
+        where={"$and": [{"subject": subject}, {"chapter": chapter}]},
+        include=["documents", "metadatas"]
     )
 
-    texts = []
+    stored_meta = {}
 
-    for c in chunks:
+    for cid, doc, meta in zip(
+        existing.get("ids") or [],
+        existing.get("documents") or [],
+        existing.get("metadatas") or []
+    ):
+        dedup.add(cid, doc)
+        stored_meta[cid] = meta or {}
 
-        clean_text = c.page_content.strip()
+    kept = []
+    provenance = {}
+    exact = 0
+    near = 0
 
-        if len(clean_text) < 50:
+    for index, (cid, text) in enumerate(zip(ids, texts)):
+
+        # already stored by an earlier (interrupted) run of this file
+        if cid in dedup.ids:
+            kept.append(index)
             continue
 
-        texts.append(clean_text)
+        duplicate_of, kind = dedup.find_duplicate(text)
 
-    if not texts:
-        print("All chunks filtered — nothing to store")
-        return
+        if duplicate_of:
+
+            provenance.setdefault(duplicate_of, []).append(f"{file_name}#{index}")
+
+            if kind == "exact":
+                exact += 1
+            else:
+                near += 1
+
+            continue
+
+        dedup.add(cid, text)
+        kept.append(index)
+
+    # provenance on chunks from this file rides along with their upsert
+    position = {ids[i]: i for i in kept}
 
-    embeddings = embedder.embed_documents(texts)
+    for cid, i in position.items():
+        if stored_meta.get(cid, {}).get("duplicates"):
+            merge_provenance(metadata[i], json.loads(stored_meta[cid]["duplicates"]))
+
+    for cid, entries in provenance.items():
+        if cid in position:
+            merge_provenance(metadata[position[cid]], entries)
+
+    # provenance on chunks from other files is a metadata update
+    updates = [cid for cid in provenance if cid in stored_meta and cid not in position]
+
+    if updates:
+        collection.update(
+            ids=updates,
+            metadatas=[merge_provenance(dict(stored_meta[cid]), provenance[cid]) for cid in updates]
+        )
+
+    if exact or near:
+        print(f"Dropped {exact + near} duplicate chunks ({exact} exact, {near} near)")
+
+    return (
+        [ids[i] for i in kept],
+        [texts[i] for i in kept],
+        [metadata[i] for i in kept]
+    )
+
+
+def ingest_document(
+    file_path,
+    subject,
+    chapter,
+    source,
+    version,
+    start_batch=0,
+    on_batch=None,
+    collection_name=None,
+    collection=None,
+    embedder=None,
+    stats=None
+):
+    """
+    Ingest one file into the vector store.
+
+    Chunks are embedded and stored in batches of EMBED_BATCH_SIZE.
+    Batches before `start_batch` are skipped (already stored by an
+    earlier run) and `on_batch(done, total)` is called after every
+    stored batch so callers can checkpoint progress.
+
+    Writes go to `collection` / `collection_name` when given (blue/green
+    builds, benchmarks), otherwise to the active collection. `stats`,
+    when passed, accumulates page/chunk counts and per-stage seconds.
+    """
+
+    print(f"\nIngesting: {file_path}")
+
+    file_name = os.path.basename(file_path)
+
+    subject = normalize(subject)
+    chapter = normalize(chapter)
+
+    texts = load_chunks(file_path, stats)
+
+    if not texts:
+        return 0
 
     # ----------------------------
     # Metadata creation
@@ -111,27 +305,79 @@ def ingest_document(file_path, subject, chapter, source, version):
     ids = []
     metadata = []
 
-    for text in texts:
+    for index, text in enumerate(texts):
 
-        ids.append(f"{chapter}_{uuid.uuid4().hex}")
+        ids.append(chunk_id(subject, chapter, file_name, version, index, text))
 
         metadata.append({
             "subject": subject,
             "chapter": chapter,
             "source": source,
             "file": file_name,
-            "version": version
+            "version": version,
+            "content_hash": content_hash(text)
         })
 
     # ----------------------------
-    # Store vectors
+    # Vector DB connection
     # ----------------------------
 
-    collection.add(
-        ids=ids,
-        documents=texts,
-        embeddings=embeddings,
-        metadatas=metadata
-    )
+    if collection is None:
+        collection = get_collection(collection_name)
+
+    # ----------------------------
+    # Deduplication (before paying for embeddings)
+    # ----------------------------
+
+    if DEDUP_ENABLED:
+
+        with timed(stats, "dedup"):
+            ids, texts, metadata = deduplicate(
+                collection, subject, chapter, file_name, ids, texts, metadata
+            )
+
+        if not texts:
+            print("All chunks are duplicates — nothing to store")
+            return 0
+
+    # ----------------------------
+    # Embedding model
+    # ----------------------------
+
+    if embedder is None:
+        embedder = OpenAIEmbeddings(
+            model="text-embedding-3-small"
+        )
+
+    # ----------------------------
+    # Embed + store in batches
+    # ----------------------------
+
+    total_batches = (len(texts) + EMBED_BATCH_SIZE - 1) // EMBED_BATCH_SIZE
+
+    for batch_no in range(start_batch, total_batches):
+
+        start = batch_no * EMBED_BATCH_SIZE
+        end = start + EMBED_BATCH_SIZE
+
+        with timed(stats, "embed"):
+            embeddings = embed_with_retry(embedder, texts[start:end])
+
+        # upsert keeps re-runs idempotent with deterministic ids
+        with timed(stats, "store"):
+            collection.upsert(
+                ids=ids[start:end],
+                documents=texts[start:end],
+                embeddings=embeddings,
+                metadatas=metadata[start:end]
+            )
+
+        if on_batch:
+            on_batch(batch_no + 1, total_batches)
+
+    if stats is not None:
+        stats["chunks"] = stats.get("chunks", 0) + len(texts)
+
+    print(f"Stored {len(texts)} chunks successfully")
 
-    print(f"Stored {len(texts)} chunks successfully")
\ No newline at end of file
+    return len(texts)
@@ -0,0 +1,42 @@
+-- ==============================
+-- 001: one lead per session
+-- ==============================
+-- Required by LeadPersistenceService.upsert_lead (ON CONFLICT (session_id)).
+-- Older code could race into several leads per session: keep the
+-- strongest one, move events/contacts onto it, then add the constraint.
+
+BEGIN;
+
+CREATE TEMP TABLE lead_merge ON COMMIT DROP AS
+SELECT id, keep_id
+FROM (
+    SELECT
+        id,
+        FIRST_VALUE(id) OVER (
+            PARTITION BY session_id
+            ORDER BY confidence DESC, created_at ASC
+        ) AS keep_id
+    FROM leads
+) ranked
+WHERE id <> keep_id;
+
+UPDATE lead_events e
+SET lead_id = m.keep_id
+FROM lead_merge m
+WHERE e.lead_id = m.id;
+
+UPDATE lead_contacts c
+SET lead_id = m.keep_id
+FROM lead_merge m
+WHERE c.lead_id = m.id;
+
+DELETE FROM leads l
+USING lead_merge m
+WHERE l.id = m.id;
+
+ALTER TABLE leads
+ADD CONSTRAINT leads_session_id_key UNIQUE (session_id);
+
+DROP INDEX IF EXISTS idx_leads_session_id;
+
+COMMIT;
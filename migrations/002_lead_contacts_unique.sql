@@ -0,0 +1,20 @@
+-- ==============================
+-- 002: one contact per lead
+-- ==============================
+-- Required by capture_lead (ON CONFLICT (lead_id) DO NOTHING).
+-- Keeps the earliest contact captured for each lead.
+
+BEGIN;
+
+DELETE FROM lead_contacts c
+USING lead_contacts earlier
+WHERE c.lead_id = earlier.lead_id
+  AND (earlier.created_at, earlier.id) < (c.created_at, c.id);
+
+ALTER TABLE lead_contacts
+ADD CONSTRAINT lead_contacts_lead_id_key UNIQUE (lead_id);
+
+CREATE INDEX IF NOT EXISTS idx_leads_session_created
+ON leads(session_id, created_at DESC);
+
+COMMIT;
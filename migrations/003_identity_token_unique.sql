@@ -0,0 +1,12 @@
+-- ==============================
+-- 003: identity upsert target
+-- ==============================
+-- Required by IdentityEngine (ON CONFLICT (identity_token)).
+-- Identities were only ever created after a SELECT miss, so duplicates
+-- are not expected; the index build fails loudly if there are any.
+
+CREATE UNIQUE INDEX IF NOT EXISTS identities_identity_token_key
+ON identities(identity_token);
+
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_session_id_key
+ON sessions(session_id);
@@ -0,0 +1,20 @@
+-- ==============================
+-- 004: shared agent session state
+-- ==============================
+-- Used by engine/session_state.PostgresBackend
+-- (SESSION_STATE_BACKEND=postgres).
+
+CREATE TABLE IF NOT EXISTS agent_session_state (
+    state_key TEXT PRIMARY KEY,
+
+    confusion INT NOT NULL DEFAULT 0,
+    repetition INT NOT NULL DEFAULT 0,
+    last_question TEXT,
+    escalated BOOLEAN NOT NULL DEFAULT FALSE,
+    rejection_count INT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_session_state_updated
+ON agent_session_state(updated_at);
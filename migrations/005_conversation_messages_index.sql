@@ -0,0 +1,18 @@
+-- ==============================
+-- 005: conversation history lookups
+-- ==============================
+-- SessionMemoryService hydrates its ring buffer with
+-- WHERE session_id = ? ORDER BY created_at DESC LIMIT n.
+
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id BIGSERIAL PRIMARY KEY,
+    session_id VARCHAR(100) NOT NULL,
+
+    role TEXT NOT NULL,
+    message TEXT,
+
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_messages_session_created
+ON conversation_messages(session_id, created_at DESC);
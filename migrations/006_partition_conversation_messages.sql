@@ -0,0 +1,68 @@
+-- ==============================
+-- 006: monthly partitions for conversation_messages
+-- ==============================
+-- Rebuilds conversation_messages as a RANGE (created_at) partitioned
+-- table and copies existing rows across. Later months are created
+-- (and expired ones dropped) by engine/message_partitions.py.
+--
+-- Run during a quiet period: the copy holds an exclusive lock on the
+-- old table. conversation_messages_legacy is kept for a manual check
+-- and can be dropped afterwards.
+
+BEGIN;
+
+ALTER TABLE conversation_messages RENAME TO conversation_messages_legacy;
+ALTER INDEX IF EXISTS idx_conversation_messages_session_created
+    RENAME TO idx_conversation_messages_legacy_session_created;
+
+CREATE TABLE conversation_messages (
+    id BIGSERIAL,
+    session_id VARCHAR(100) NOT NULL,
+
+    role TEXT NOT NULL,
+    message TEXT,
+
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX idx_conversation_messages_session_created
+ON conversation_messages(session_id, created_at DESC);
+
+-- one partition per month from the oldest row through two months ahead
+DO $$
+DECLARE
+    month DATE := date_trunc(
+        'month',
+        COALESCE((SELECT min(created_at) FROM conversation_messages_legacy), now())
+    );
+    last_month DATE := date_trunc('month', now()) + INTERVAL '2 months';
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF conversation_messages FOR VALUES FROM (%L) TO (%L)',
+            'conversation_messages_p' || to_char(month, 'YYYY_MM'),
+            month,
+            month + INTERVAL '1 month'
+        );
+        month := month + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+-- rows outside every monthly partition land here instead of failing
+CREATE TABLE IF NOT EXISTS conversation_messages_default
+PARTITION OF conversation_messages DEFAULT;
+
+-- legacy rows without a timestamp are kept, stamped with the migration time
+INSERT INTO conversation_messages (id, session_id, role, message, created_at)
+SELECT id, session_id, role, message, COALESCE(created_at, now())
+FROM conversation_messages_legacy;
+
+SELECT setval(
+    pg_get_serial_sequence('conversation_messages', 'id'),
+    COALESCE((SELECT max(id) FROM conversation_messages), 0) + 1,
+    false
+);
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- ==============================
+-- 007: shared bucketed counters
+-- ==============================
+-- Used by engine/shared_counter.PostgresBackend
+-- (ESCALATION_BUDGET_BACKEND=postgres / SHARED_COUNTER_BACKEND=postgres).
+-- One row per counter per time bucket; old buckets are pruned by the app.
+
+CREATE TABLE IF NOT EXISTS shared_counters (
+    name TEXT NOT NULL,
+    bucket BIGINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (name, bucket)
+);
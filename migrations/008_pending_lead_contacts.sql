@@ -0,0 +1,20 @@
+-- ==============================
+-- 008: contacts captured before their lead is written
+-- ==============================
+-- Leads are persisted by a background writer (engine/lead_writer.py), so
+-- /capture-lead can arrive before the lead row exists. The contact waits
+-- here and is moved into lead_contacts as soon as the lead is written.
+-- Rows for sessions that never produce a lead are purged after a day.
+
+CREATE TABLE IF NOT EXISTS pending_lead_contacts (
+    session_id VARCHAR(100) PRIMARY KEY,
+
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_pending_lead_contacts_created
+ON pending_lead_contacts(created_at);
@@ -0,0 +1,17 @@
+-- ==============================
+-- 009: rolling conversation summaries
+-- ==============================
+-- Written by ConversationSummarizer (through SessionMemoryService) after
+-- each background refresh, so a session that moves to another worker
+-- keeps its summary. Rows past conversation retention are deleted by
+-- engine/message_partitions.py.
+
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    session_id VARCHAR(100) PRIMARY KEY,
+    summary TEXT NOT NULL,
+
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_summaries_updated
+ON conversation_summaries(updated_at);
@@ -0,0 +1,10 @@
+-- ==============================
+-- 010: DEFAULT partition for conversation_messages
+-- ==============================
+-- For databases migrated before 006 created it: inserts dated outside
+-- every monthly partition land here instead of failing. The next
+-- engine/message_partitions.py run moves such rows into their month's
+-- partition when it creates it.
+
+CREATE TABLE IF NOT EXISTS conversation_messages_default
+PARTITION OF conversation_messages DEFAULT;
@@ -0,0 +1,363 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+# seconds a checkout waits for a free connection before failing
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+# connections idle longer than this are pinged before being handed out
+HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def connect_kwargs():
+    """DATABASE_URL when set, otherwise the discrete DB_* settings."""
+
+    database_url = os.getenv("DATABASE_URL")
+
+    if database_url:
+        return {"dsn": database_url}
+
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT"),
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+    }
+
+
+# connections inherited across fork — never closed (that would terminate
+# the parent's session) and never garbage collected
+_inherited = []
+
+
+class ConnectionPool:
+    """
+    Thread-safe, fork-safe psycopg2 connection pool.
+
+    - lazily grows from `min_size` up to `max_size` connections
+    - checkout blocks up to `timeout` seconds when exhausted
+    - stale idle connections are health-checked, dead ones replaced
+    - a forked child starts with an empty pool of its own
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, **kwargs):
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.kwargs = kwargs or connect_kwargs()
+
+        self._init_state()
+
+    def _init_state(self):
+
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+
+        self._idle = []          # [(conn, returned_at)]
+        self._size = 0           # open connections (idle + in use)
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._connect_failures = 0
+
+    # =============================
+    # FORK SAFETY
+    # =============================
+
+    def _after_fork(self):
+
+        _inherited.extend(conn for conn, _ in self._idle)
+
+        self._init_state()
+
+    def _check_pid(self):
+
+        if os.getpid() != self._pid:
+            self._after_fork()
+
+    # =============================
+    # CONNECT / VALIDATE
+    # =============================
+
+    def _connect(self):
+
+        try:
+            return psycopg2.connect(**self.kwargs)
+
+        except Exception:
+
+            with self._cond:
+                self._connect_failures += 1
+                self._size -= 1
+                self._cond.notify()
+
+            raise
+
+    def _healthy(self, conn, returned_at):
+
+        if conn.closed:
+            return False
+
+        if time.monotonic() - returned_at < HEALTHCHECK_IDLE_SECONDS:
+            return True
+
+        try:
+            autocommit = conn.autocommit
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.autocommit = autocommit
+            return True
+
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def warm(self):
+        """Open up to `min_size` connections ahead of the first request."""
+
+        while True:
+
+            with self._cond:
+
+                if self._size >= self.min_size:
+                    return
+
+                self._size += 1
+
+            conn = self._connect()
+
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    # =============================
+    # CHECKOUT / RETURN
+    # =============================
+
+    def getconn(self):
+
+        self._check_pid()
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._cond:
+
+            while True:
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, returned_at = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"no connection available within {self.timeout}s")
+
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+
+            waited = time.monotonic() - started
+
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._in_use += 1
+
+        try:
+
+            if conn is None:
+                conn = self._connect()
+
+            elif not self._healthy(conn, returned_at):
+
+                self._discard(conn)
+
+                with self._cond:
+                    self._reconnects += 1
+
+                conn = self._connect()
+
+        except Exception:
+
+            with self._cond:
+                self._in_use -= 1
+
+            raise
+
+        return conn
+
+    def putconn(self, conn, broken=False):
+
+        # checked out before a fork — belongs to the parent's pool
+        if os.getpid() != self._pid:
+            return
+
+        if not broken and not conn.closed:
+
+            try:
+                # never hand out a connection mid-transaction
+                if not conn.autocommit:
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+        with self._cond:
+
+            self._in_use -= 1
+
+            if broken or conn.closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+
+            self._cond.notify()
+
+        if broken:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, autocommit=False):
+        """
+        Borrow a connection for one unit of work.
+
+        Commits on success, rolls back on error; connections that hit
+        an OperationalError/InterfaceError are dropped, not reused.
+        """
+
+        conn = self.getconn()
+        broken = False
+
+        try:
+
+            conn.autocommit = autocommit
+
+            yield conn
+
+            if not autocommit:
+                conn.commit()
+
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+
+            broken = True
+            raise
+
+        except Exception:
+
+            if not conn.closed and not autocommit:
+                conn.rollback()
+
+            raise
+
+        finally:
+
+            self.putconn(conn, broken=broken)
+
+    def closeall(self):
+
+        with self._cond:
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+
+        for conn, _ in idle:
+            self._discard(conn)
+
+    # =============================
+    # METRICS
+    # =============================
+
+    def stats(self):
+
+        with self._cond:
+
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "utilization": round(self._in_use / self.max_size, 3) if self.max_size else 0.0,
+                "checkouts": self._checkouts,
+                "wait_avg_ms": round(1000 * self._wait_total / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(1000 * self._wait_max, 3),
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "connect_failures": self._connect_failures,
+            }
+
+
+# =====================================
+# PROCESS-WIDE POOL
+# =====================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+
+    global _pool
+
+    if _pool is None:
+
+        with _pool_lock:
+
+            if _pool is None:
+                _pool = ConnectionPool()
+
+    return _pool
+
+
+def connection(autocommit=False):
+    """Shortcut for `get_pool().connection(...)`."""
+    return get_pool().connection(autocommit=autocommit)
+
+
+def _reset_after_fork():
+
+    global _pool_lock
+
+    _pool_lock = threading.Lock()
+
+    if _pool is not None:
+        _pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
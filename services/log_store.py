@@ -0,0 +1,378 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows — manifest updates are only thread-locked
+    fcntl = None
+
+
+# one sqlite file per UTC day (plus size rollovers) lives here
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+
+# a day's partition rolls over to the next sequence number past this size
+PARTITION_MAX_MB = float(os.getenv("LOG_PARTITION_MAX_MB", "256"))
+
+# partitions older than this many days are deleted
+RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+
+MANIFEST = "manifest.json"
+MANIFEST_LOCK = "manifest.lock"
+
+# numeric detail fields copied into their own columns so reports can
+# aggregate them in SQL instead of parsing every row
+EXTRACTED_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "latency_ms",
+)
+
+INSERT_SQL = f"""
+INSERT INTO logs (timestamp, event_type, details, sample_rate, {', '.join(EXTRACTED_FIELDS)})
+VALUES (?, ?, ?, ?, {', '.join('?' for _ in EXTRACTED_FIELDS)})
+"""
+
+# exact per-minute event counts; several workers add into the same row
+COUNTS_UPSERT_SQL = """
+INSERT INTO log_counts (bucket, event_type, count)
+VALUES (?, ?, ?)
+ON CONFLICT (bucket, event_type) DO UPDATE
+SET count = log_counts.count + excluded.count
+"""
+
+
+# =====================================
+# SCHEMA
+# =====================================
+
+def ensure_schema(conn):
+    """Create / upgrade the logs table in place. Safe to run repeatedly."""
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        event_type TEXT,
+        details TEXT
+    )
+    """)
+
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(logs)")}
+
+    for field in EXTRACTED_FIELDS:
+        if field not in existing:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {field} REAL")
+
+    # fraction of this event type's rows that were kept (1 = all)
+    if "sample_rate" not in existing:
+        conn.execute("ALTER TABLE logs ADD COLUMN sample_rate REAL DEFAULT 1")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS log_counts (
+        bucket TEXT,
+        event_type TEXT,
+        count INTEGER,
+        PRIMARY KEY (bucket, event_type)
+    )
+    """)
+
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_logs_event_time
+    ON logs (event_type, timestamp)
+    """)
+
+    conn.commit()
+
+
+def connect(path):
+    """Writable connection to a partition, schema ensured."""
+
+    conn = sqlite3.connect(path, timeout=30)
+
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    ensure_schema(conn)
+
+    return conn
+
+
+# =====================================
+# MANIFEST
+# =====================================
+
+_manifest_thread_lock = threading.Lock()
+
+
+def partition_name(day, seq):
+    return f"logs-{day}.{seq}.db"
+
+
+def read_manifest(log_dir=LOG_DIR):
+
+    path = os.path.join(log_dir, MANIFEST)
+
+    if not os.path.exists(path):
+        return {"partitions": []}
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(log_dir, manifest):
+
+    path = os.path.join(log_dir, MANIFEST)
+
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(f"{path}.tmp", path)
+
+
+@contextmanager
+def _locked_manifest(log_dir):
+    """Read-modify-write the manifest; serialised across threads and workers."""
+
+    os.makedirs(log_dir, exist_ok=True)
+
+    with _manifest_thread_lock:
+
+        with open(os.path.join(log_dir, MANIFEST_LOCK), "a") as lock_file:
+
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                manifest = read_manifest(log_dir)
+                before = json.dumps(manifest, sort_keys=True)
+
+                yield manifest
+
+                if json.dumps(manifest, sort_keys=True) != before:
+                    _write_manifest(log_dir, manifest)
+
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _size(path):
+    """On-disk size including the not-yet-checkpointed WAL."""
+
+    size = os.path.getsize(path)
+
+    if os.path.exists(f"{path}-wal"):
+        size += os.path.getsize(f"{path}-wal")
+
+    return size
+
+
+def current_partition(day, log_dir=LOG_DIR, hint=None):
+    """
+    Path of the partition new rows for `day` go to.
+
+    The newest sequence for the day is reused until it passes
+    PARTITION_MAX_MB, then the next one is registered. `hint` is the
+    caller's current path; while it is still that day's file and under
+    the limit it is returned without touching the manifest.
+    """
+
+    max_bytes = PARTITION_MAX_MB * 1024 * 1024
+
+    if hint and os.path.basename(hint).startswith(f"logs-{day}."):
+        try:
+            if _size(hint) < max_bytes:
+                return hint
+        except OSError:
+            pass
+
+    with _locked_manifest(log_dir) as manifest:
+
+        entries = [p for p in manifest["partitions"] if p["day"] == day]
+
+        if entries:
+
+            latest = max(entries, key=lambda p: p["seq"])
+            path = os.path.join(log_dir, latest["file"])
+
+            if not os.path.exists(path) or _size(path) < max_bytes:
+                return path
+
+            seq = latest["seq"] + 1
+
+        else:
+            seq = 0
+
+        entry = {
+            "file": partition_name(day, seq),
+            "day": day,
+            "seq": seq,
+            "created_at": datetime.utcnow().isoformat(),
+            "compacted": False,
+        }
+
+        manifest["partitions"].append(entry)
+        manifest["partitions"].sort(key=lambda p: (p["day"], p["seq"]))
+
+        return os.path.join(log_dir, entry["file"])
+
+
+def partitions(since=None, until=None, log_dir=LOG_DIR):
+    """
+    Partition paths overlapping [since, until] (ISO timestamps, UTC),
+    oldest first. Partitions are whole days, so rows still need a
+    timestamp filter at the edges.
+    """
+
+    first_day = since[:10] if since else None
+    last_day = until[:10] if until else None
+
+    paths = []
+
+    for entry in read_manifest(log_dir)["partitions"]:
+
+        if first_day and entry["day"] < first_day:
+            continue
+
+        if last_day and entry["day"] > last_day:
+            continue
+
+        path = os.path.join(log_dir, entry["file"])
+
+        if os.path.exists(path):
+            paths.append(path)
+
+    return paths
+
+
+def query(sql, params=(), since=None, until=None, log_dir=LOG_DIR):
+    """
+    Run `sql` against every partition in range (read-only) and yield
+    (path, rows) per partition; callers merge the results.
+    """
+
+    for path in partitions(since, until, log_dir):
+
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+
+        try:
+            yield path, conn.execute(sql, params).fetchall()
+
+        except sqlite3.OperationalError as e:
+
+            # partition registered but its writer hasn't created the table yet
+            if "no such table" not in str(e):
+                raise
+
+        finally:
+            conn.close()
+
+
+# =====================================
+# RETENTION / COMPACTION
+# =====================================
+
+def _remove(path):
+
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def maintain(log_dir=LOG_DIR, retention_days=RETENTION_DAYS, now=None):
+    """
+    Delete partitions past the retention window and compact closed ones
+    (any earlier day, or a rolled-over sequence of today) exactly once.
+    """
+
+    now = now or datetime.utcnow()
+
+    today = now.date().isoformat()
+    cutoff = (now - timedelta(days=retention_days)).date().isoformat()
+
+    expired = []
+    to_compact = []
+
+    with _locked_manifest(log_dir) as manifest:
+
+        latest_today = max(
+            (p["seq"] for p in manifest["partitions"] if p["day"] == today),
+            default=None
+        )
+
+        kept = []
+
+        for entry in manifest["partitions"]:
+
+            if entry["day"] < cutoff:
+                expired.append(entry)
+                continue
+
+            kept.append(entry)
+
+            closed = entry["day"] < today or entry["seq"] != latest_today
+
+            if closed and not entry.get("compacted"):
+                to_compact.append(entry)
+
+        manifest["partitions"] = kept
+
+    for entry in expired:
+        _remove(os.path.join(log_dir, entry["file"]))
+
+    compacted = []
+
+    for entry in to_compact:
+
+        path = os.path.join(log_dir, entry["file"])
+
+        if not os.path.exists(path):
+            continue
+
+        try:
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.close()
+
+        except sqlite3.Error as e:
+            # e.g. a straggling writer still has it — retry next round
+            print("LOG COMPACTION ERROR:", entry["file"], e)
+            continue
+
+        compacted.append(entry["file"])
+
+    if compacted:
+
+        with _locked_manifest(log_dir) as manifest:
+            for entry in manifest["partitions"]:
+                if entry["file"] in compacted:
+                    entry["compacted"] = True
+
+    return {
+        "expired": [e["file"] for e in expired],
+        "compacted": compacted,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Log partition maintenance")
+
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+
+    args = parser.parse_args()
+
+    print(json.dumps(maintain(args.log_dir, args.retention_days), indent=2))
@@ -1,36 +1,431 @@
-import sqlite3
+import os
+import json
+import time
+import queue
+import random
+import atexit
+import threading
 from datetime import datetime
 
-class LoggingService:
+from services import log_store
+from services.log_store import EXTRACTED_FIELDS, INSERT_SQL, COUNTS_UPSERT_SQL
+
+
+# log rows held in memory at most; beyond this new rows are dropped
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# rows written per transaction ...
+BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+
+# ... and the longest a row waits for one
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "1"))
+
+# how often the writer checks retention / compaction (plus at each new day)
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("LOG_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+# per-minute event counts are written this often
+COUNTS_FLUSH_SECONDS = float(os.getenv("LOG_COUNTS_FLUSH_SECONDS", "60"))
+
+
+# =====================================
+# LEVELS / SAMPLING
+# =====================================
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+# event types containing any of these are errors unless configured otherwise
+ERROR_MARKERS = ("ERROR", "FAILURE", "EXCEPTION", "TIMEOUT")
+
+# hot-path events: exact counts are kept in log_counts, so a sample of
+# detail rows is enough
+DEFAULT_SAMPLE_RATES = {
+    "QUESTION_RECEIVED": 0.1,
+    "RAG_SUCCESS": 0.1,
+}
+
+
+def _parse_map(name, cast):
+    """
+    Env var `name` as 'A=x,B=y' → {"A": cast(x), "B": cast(y)}. A
+    malformed entry is skipped with a warning instead of stopping every
+    worker at import.
+    """
+
+    result = {}
+
+    for item in (os.getenv(name) or "").split(","):
+
+        if not item.strip():
+            continue
+
+        try:
+            key, raw = item.split("=", 1)
+            result[key.strip()] = cast(raw.strip())
+
+        except (ValueError, KeyError) as e:
+            print(f"LOGGING CONFIG WARNING: ignoring {name} entry {item.strip()!r}:", e)
+
+    return result
+
+
+def _level(value):
+    return LEVELS[value.upper()]
+
+
+def _rate(value):
+
+    rate = float(value)
+
+    if rate != rate:
+        raise ValueError("rate is NaN")
+
+    return min(max(rate, 0.0), 1.0)
+
+
+# rows below this level are counted but not written
+LOG_LEVEL = LEVELS.get(os.getenv("LOG_LEVEL", "INFO").upper(), INFO)
+
+# e.g. LOG_EVENT_LEVELS="QUESTION_RECEIVED=DEBUG,MAILGUN_RESPONSE=DEBUG"
+EVENT_LEVELS = _parse_map("LOG_EVENT_LEVELS", _level)
+
+# e.g. LOG_SAMPLE_RATES="RAG_SUCCESS=0.01,RAG_EMPTY_RESULT=0.5"; clamped to [0, 1]
+SAMPLE_RATES = dict(DEFAULT_SAMPLE_RATES, **_parse_map("LOG_SAMPLE_RATES", _rate))
+
+
+def event_level(event_type):
+
+    if event_type in EVENT_LEVELS:
+        return EVENT_LEVELS[event_type]
+
+    if any(marker in event_type for marker in ERROR_MARKERS):
+        return ERROR
+
+    return INFO
 
-    def __init__(self, db_path="curionest_logs.db"):
-        self.db_path = db_path
-        self._init_db()
 
-    def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+def extract_fields(details):
+    """EXTRACTED_FIELDS values from a details dict (None when absent)."""
 
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            event_type TEXT,
-            details TEXT
+    if not isinstance(details, dict):
+        return (None,) * len(EXTRACTED_FIELDS)
+
+    values = []
+
+    for field in EXTRACTED_FIELDS:
+
+        value = details.get(field)
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            value = None
+
+        values.append(value)
+
+    return tuple(values)
+
+
+class LogSink:
+    """
+    Process-wide writer for one partitioned log directory.
+
+    enqueue() and count() are the only things on the request path. A
+    background thread owns one WAL-mode connection to the current
+    partition, drains the queue and commits in batches, rolling to a
+    new partition per UTC day or size limit, and periodically adds the
+    in-memory per-minute counts to log_counts. Rows that don't fit in
+    the queue are dropped and counted; whatever is queued at exit is
+    flushed.
+    """
+
+    def __init__(self, log_dir):
+
+        self.log_dir = log_dir
+
+        self._init_state()
+
+        atexit.register(self.close)
+
+    def _init_state(self):
+
+        self._pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._stopped = threading.Event()
+        self._stats_lock = threading.Lock()
+
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._write_failures = 0
+        self._last_batch_ms = 0.0
+        self._partition = None
+
+        # (minute bucket, event_type) → count, swapped out on each flush
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+
+        # writer thread only
+        self._conn = None
+        self._path = None
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="log-sink",
+            daemon=True
         )
-        """)
+        self._thread.start()
+
+    # =============================
+    # HOT PATH
+    # =============================
+
+    def enqueue(self, row):
+
+        # forked child: the parent's writer thread doesn't exist here
+        if os.getpid() != self._pid:
+            self._init_state()
+
+        try:
+            self._queue.put_nowait(row)
+
+        except queue.Full:
+
+            with self._stats_lock:
+                self._dropped += 1
+
+            return False
+
+        with self._stats_lock:
+            self._enqueued += 1
+
+        return True
+
+    def count(self, bucket, event_type):
+
+        if os.getpid() != self._pid:
+            self._init_state()
+
+        key = (bucket, event_type)
+
+        with self._counts_lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    # =============================
+    # WRITER THREAD
+    # =============================
+
+    def _connection_for(self, day):
+        """Connection to the partition `day`'s rows go to right now."""
+
+        target = log_store.current_partition(day, self.log_dir, hint=self._path)
+
+        if target == self._path:
+            return self._conn, False
+
+        self._disconnect()
+
+        self._conn = log_store.connect(target)
+        self._path = target
+
+        with self._stats_lock:
+            self._partition = os.path.basename(target)
+
+        return self._conn, True
+
+    def _disconnect(self):
+
+        if self._conn is not None:
+            self._conn.close()
+
+        self._conn, self._path = None, None
+
+    def _run(self):
+
+        next_maintenance = 0.0
+        next_counts_flush = time.monotonic() + COUNTS_FLUSH_SECONDS
+
+        while True:
+
+            batch = []
+
+            try:
+                batch.append(self._queue.get(timeout=FLUSH_INTERVAL_SECONDS))
+            except queue.Empty:
+                pass
+
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # a batch can straddle midnight — split it by the rows' own day
+            by_day = {}
+
+            for row in batch:
+                by_day.setdefault(row[0][:10], []).append(row)
+
+            for day, rows in sorted(by_day.items()):
+
+                try:
+
+                    conn, opened = self._connection_for(day)
+
+                    # a new partition usually means yesterday just closed
+                    if opened:
+                        next_maintenance = 0.0
+
+                    self._write(conn, rows)
+
+                except Exception as e:
+
+                    print("LOG WRITE ERROR:", e)
+
+                    with self._stats_lock:
+                        self._write_failures += 1
+                        self._dropped += len(rows)
+
+                    self._disconnect()
+
+            stopping = self._stopped.is_set() and self._queue.empty()
+
+            if stopping or time.monotonic() >= next_counts_flush:
+                next_counts_flush = time.monotonic() + COUNTS_FLUSH_SECONDS
+                self._flush_counts()
+
+            if time.monotonic() >= next_maintenance:
+
+                next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL_SECONDS
+
+                try:
+                    log_store.maintain(self.log_dir)
+                except Exception as e:
+                    print("LOG MAINTENANCE ERROR:", e)
+
+            if stopping:
+                break
+
+        self._disconnect()
+
+    def _write(self, conn, batch):
+
+        started = time.perf_counter()
+
+        with conn:
+            conn.executemany(INSERT_SQL, batch)
+
+        with self._stats_lock:
+            self._written += len(batch)
+            self._last_batch_ms = round(1000 * (time.perf_counter() - started), 3)
+
+    def _flush_counts(self):
+
+        with self._counts_lock:
+            counts, self._counts = self._counts, {}
+
+        by_day = {}
+
+        for (bucket, event_type), n in counts.items():
+            by_day.setdefault(bucket[:10], []).append((bucket, event_type, n))
+
+        for day, rows in sorted(by_day.items()):
+
+            try:
+
+                conn, _ = self._connection_for(day)
+
+                with conn:
+                    conn.executemany(COUNTS_UPSERT_SQL, rows)
+
+            except Exception as e:
+
+                print("LOG COUNTS ERROR:", e)
+
+                self._disconnect()
+
+                # keep them for the next flush rather than lose exact counts
+                with self._counts_lock:
+                    for bucket, event_type, n in rows:
+                        key = (bucket, event_type)
+                        self._counts[key] = self._counts.get(key, 0) + n
+
+    def close(self, timeout=5.0):
+
+        self._stopped.set()
+
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def stats(self):
+
+        with self._stats_lock:
+
+            return {
+                "log_dir": self.log_dir,
+                "partition": self._partition,
+                "queued": self._queue.qsize(),
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "write_failures": self._write_failures,
+                "last_batch_ms": self._last_batch_ms,
+                "pending_counts": len(self._counts),
+            }
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_log_sink(log_dir=log_store.LOG_DIR):
+
+    sink = _sinks.get(log_dir)
+
+    if sink is None:
+
+        with _sinks_lock:
+
+            sink = _sinks.get(log_dir)
+
+            if sink is None:
+                sink = _sinks[log_dir] = LogSink(log_dir)
+
+    return sink
+
+
+class LoggingService:
+
+    def __init__(self, log_dir=log_store.LOG_DIR):
+        self.log_dir = log_dir
+        self.sink = get_log_sink(log_dir)
+
+    def log(self, event_type, details, level=None):
+
+        timestamp = datetime.utcnow().isoformat()
+
+        # every call is counted, whether or not its row is written
+        self.sink.count(timestamp[:16], event_type)
+
+        level = event_level(event_type) if level is None else level
 
-        conn.commit()
-        conn.close()
+        if level < LOG_LEVEL:
+            return
 
-    def log(self, event_type, details):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # warnings and errors are never sampled away
+        rate = SAMPLE_RATES.get(event_type, 1.0) if level < WARNING else 1.0
 
-        cursor.execute("""
-        INSERT INTO logs (timestamp, event_type, details)
-        VALUES (?, ?, ?)
-        """, (datetime.utcnow().isoformat(), event_type, str(details)))
+        if rate < 1.0 and random.random() >= rate:
+            return
 
-        conn.commit()
-        conn.close()
+        # serialize now — callers may mutate `details` after we return
+        self.sink.enqueue((
+            timestamp,
+            event_type,
+            json.dumps(details, default=str),
+            rate,
+            *extract_fields(details)
+        ))
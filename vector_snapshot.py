@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from knowledge_ingest import get_client
+from engine import collection_registry
+from services import db_pool
+
+
+SNAPSHOT_FORMAT = 1
+
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+RECORDS = "records.jsonl"
+CACHE_EMBEDDINGS = "cache_embeddings.npy"
+CACHE_RECORDS = "cache_records.jsonl"
+
+EXPORT_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+CACHE_BATCH_SIZE = 1000
+
+
+# =====================================================
+# EXPORT
+# =====================================================
+
+def _write_manifest(out_dir, manifest):
+
+    path = os.path.join(out_dir, MANIFEST)
+
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def export_collection(out_dir, collection_name=None):
+    """
+    Write ids/documents/metadata as JSONL and embeddings as one float32
+    .npy matrix (same row order), so the snapshot can be memory-mapped.
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    name = collection_name or collection_registry.read_active()
+    collection = get_client().get_collection(name)
+
+    count = collection.count()
+
+    matrix = None
+    dim = 0
+    written = 0
+
+    with open(os.path.join(out_dir, RECORDS), "w", encoding="utf-8") as records:
+
+        for offset in range(0, count, EXPORT_PAGE_SIZE):
+
+            page = collection.get(
+                limit=EXPORT_PAGE_SIZE,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+
+            if not len(embeddings):
+                break
+
+            if matrix is None:
+                dim = embeddings.shape[1]
+                matrix = np.lib.format.open_memmap(
+                    os.path.join(out_dir, EMBEDDINGS),
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(count, dim)
+                )
+
+            matrix[written:written + len(embeddings)] = embeddings
+
+            for cid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                records.write(json.dumps({"id": cid, "document": doc, "metadata": meta}) + "\n")
+
+            written += len(embeddings)
+
+    if matrix is not None:
+        matrix.flush()
+        del matrix
+
+    _write_manifest(out_dir, {
+        "format": SNAPSHOT_FORMAT,
+        "collection": name,
+        "count": written,
+        "dim": dim,
+        "dtype": "float32",
+        "space": (collection.metadata or {}).get("hnsw:space", "cosine"),
+        "created_at": datetime.utcnow().isoformat()
+    })
+
+    print(f"Exported {written} vectors from {name} → {out_dir}")
+
+    return written
+
+
+def export_cache(out_dir):
+    """Dump the qa_cache semantic cache alongside the vectors."""
+
+    with db_pool.connection() as conn:
+
+        cur = conn.cursor()
+
+        cur.execute(
+            """
+            SELECT question, embedding, answer, subject, chapter, created_at
+            FROM qa_cache
+            ORDER BY created_at
+            """
+        )
+
+        rows = cur.fetchall()
+        cur.close()
+
+    if not rows:
+        print("qa_cache is empty — nothing exported")
+        return 0
+
+    embeddings = np.asarray(
+        [json.loads(e) if isinstance(e, str) else e for _, e, _, _, _, _ in rows],
+        dtype=np.float32
+    )
+
+    np.save(os.path.join(out_dir, CACHE_EMBEDDINGS), embeddings)
+
+    with open(os.path.join(out_dir, CACHE_RECORDS), "w", encoding="utf-8") as f:
+        for question, _, answer, subject, chapter, created_at in rows:
+            f.write(json.dumps({
+                "question": question,
+                "answer": answer,
+                "subject": subject,
+                "chapter": chapter,
+                "created_at": created_at.isoformat() if created_at else None
+            }) + "\n")
+
+    print(f"Exported {len(rows)} cache entries → {out_dir}")
+
+    return len(rows)
+
+
+# =====================================================
+# IMPORT
+# =====================================================
+
+def _read_manifest(snapshot_dir):
+
+    with open(os.path.join(snapshot_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+
+    return manifest
+
+
+def _batches(jsonl_path, matrix, batch_size):
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+
+        batch = []
+        start = 0
+
+        for line in f:
+
+            batch.append(json.loads(line))
+
+            if len(batch) == batch_size:
+                yield batch, matrix[start:start + len(batch)]
+                start += len(batch)
+                batch = []
+
+        if batch:
+            yield batch, matrix[start:start + len(batch)]
+
+
+def import_collection(snapshot_dir, collection_name=None, activate=False):
+    """
+    Bulk-load a snapshot into a fresh collection (no embedding calls).
+
+    Defaults to a new versioned collection; `activate` repoints serving
+    to it once every batch is in.
+    """
+
+    manifest = _read_manifest(snapshot_dir)
+
+    name = collection_name or collection_registry.new_version_name()
+
+    client = get_client()
+
+    collection = client.create_collection(
+        name=name,
+        metadata={"hnsw:space": manifest.get("space", "cosine")}
+    )
+
+    # chroma caps the rows per add() call
+    batch_size = IMPORT_BATCH_SIZE
+
+    if hasattr(client, "get_max_batch_size"):
+        batch_size = min(batch_size, client.get_max_batch_size())
+
+    if not manifest["count"]:
+        print(f"Snapshot is empty — created {name}")
+        return name
+
+    matrix = np.load(os.path.join(snapshot_dir, EMBEDDINGS), mmap_mode="r")
+
+    start = time.perf_counter()
+    loaded = 0
+
+    for records, embeddings in _batches(os.path.join(snapshot_dir, RECORDS), matrix, batch_size):
+
+        collection.add(
+            ids=[r["id"] for r in records],
+            documents=[r["document"] for r in records],
+            metadatas=[r["metadata"] for r in records],
+            embeddings=np.ascontiguousarray(embeddings)
+        )
+
+        loaded += len(records)
+
+    if loaded != manifest["count"]:
+        raise ValueError(f"Snapshot truncated: {loaded}/{manifest['count']} records")
+
+    print(f"Imported {loaded} vectors into {name} in {time.perf_counter() - start:.1f}s")
+
+    if activate:
+        previous = collection_registry.set_active(name)
+        print(f"Switched serving: {previous} → {name}")
+
+    return name
+
+
+def import_cache(snapshot_dir):
+    """
+    Seed qa_cache from a snapshot so cached answers are warm on day one.
+    Entries already present (same question, subject and chapter) are
+    skipped, so importing the same snapshot twice adds nothing.
+    """
+
+    records_path = os.path.join(snapshot_dir, CACHE_RECORDS)
+
+    if not os.path.exists(records_path):
+        print("Snapshot has no cache entries")
+        return 0
+
+    matrix = np.load(os.path.join(snapshot_dir, CACHE_EMBEDDINGS), mmap_mode="r")
+
+    loaded = 0
+    skipped = 0
+
+    # one transaction — a failed seed leaves qa_cache untouched
+    with db_pool.connection() as conn:
+
+        cur = conn.cursor()
+
+        # qa_cache has no unique key to conflict on, so dedup up front
+        cur.execute("SELECT question, subject, chapter FROM qa_cache")
+        seen = set(cur.fetchall())
+
+        for records, embeddings in _batches(records_path, matrix, CACHE_BATCH_SIZE):
+
+            rows = []
+
+            for r, e in zip(records, embeddings):
+
+                key = (r["question"], r["subject"], r["chapter"])
+
+                if key in seen:
+                    skipped += 1
+                    continue
+
+                seen.add(key)
+
+                rows.append((
+                    r["question"],
+                    json.dumps(e.tolist()),
+                    r["answer"],
+                    r["subject"],
+                    r["chapter"],
+                    r.get("created_at")
+                ))
+
+            if not rows:
+                continue
+
+            execute_values(
+                cur,
+                """
+                INSERT INTO qa_cache
+                (question, embedding, answer, subject, chapter, created_at)
+                VALUES %s
+                """,
+                rows,
+                # snapshots without a timestamp get the import time
+                template="(%s, %s, %s, %s, %s, COALESCE(%s::timestamptz, now()))",
+                page_size=CACHE_BATCH_SIZE
+            )
+
+            loaded += len(rows)
+
+        cur.close()
+
+    print(f"Seeded {loaded} cache entries ({skipped} already present)")
+
+    return loaded
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Export / import vector snapshots")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export")
+    exp.add_argument("out_dir")
+    exp.add_argument("--collection", help="defaults to the active collection")
+    exp.add_argument("--with-cache", action="store_true", help="also dump qa_cache")
+
+    imp = sub.add_parser("import")
+    imp.add_argument("snapshot_dir")
+    imp.add_argument("--collection", help="defaults to a new versioned collection")
+    imp.add_argument("--activate", action="store_true", help="switch serving to it")
+    imp.add_argument("--with-cache", action="store_true", help="also seed qa_cache")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+
+        export_collection(args.out_dir, args.collection)
+
+        if args.with_cache:
+            export_cache(args.out_dir)
+
+    else:
+
+        import_collection(args.snapshot_dir, args.collection, args.activate)
+
+        if args.with_cache:
+            import_cache(args.snapshot_dir)